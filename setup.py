@@ -51,7 +51,7 @@ setup(
         'memory_profiler >= 0.27',
         'psutil >= 1.0.1'
     ],
-    extras_require={'doc': ['Sphinx >=1.0']},
+    extras_require={'doc': ['Sphinx >=1.0'], 'xxhash': ['xxhash >= 1.0']},
     classifiers=[
         'Development Status :: 5 - Production/Stable',
         'Intended Audience :: Developers',
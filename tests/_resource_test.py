@@ -6,6 +6,9 @@
 # discovers tests just using filenames.  Fortuneately, it seems to run
 # tests in lexicographical order, so we simply adds underscore to
 # the beginning of the filename.
+import os
+import threading
+
 from pytest import mark, raises
 
 from wand import exceptions, resource
@@ -76,3 +79,168 @@ def test_raises_exceptions(recwarn, code):
         assert w.category.__name__.endswith('Warning')
         assert "Dummy exception" in str(w.message)
         assert recwarn.list == []
+
+
+def test_wand_pool():
+    from wand.image import Image
+    pool = resource.enable_wand_pool(max_size=2)
+    try:
+        assert resource.wand_pool is pool
+        assert len(pool) == 0
+        with Image(width=1, height=1) as a:
+            wand_a = a.wand
+        assert len(pool) == 1
+        with Image() as b:
+            assert b.wand == wand_a
+            assert b.size == (0, 0)
+            assert len(pool) == 0
+        images = [Image(width=1, height=1) for _ in range(3)]
+        for image in images:
+            image.close()
+        assert len(pool) == 2
+        assert resource.enable_wand_pool(max_size=4) is pool
+        assert pool.max_size == 4
+    finally:
+        resource.disable_wand_pool()
+    assert resource.wand_pool is None
+    assert len(pool) == 0
+
+
+def test_wand_pool_prunes_exited_threads():
+    from wand.image import Image
+    pool = resource.enable_wand_pool()
+
+    def work():
+        with Image(width=1, height=1):
+            pass
+
+    try:
+        for _ in range(5):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+        assert len(pool) == 1
+        assert len(pool.free_lists) == 1
+        work()
+        assert len(pool.free_lists) == 1
+    finally:
+        resource.disable_wand_pool()
+
+
+def test_acquire_release_wand_without_pool():
+    assert resource.wand_pool is None
+    resource.increment_refcount()
+    try:
+        wand = resource.acquire_wand()
+        assert resource.library.IsMagickWand(wand)
+        resource.release_wand(wand)
+    finally:
+        resource.decrement_refcount()
+
+
+def test_arena():
+    from wand.color import Color
+    from wand.image import Image
+    with resource.arena() as a:
+        closed = Image(width=1, height=1)
+        closed.close()
+        leaked = Image(width=2, height=2)
+        kept = a.keep(Image(width=3, height=3))
+        with resource.arena() as inner:
+            color = Color('red')
+            color.__enter__()
+        assert inner.escaped == [repr(color)]
+        assert len(a) == 2
+    assert a.escaped == [repr(leaked)]
+    assert leaked.c_resource is None
+    assert kept.size == (3, 3)
+    kept.close()
+
+
+def test_arena_warn(recwarn):
+    from wand.image import Image
+    with resource.arena(warn=True) as a:
+        Image(width=1, height=1).__enter__()
+    assert len(a.escaped) == 1
+    w = recwarn.pop(RuntimeWarning)
+    assert 'not destroyed explicitly' in str(w.message)
+
+
+class Report(object):
+
+    def __init__(self):
+        self.lines = []
+
+    def write(self, line):
+        self.lines.append(line)
+
+
+def test_tracking():
+    from wand.color import Color
+    from wand.image import Image
+    resource.enable_tracking(stack_depth=4)
+    try:
+        before = resource.take_snapshot()
+        img = Image(width=10, height=20)
+        with Color('red') as color:
+            snapshot = resource.take_snapshot()
+        leaked = snapshot.diff(before)
+        assert sorted(r.type for r in leaked) == [
+            'wand.color.Color', 'wand.image.Image'
+        ]
+        record = next(r for r in leaked if r.type == 'wand.image.Image')
+        assert record.repr == repr(img)
+        assert record.bytes >= 10 * 20 * 4
+        assert 'test_tracking' in ''.join(record.stack)
+        assert leaked.statistics()[0][:2] == ('wand.image.Image', 1)
+        assert color.c_resource is None
+        img.close()
+        assert not resource.take_snapshot().diff(before)
+        report = Report()
+        leaked.dump(report)
+        assert report.lines[0].startswith('2 live resource(s)')
+    finally:
+        resource.disable_tracking()
+    with raises(RuntimeError):
+        resource.take_snapshot()
+
+
+def test_reinitialize_after_fork(monkeypatch):
+    calls = []
+    monkeypatch.setattr(resource, 'terminus', lambda: calls.append('t'))
+    monkeypatch.setattr(resource, 'genesis', lambda: calls.append('g'))
+    pool = resource.enable_wand_pool()
+    try:
+        pool.free_list.append(object())
+        resource.increment_refcount()
+        try:
+            resource.reinitialize_after_fork()
+        finally:
+            resource.reference_count -= 1
+        assert calls == ['t', 'g']
+        assert len(pool) == 0
+    finally:
+        resource.disable_wand_pool()
+
+
+@mark.skipif(not hasattr(os, 'register_at_fork'),
+             reason='os.register_at_fork() is unavailable')
+def test_enable_fork_safety():
+    from wand.image import Image
+    assert resource.enable_fork_safety()
+    try:
+        with Image(width=1, height=1):
+            pid = os.fork()
+            if not pid:
+                try:
+                    with Image(width=2, height=2) as child:
+                        code = 0 if child.size == (2, 2) else 1
+                except Exception:
+                    code = 2
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        assert os.WIFEXITED(status)
+        assert os.WEXITSTATUS(status) == 0
+    finally:
+        resource.enable_fork_safety(False)
+    assert not resource.reinitialize_on_fork
@@ -0,0 +1,80 @@
+import asyncio
+
+from pytest import fixture, raises
+
+from wand import aio
+from wand.image import Image
+
+
+@fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_open_and_operations(loop, fx_asset):
+    async def scenario():
+        img = await aio.open(filename=str(fx_asset.join('mona-lisa.jpg')))
+        async with img:
+            assert isinstance(img.image, Image)
+            assert await img.aget('size') == img.image.size
+            await img.aresize(50, 100)
+            assert await img.aget('size') == (50, 100)
+            await img.aset('format', 'png')
+            assert img.image.format == 'PNG'
+            blob = await img.amake_blob('png')
+            assert blob.startswith(b'\x89PNG')
+            cloned = await img.aclone()
+            assert isinstance(cloned, aio.AsyncImage)
+            with cloned:
+                assert await cloned.aget('size') == (50, 100)
+        assert getattr(img.image, 'c_resource', None) is None
+    loop.run_until_complete(scenario())
+
+
+def test_apply(loop, fx_asset):
+    async def scenario():
+        img = await aio.open(filename=str(fx_asset.join('mona-lisa.jpg')))
+        async with img:
+            await img.apply([
+                ('resize', (100, 100)),
+                ('crop', (), {'width': 50, 'height': 20}),
+                ('strip',),
+            ])
+            assert await img.aget('size') == (50, 20)
+            with raises(AttributeError):
+                await img.apply([('no_such_operation',)])
+    loop.run_until_complete(scenario())
+
+
+def test_configure(loop):
+    with raises(TypeError):
+        aio.configure(max_workers=2, executor=aio.get_executor())
+    aio.configure(max_workers=2)
+    executor = aio.get_executor()
+    assert executor._max_workers == 2
+    assert loop.run_until_complete(aio.run(sum, [1, 2, 3])) == 6
+    aio.configure()
+    assert aio.get_executor() is not executor
+
+
+def test_async_image_invalid():
+    with raises(TypeError):
+        aio.AsyncImage(object())
+
+
+def test_async_image_attributes():
+    with Image(width=4, height=4) as image:
+        img = aio.AsyncImage(image)
+        with raises(AttributeError):
+            img.size
+        with raises(AttributeError):
+            img.resize
+        with raises(AttributeError):
+            img.no_such_attribute
+        with raises(AttributeError):
+            img.format = 'png'
+        assert img.get('size') == (4, 4)
+        img.set('format', 'png')
+        assert image.format == 'PNG'
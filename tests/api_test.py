@@ -0,0 +1,107 @@
+import ctypes
+import ctypes.util
+import subprocess
+import sys
+
+from pytest import skip
+
+from wand.api import (LazyLibrary, bind_all, drop_library_cache, library,
+                      library_cache_path, libmagick, load_library,
+                      read_library_cache, write_library_cache)
+
+
+def test_lazy_binding_on_import():
+    """Importing wand.image binds only a fraction of declared prototypes."""
+    code = ('import wand.image, wand.api as api\n'
+            'print(len(api.library.bound()), len(api.library.prototypes))')
+    output = subprocess.check_output([sys.executable, '-c', code])
+    bound, declared = map(int, output.split())
+    assert declared > 300
+    assert bound < declared // 4
+
+
+def test_prototype_applied():
+    function = library.MagickGetImageFormat
+    assert 'MagickGetImageFormat' in library.bound()
+    assert function is library.MagickGetImageFormat
+    assert function.argtypes == (ctypes.c_void_p,)
+    assert function.restype is library.prototypes[
+        'MagickGetImageFormat'
+    ].restype
+
+
+def test_missing_function():
+    assert not hasattr(library, 'MagickNoSuchFunction')
+    assert 'MagickNoSuchFunction' not in library.prototypes
+
+
+def test_bind_all():
+    missing = bind_all()
+    bound = set(library.bound())
+    if libmagick is not library:
+        bound.update(libmagick.bound())
+    for name in library.prototypes:
+        assert name in bound or name in missing
+    assert 'MagickWandGenesis' not in missing
+
+
+def test_declaring():
+    lazy = LazyLibrary(library.cdll)
+    lazy.MagickGetImageWidth.restype = ctypes.c_size_t
+    assert lazy.bound() == []
+    lazy.end_declarations()
+    assert lazy.MagickGetImageWidth.restype is ctypes.c_size_t
+    assert lazy.bound() == ['MagickGetImageWidth']
+
+
+def test_library_cache_path(monkeypatch, tmpdir):
+    monkeypatch.setenv('WAND_LIBRARY_CACHE', str(tmpdir.join('paths')))
+    assert library_cache_path() == str(tmpdir.join('paths'))
+    monkeypatch.setenv('WAND_LIBRARY_CACHE', '')
+    assert library_cache_path() is None
+
+
+def test_library_cache(monkeypatch, tmpdir):
+    cache_path = str(tmpdir.join('wand', 'library-paths'))
+    monkeypatch.delenv('MAGICK_HOME', raising=False)
+    assert read_library_cache(cache_path) is None
+    write_library_cache(cache_path, 'libwand.so', 'libwand.so')
+    monkeypatch.setenv('MAGICK_HOME', '/opt/magick')
+    assert read_library_cache(cache_path) is None
+    write_library_cache(cache_path, 'wand.dll', 'magick.dll')
+    assert read_library_cache(cache_path) == ('wand.dll', 'magick.dll')
+    monkeypatch.delenv('MAGICK_HOME')
+    assert read_library_cache(cache_path) == ('libwand.so', 'libwand.so')
+
+
+def test_load_library_stale_cache(monkeypatch, tmpdir):
+    cache_path = str(tmpdir.join('library-paths'))
+    monkeypatch.setenv('WAND_LIBRARY_CACHE', cache_path)
+    write_library_cache(cache_path, '/nonexistent/libMagickWand.so',
+                        '/nonexistent/libMagickWand.so')
+    libwand, _ = load_library()
+    assert libwand._name == library.cdll._name
+    assert read_library_cache(cache_path)[0] == libwand._name
+    libwand, _ = load_library()
+    assert libwand._name == library.cdll._name
+
+
+def test_load_library_invalid_cache(monkeypatch, tmpdir):
+    libc_path = ctypes.util.find_library('c')
+    if not libc_path:
+        skip('cannot find the C library')
+    cache_path = str(tmpdir.join('library-paths'))
+    monkeypatch.setenv('WAND_LIBRARY_CACHE', cache_path)
+    write_library_cache(cache_path, libc_path, libc_path)
+    libwand, _ = load_library()
+    assert libwand._name == library.cdll._name
+    assert read_library_cache(cache_path)[0] == libwand._name
+
+
+def test_drop_library_cache(tmpdir):
+    cache_path = str(tmpdir.join('library-paths'))
+    write_library_cache(cache_path, 'libwand.so', 'libwand.so')
+    drop_library_cache(cache_path)
+    assert read_library_cache(cache_path) is None
+    drop_library_cache(str(tmpdir.join('nonexistent')))
+    assert not tmpdir.join('nonexistent').check()
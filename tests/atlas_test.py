@@ -0,0 +1,56 @@
+from pytest import raises
+
+from wand.atlas import pack, skyline_layout
+from wand.color import Color
+from wand.image import Image
+
+
+def test_skyline_layout():
+    positions, size = skyline_layout([(10, 10), (20, 5), (5, 20)], (32, 32),
+                                     padding=2)
+    assert positions == [(7, 0), (7, 12), (0, 0)]
+    assert size == (27, 20)
+    positions, size = skyline_layout([(16, 16)] * 4, (32, 32))
+    assert sorted(positions) == [(0, 0), (0, 16), (16, 0), (16, 16)]
+    assert size == (32, 32)
+    with raises(ValueError):
+        skyline_layout([(16, 16)] * 5, (32, 32))
+    with raises(ValueError):
+        skyline_layout([(33, 1)], (32, 32))
+
+
+def test_pack():
+    colors = {'red': (30, 10), 'lime': (10, 30), 'blue': (20, 20)}
+    images = dict((name, Image(width=w, height=h, background=Color(name)))
+                  for name, (w, h) in colors.items())
+    try:
+        sheet, boxes = pack(images, max_size=64, padding=1)
+        with sheet:
+            assert sheet.width <= 64 and sheet.height <= 64
+            assert sorted(boxes) == sorted(colors)
+            for name, (left, top, width, height) in boxes.items():
+                assert (width, height) == colors[name]
+                assert sheet[left, top] == Color(name)
+                assert sheet[left + width - 1, top + height - 1] == \
+                    Color(name)
+    finally:
+        for image in images.values():
+            image.close()
+
+
+def test_pack_sequence(fx_asset):
+    with Image(filename=str(fx_asset.join('mona-lisa.jpg'))) as img:
+        sheet, boxes = pack([img, img], max_size=(1024, 1024))
+        with sheet:
+            assert boxes[0] == (0, 0) + img.size
+            assert boxes[1] == (img.width, 0) + img.size
+            assert sheet.size == (img.width * 2, img.height)
+            with sheet[:img.width, :] as left:
+                assert left.compare(img, 'peak_absolute',
+                                    return_image=False) < 0.01
+        with raises(ValueError):
+            pack([img, img], max_size=img.width)
+        with raises(ValueError):
+            pack([])
+        with raises(TypeError):
+            pack(['mona-lisa.jpg'])
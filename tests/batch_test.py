@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+
+from pytest import raises
+
+from wand.batch import load_recipe, main, parse_operation, run
+from wand.image import Image
+
+
+def test_parse_operation():
+    assert parse_operation(['strip']) == ('strip', (), {})
+    assert parse_operation('strip') == ('strip', (), {})
+    assert parse_operation(['resize', [10, 20]]) == ('resize', (10, 20), {})
+    assert parse_operation(['resize', {'width': 10}]) == (
+        'resize', (), {'width': 10}
+    )
+    assert parse_operation(['rotate', 90]) == ('rotate', (90,), {})
+    with raises(ValueError):
+        parse_operation(['no_such_method'])
+    with raises(ValueError):
+        parse_operation(['__init__'])
+    with raises(ValueError):
+        parse_operation([])
+    with raises(ValueError):
+        parse_operation(['destroy'])
+    with raises(ValueError):
+        parse_operation(['save', {'filename': 'out.png'}])
+    with raises(ValueError):
+        parse_operation(['clone'])
+
+
+def make_tree(fx_asset, tmpdir):
+    input_dir = tmpdir.join('inputs')
+    input_dir.join('sub').ensure(dir=True)
+    shutil.copy(str(fx_asset.join('mona-lisa.jpg')),
+                str(input_dir.join('a.jpg')))
+    shutil.copy(str(fx_asset.join('croptest.png')),
+                str(input_dir.join('sub', 'b.png')))
+    input_dir.join('notes.txt').write('not an image')
+    recipe_path = tmpdir.join('recipe.json')
+    recipe_path.write(json.dumps({
+        'include': ['*.jpg', '*.png'],
+        'format': 'png',
+        'operations': [['resize', [20, 10]], ['strip']],
+    }))
+    return str(recipe_path), str(input_dir), str(tmpdir.join('outputs'))
+
+
+def test_run(fx_asset, tmpdir):
+    recipe_path, input_dir, output_dir = make_tree(fx_asset, tmpdir)
+    recipe = load_recipe(recipe_path)
+    summary = run(recipe, input_dir, output_dir, processes=1)
+    assert summary['processed'] == 2
+    assert summary['skipped'] == 0
+    assert not summary['failed']
+    assert 'resize' in summary['timings']
+    for path in 'a.png', os.path.join('sub', 'b.png'):
+        with Image(filename=os.path.join(output_dir, path)) as img:
+            assert img.format == 'PNG'
+            assert img.size == (20, 10)
+    summary = run(recipe, input_dir, output_dir, processes=1)
+    assert summary['processed'] == 0
+    assert summary['skipped'] == 2
+    summary = run(recipe, input_dir, output_dir, processes=1, force=True)
+    assert summary['processed'] == 2
+
+
+def test_run_nested_output_dir(fx_asset, tmpdir):
+    recipe_path, input_dir, _ = make_tree(fx_asset, tmpdir)
+    recipe = load_recipe(recipe_path)
+    output_dir = os.path.join(input_dir, 'out')
+    summary = run(recipe, input_dir, output_dir, processes=1, force=True)
+    assert summary['processed'] == 2
+    summary = run(recipe, input_dir, output_dir, processes=1, force=True)
+    assert summary['processed'] == 2
+    assert not os.path.exists(os.path.join(output_dir, 'out'))
+
+
+def test_run_colliding_outputs(fx_asset, tmpdir):
+    recipe_path, input_dir, output_dir = make_tree(fx_asset, tmpdir)
+    shutil.copy(str(fx_asset.join('croptest.png')),
+                os.path.join(input_dir, 'a.png'))
+    recipe = load_recipe(recipe_path)
+    summary = run(recipe, input_dir, output_dir, processes=1)
+    assert summary['processed'] == 1
+    assert sorted(source for source, _ in summary['failed']) == [
+        os.path.join(input_dir, 'a.jpg'), os.path.join(input_dir, 'a.png')
+    ]
+    assert not os.path.exists(os.path.join(output_dir, 'a.png'))
+
+
+def test_main(fx_asset, tmpdir, capsys):
+    recipe_path, input_dir, output_dir = make_tree(fx_asset, tmpdir)
+    assert main(['-j', '2', recipe_path, input_dir, output_dir]) == 0
+    out, _ = capsys.readouterr()
+    assert 'processed 2 image(s), skipped 0, failed 0' in out
+    assert os.path.isfile(os.path.join(output_dir, 'sub', 'b.png'))
+
+
+def test_main_failure(tmpdir, capsys):
+    input_dir = tmpdir.join('inputs').ensure(dir=True)
+    input_dir.join('broken.png').write('not a png')
+    recipe_path = tmpdir.join('recipe.json')
+    recipe_path.write('{"operations": [["strip"]]}')
+    assert main([str(recipe_path), str(input_dir),
+                 str(tmpdir.join('outputs'))]) == 1
+    _, err = capsys.readouterr()
+    assert 'broken.png' in err
+    assert not tmpdir.join('outputs', 'broken.png').exists()
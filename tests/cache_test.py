@@ -0,0 +1,80 @@
+import os
+import time
+
+from wand.api import library
+from wand.cache import DerivativeCache, source_digest
+from wand.color import Color
+from wand.image import Image
+from wand.pipeline import Pipeline
+
+
+def test_source_digest(fx_asset):
+    path = str(fx_asset.join('mona-lisa.jpg'))
+    with open(path, 'rb') as f:
+        blob = f.read()
+    assert source_digest(path) == source_digest(path)
+    assert source_digest(path) != source_digest(blob)
+    with Image(width=2, height=2, background=Color('red')) as img:
+        assert source_digest(img) == source_digest(img.clone())
+        with Image(width=2, height=2, background=Color('blue')) as blue:
+            with img.clone() as a:
+                with img.clone() as b:
+                    a.sequence.append(img)
+                    b.sequence.append(blue)
+                    assert source_digest(a) != source_digest(b)
+                    assert source_digest(a) != source_digest(img)
+
+
+def test_key(tmpdir):
+    cache = DerivativeCache(str(tmpdir))
+    key = cache.key('abc', [('resize', (10, 20), {})], 'PNG')
+    assert key == cache.key('abc', [('resize', (10, 20), {})], 'png')
+    assert key != cache.key('abd', [('resize', (10, 20), {})], 'png')
+    assert key != cache.key('abc', [('resize', (10, 21), {})], 'png')
+    assert key != cache.key('abc', [('resize', (10, 20), {})], 'jpeg')
+    assert key != cache.key('abc', [('resize', (10, 20), {})], 'png',
+                            {'quality': 80})
+
+
+def test_get_put_evict(tmpdir):
+    cache = DerivativeCache(str(tmpdir), max_bytes=250)
+    cache.low_water_mark = 1
+    for i, key in enumerate(['aa01', 'aa02', 'bb03']):
+        cache.put(key, b'x' * 100)
+        path = cache.entry_path(key)
+        os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+        if i == 1:
+            assert cache.get('aa01') == b'x' * 100  # marks it recently used
+    assert cache.get('aa01') == b'x' * 100
+    assert cache.get('aa02') is None
+    assert cache.get('bb03') == b'x' * 100
+    assert cache.total_bytes() == 200
+    assert not [name for name in os.listdir(str(tmpdir.join('aa')))
+                if name.endswith('.tmp')]
+    cache.clear()
+    assert cache.total_bytes() == 0
+
+
+def test_pipeline_cache(fx_asset, tmpdir):
+    cache = DerivativeCache(str(tmpdir))
+    path = str(fx_asset.join('mona-lisa.jpg'))
+    blob = Pipeline(path).resize(20, 30).make_blob('png', cache=cache)
+    assert len(cache.entries()) == 1
+    pipeline = Pipeline(path).resize(20, 30)
+    assert pipeline.make_blob('png', cache=cache) == blob
+    assert not pipeline.timings  # never executed
+    Pipeline(path).resize(20, 31).make_blob('png', cache=cache)
+    assert len(cache.entries()) == 2
+
+
+def test_source_digest_attributes():
+    with Image(width=2, height=2, background=Color('red')) as img:
+        with img.clone() as rotated:
+            rotated.orientation = 'right_top'
+            assert source_digest(rotated) != source_digest(img)
+        with img.clone() as quality:
+            quality.compression_quality = 50
+            assert source_digest(quality) != source_digest(img)
+        with img.clone() as comment:
+            library.MagickSetImageProperty(comment.wand, b'comment', b'abc')
+            assert source_digest(comment) != source_digest(img)
@@ -0,0 +1,62 @@
+import os.path
+
+from pytest import raises
+
+from wand.compare import batch, compare_pair, passes
+from wand.image import Image
+
+
+def test_passes():
+    assert passes('root_mean_square', 0.01, 0.02)
+    assert not passes('root_mean_square', 0.03, 0.02)
+    assert passes('peak_signal_to_noise_ratio', 40, 30)
+    assert not passes('peak_signal_to_noise_ratio', 20, 30)
+
+
+def test_compare_pair(fx_asset):
+    beach = str(fx_asset.join('beach.jpg'))
+    watermark = str(fx_asset.join('watermark_beach.jpg'))
+    mona_lisa = str(fx_asset.join('mona-lisa.jpg'))
+    result = compare_pair(beach, beach, 'root_mean_square', 0)
+    assert result.passed and result.status == 'identical'
+    assert result.distortion == 0
+    result = compare_pair(beach, mona_lisa, 'root_mean_square', 1)
+    assert not result.passed and result.status == 'size_mismatch'
+    result = compare_pair(beach, watermark, 'root_mean_square', 0)
+    assert not result.passed and result.status == 'different'
+    assert result.distortion > 0
+    assert result.diff is None
+    result = compare_pair(beach, watermark, 'root_mean_square', 1)
+    assert result.passed and result.status == 'similar'
+    with open(beach, 'rb') as f:
+        with Image(filename=beach) as img:
+            result = compare_pair(f.read(), img, 'absolute', 0)
+            assert result.status == 'identical'
+    result = compare_pair(beach, str(fx_asset.join('nothing.png')),
+                          'absolute', 0)
+    assert not result.passed and result.status == 'error'
+    assert result.error
+    with raises(TypeError):
+        compare_pair(beach, 123, 'absolute', 0)
+
+
+def test_batch(fx_asset, tmpdir):
+    beach = str(fx_asset.join('beach.jpg'))
+    watermark = str(fx_asset.join('watermark_beach.jpg'))
+    mona_lisa = str(fx_asset.join('mona-lisa.jpg'))
+    pairs = [(beach, beach), (watermark, beach), (mona_lisa, beach)] * 3
+    diff_dir = str(tmpdir.join('diffs'))
+    results = batch(pairs, 'root_mean_square', threshold=0, workers=4,
+                    diff_dir=diff_dir)
+    assert [r.status for r in results] == \
+        ['identical', 'different', 'size_mismatch'] * 3
+    assert [r.actual for r in results] == [a for a, _ in pairs]
+    diffs = [r.diff for r in results if r.diff]
+    assert len(diffs) == 3
+    assert os.path.basename(diffs[0]) == '1-watermark_beach.png'
+    for diff in diffs:
+        with Image(filename=diff) as img:
+            assert img.format == 'PNG'
+    assert batch(pairs, workers=1) == batch(pairs, workers=2)
+    with raises(ValueError):
+        batch(pairs, 'wrong_metric')
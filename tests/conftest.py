@@ -2,6 +2,7 @@ import base64
 import inspect
 import json
 import os
+import sys
 try:
     from urllib import parse as urllib, request as urllib2
 except ImportError:
@@ -15,6 +16,12 @@ from wand.display import display as display_fn
 from wand.image import Image
 
 
+# Test modules that use syntax unavailable on older Python versions.
+collect_ignore = []
+if sys.version_info < (3, 5):
+    collect_ignore.append('aio_test.py')
+
+
 def pytest_addoption(parser):
     parser.addoption('--skip-slow', action='store_true',
                      help='Skip slow tests')
@@ -0,0 +1,60 @@
+import random
+
+from pytest import mark, raises
+
+from wand.hashing import (PERCEPTUAL_HASH_METHODS, HashIndex,
+                          hamming_distance, hash_pixels,
+                          perceptual_sample_size)
+
+
+def test_hamming_distance():
+    assert hamming_distance(0, 0) == 0
+    assert hamming_distance(0b1011, 0b0001) == 2
+    assert hamming_distance(2 ** 64 - 1, 0) == 64
+
+
+@mark.parametrize('method', PERCEPTUAL_HASH_METHODS)
+def test_hash_pixels(method):
+    width, height = perceptual_sample_size(method, 8)
+    gradient = bytearray((x * 255 // width) for y in range(height)
+                         for x in range(width))
+    reverse = bytearray(reversed(gradient))
+    a = hash_pixels(method, gradient, 8)
+    assert 0 <= a < 2 ** 64
+    assert a == hash_pixels(method, gradient, 8)
+    assert hamming_distance(a, hash_pixels(method, reverse, 8)) > 16
+    with raises(ValueError):
+        hash_pixels(method, gradient[1:], 8)
+
+
+def test_perceptual_sample_size():
+    assert perceptual_sample_size('dhash', 8) == (9, 8)
+    assert perceptual_sample_size('ahash', 8) == (8, 8)
+    assert perceptual_sample_size('phash', 8) == (32, 32)
+    with raises(ValueError):
+        perceptual_sample_size('md5', 8)
+    with raises(TypeError):
+        perceptual_sample_size('dhash', 1)
+
+
+def test_hash_index():
+    rng = random.Random(1234)
+    hashes = [rng.getrandbits(64) for _ in range(2000)]
+    index = HashIndex((h, i) for i, h in enumerate(hashes))
+    index.add(hashes[0], 'duplicate')
+    assert len(index) == 2001
+    assert set(h for h, _ in index) == set(hashes)
+    query = hashes[42] ^ 0b10110
+    expected = sorted(
+        (hamming_distance(query, h), h, i)
+        for i, h in enumerate(hashes)
+        if hamming_distance(query, h) <= 12
+    )
+    assert index.query(query, max_distance=12) == expected
+    assert index.query(query, max_distance=3) == [(3, hashes[42], 42)]
+    assert index.query(hashes[0]) == [(0, hashes[0], 0),
+                                      (0, hashes[0], 'duplicate')]
+    assert index.nearest(query) == (3, hashes[42], 42)
+    assert index.nearest(query, max_distance=2) is None
+    assert HashIndex().query(query, 10) == []
+    assert HashIndex().nearest(query) is None
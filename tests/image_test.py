@@ -3,19 +3,21 @@ import codecs
 import io
 import os
 import os.path
+import pickle
 import shutil
 import struct
 import sys
 import tempfile
 import warnings
 
-from pytest import config, mark, raises
+from pytest import config, mark, raises, skip
 
 from wand.image import ClosedImageError, Image, IMAGE_LAYER_METHOD
 from wand.color import Color
 from wand.compat import PY3, string_type, text, text_type
 from wand.exceptions import MissingDelegateError, OptionError
 from wand.font import Font
+from wand.hashing import hamming_distance
 
 try:
     filesystem_encoding = sys.getfilesystemencoding()
@@ -40,6 +42,25 @@ def test_empty_image():
         assert repr(img) == '<wand.image.Image: (empty)>'
 
 
+def test_lazy_image_properties():
+    with Image() as img:
+        for name in ('metadata', 'sequence', 'options', 'channel_images',
+                     'channel_depths'):
+            assert name not in img.__dict__
+        sequence = img.sequence
+        assert img.sequence is sequence
+        assert len(sequence) == 0
+        assert img.options is img.options
+
+
+def test_transparent_background_cache(fx_asset):
+    from wand.image import transparent_background
+    pixel_wand = transparent_background()
+    assert transparent_background() == pixel_wand
+    with Image(filename=str(fx_asset.join('mona-lisa.jpg'))):
+        assert transparent_background() == pixel_wand
+
+
 def test_image_invalid_params():
     with raises(TypeError):
         Image(image=Image(), width=100, height=100)
@@ -1072,6 +1093,93 @@ def test_object_hash(fx_asset):
         assert a == b
 
 
+def test_signature_cache(fx_asset):
+    """The cached signature is dropped when the image is manipulated."""
+    with Image(filename=str(fx_asset.join('mona-lisa.jpg'))) as img:
+        signature = img.signature
+        assert img._signature == (0, signature)
+        assert img.signature == signature
+        img.flip()
+        assert img._signature is None
+        flipped = img.signature
+        assert flipped != signature
+        img.negate()
+        assert img.signature not in (signature, flipped)
+    with Image(filename=str(fx_asset.join('apple.ico'))) as img:
+        first = img.signature
+        with img.sequence.index_context(1):
+            assert img.signature == img.sequence[1].signature
+        assert img.signature == first
+        del img.sequence[0]
+        assert img.signature != first
+
+
+def test_content_hash(fx_asset):
+    with Image(filename=str(fx_asset.join('mona-lisa.jpg'))) as img:
+        with img.convert('png') as same:
+            assert img.content_hash() == same.content_hash()
+            assert (img.content_hash('blake2b') ==
+                    same.content_hash('blake2b'))
+        digest = img.content_hash('blake2b')
+        assert img.content_hash('blake2b', storage='short') != digest
+        with img.clone() as flipped:
+            flipped.flip()
+            assert flipped.content_hash('blake2b') != digest
+        with raises(ValueError):
+            img.content_hash('md5')
+
+
+def test_content_hash_chunks(monkeypatch, fx_asset):
+    with Image(filename=str(fx_asset.join('mona-lisa.jpg'))) as img:
+        digest = img.content_hash('blake2b')
+        monkeypatch.setattr('wand.image.CONTENT_HASH_CHUNK_SIZE', 1000)
+        assert img.content_hash('blake2b') == digest
+
+
+def test_fingerprint(fx_asset):
+    with Image(filename=str(fx_asset.join('mona-lisa.jpg'))) as img:
+        fingerprint = img.fingerprint()
+        with img.convert('png') as same:
+            assert same.fingerprint() == fingerprint
+        assert img.fingerprint(size=8) != fingerprint
+        with img.clone() as flipped:
+            flipped.flip()
+            assert flipped.fingerprint() != fingerprint
+        with Image(filename=str(fx_asset.join('beach.jpg'))) as other:
+            assert other.fingerprint() != fingerprint
+    with Image(filename=str(fx_asset.join('apple.ico'))) as img:
+        assert img.fingerprint() == img.sequence[0].fingerprint()
+
+
+@mark.parametrize('method', ['ahash', 'dhash', 'phash'])
+def test_perceptual_hash(method, fx_asset):
+    with Image(filename=str(fx_asset.join('mona-lisa.jpg'))) as img:
+        signature = img.signature
+        original = img.perceptual_hash(method)
+        assert img.signature == signature
+        with img.clone() as similar:
+            similar.resize(img.width // 2, img.height // 2)
+            similar.gamma(1.1)
+            assert hamming_distance(original,
+                                    similar.perceptual_hash(method)) <= 10
+        with Image(filename=str(fx_asset.join('beach.jpg'))) as other:
+            assert hamming_distance(original,
+                                    other.perceptual_hash(method)) > 10
+        assert img.perceptual_hash(method, size=16) < 2 ** 256
+        with raises(ValueError):
+            img.perceptual_hash('md5')
+
+
+def test_equal_different_sizes(fx_asset):
+    """Images of different sizes aren't equal without their signatures."""
+    with Image(filename=str(fx_asset.join('mona-lisa.jpg'))) as a:
+        with a.clone() as b:
+            b.crop(0, 0, 10, 10)
+            assert a != b
+            assert a._signature is None
+            assert b._signature is None
+
+
 def test_get_alpha_channel(fx_asset):
     """Checks if image has alpha channel."""
     with Image(filename=str(fx_asset.join('watermark.png'))) as img:
@@ -1216,6 +1324,32 @@ def test_composite(fx_asset):
             assert img[130, 100].blue <= 1
 
 
+def test_flatten_layers(fx_asset):
+    with Image(filename=str(fx_asset.join('beach.jpg'))) as orig:
+        with Image(filename=str(fx_asset.join('watermark.png'))) as fg:
+            with Image(width=50, height=50,
+                       background=Color('red')) as square:
+                with orig.clone() as expected:
+                    expected.composite(fg, 5, 10)
+                    expected.composite_channel('default_channels', square,
+                                               'multiply', 300, 200)
+                    with orig.clone() as img:
+                        img.flatten_layers([(fg, 5, 10),
+                                            (square, 300, 200, 'multiply')])
+                        assert img.size == orig.size
+                        assert img[0, 0] == orig[0, 0]
+                        assert img.compare(expected, 'peak_absolute',
+                                           return_image=False) < 0.01
+                        assert img.signature != orig.signature
+            with orig.clone() as img:
+                img.flatten_layers([])
+                assert img.signature == orig.signature
+                with raises(ValueError):
+                    img.flatten_layers([(fg, 0, 0, 'nothing')])
+                with raises(TypeError):
+                    img.flatten_layers([('watermark.png', 0, 0)])
+
+
 def test_composite_channel(fx_asset):
     with Image(filename=str(fx_asset.join('beach.jpg'))) as orig:
         w, h = orig.size
@@ -1255,6 +1389,125 @@ def test_compare(fx_asset):
             cmp_img, err = orig.compare(img, 'absolute')
             cmp_img, err = orig.compare(img, 'mean_absolute')
             cmp_img, err = orig.compare(img, 'root_mean_square')
+            with cmp_img:
+                assert cmp_img.size == orig.size
+            assert orig.compare(img, 'root_mean_square',
+                                return_image=False) == err
+            assert orig.compare(orig, 'absolute', return_image=False) == 0
+            with raises(ValueError):
+                orig.compare(img, 'wrong_metric', return_image=False)
+
+
+def test_distortions(fx_asset):
+    with Image(filename=str(fx_asset.join('beach.jpg'))) as orig:
+        with Image(filename=str(fx_asset.join('watermark_beach.jpg'))) as img:
+            metrics = ['root_mean_square', 'absolute']
+            distortions = orig.distortions(img, metrics)
+            assert list(distortions) == metrics
+            for metric in metrics:
+                assert distortions[metric] == orig.compare(
+                    img, metric, return_image=False
+                )
+            assert orig.distortions(orig, ['mean_squared']) == {
+                'mean_squared': 0
+            }
+            with raises(TypeError):
+                orig.distortions(img, 'absolute')
+
+
+def negate_tile(tile):
+    tile.negate()
+
+
+@mark.parametrize('workers', [1, 4])
+def test_map_tiles(workers, fx_asset):
+    with Image(filename=str(fx_asset.join('beach.jpg'))) as img:
+        with img.clone() as expected:
+            expected.negate()
+            with img.clone() as tiled:
+                tiled.map_tiles(negate_tile, tile=(300, 250), overlap=0,
+                                workers=workers)
+                assert tiled.size == img.size
+                assert tiled == expected
+        with img.clone() as expected:
+            expected.gaussian_blur(3, 1)
+            with img.clone() as tiled:
+                tiled.map_tiles(lambda tile: tile.gaussian_blur(3, 1),
+                                tile=(128, 128), overlap=8, workers=workers)
+                assert expected.compare(tiled, 'peak_absolute',
+                                        return_image=False) < 0.01
+
+        def shrink(tile):
+            smaller = tile.clone()
+            smaller.resize(tile.width // 2, tile.height // 2)
+            return smaller
+        with raises(ValueError):
+            img.map_tiles(shrink, workers=workers)
+        with raises(TypeError):
+            img.map_tiles(lambda tile: 1, workers=workers)
+
+
+@mark.slow
+def test_map_tiles_processes(fx_asset):
+    with Image(filename=str(fx_asset.join('beach.jpg'))) as img:
+        with img.clone() as expected:
+            expected.negate()
+            img.map_tiles(negate_tile, tile=(300, 250), overlap=4,
+                          workers=2, processes=True)
+            assert expected.compare(img, 'peak_absolute',
+                                    return_image=False) < 0.01
+
+
+def test_diff_bounds():
+    with Image(width=100, height=70, background=Color('white')) as a:
+        with a.clone() as b:
+            assert a.diff_bounds(b) == []
+            with Image(width=3, height=2, background=Color('red')) as dot:
+                b.composite(dot, 5, 3)
+                b.composite(dot, 60, 50)
+                b.composite(dot, 75, 65)
+            assert a.diff_bounds(b) == [(5, 3, 3, 2), (60, 50, 18, 17)]
+            assert a.diff_bounds(b, tile_size=1) == [
+                (5, 3, 3, 2), (60, 50, 3, 2), (75, 65, 3, 2)
+            ]
+            assert b.diff_bounds(a, tile_size=200) == [(5, 3, 73, 64)]
+            with Image(width=1, height=1, background=Color('#fefefe')) as dot:
+                b.composite(dot, 40, 30)
+            assert len(a.diff_bounds(b)) == 3
+            assert len(a.diff_bounds(b, fuzz=a.quantum_range // 100)) == 2
+        with a[:50, :50] as smaller:
+            with raises(ValueError):
+                a.diff_bounds(smaller)
+
+
+def test_diff_bounds_subtle():
+    with Image(width=40, height=30, background=Color('white')) as a:
+        if a.quantum_range <= 255:
+            skip('Q8 builds cannot represent the change')
+        with a.clone() as b:
+            pixel = b.export_pixels(12, 7, 1, 1, storage='short')
+            pixel[0] -= 1  # the least significant byte of the red value
+            b.import_pixels(pixel, 12, 7, 1, 1, storage='short')
+            assert a.diff_bounds(b) == [(12, 7, 1, 1)]
+            assert a.diff_bounds(b, fuzz=1) == []
+
+
+@mark.parametrize('levels', [None, 0])
+def test_find(levels, fx_asset):
+    with Image(filename=str(fx_asset.join('beach.jpg'))) as beach:
+        with beach[150:350, 100:250] as img:
+            with img[70:110, 20:60] as template:
+                x, y, score = img.find(template, levels=levels)
+                assert (x, y) == (70, 20)
+                assert score < 0.01
+                assert img.find(template, threshold=0.01,
+                                levels=levels)[:2] == (70, 20)
+            with Image(filename=str(fx_asset.join('mona-lisa.jpg'))) as other:
+                with other[:40, :40] as unrelated:
+                    assert img.find(unrelated, threshold=0.01,
+                                    levels=levels) is None
+            with raises(ValueError):
+                img.find(beach)
 
 
 def test_liquid_rescale(fx_asset):
@@ -2026,3 +2279,91 @@ def test_page_setter_items(fx_asset):
         assert img1.page == (6400, 4800, -12, 13)
         img1.page_y = -13
         assert img1.page == (6400, 4800, -12, -13)
+
+
+def test_export_import_pixels(fx_asset):
+    with Image(filename=str(fx_asset.join('croptest.png'))) as img:
+        pixels = img.export_pixels(channel_map='RGBA', storage='char')
+        assert isinstance(pixels, bytearray)
+        assert len(pixels) == img.width * img.height * 4
+        with Image(width=img.width, height=img.height) as copied:
+            copied.import_pixels(pixels, channel_map='RGBA', storage='char')
+            assert copied[0, 0] == img[0, 0]
+            assert copied[-1, -1] == img[-1, -1]
+            assert copied.dirty
+
+
+def test_export_import_pixels_long(fx_asset):
+    with Image(filename=str(fx_asset.join('croptest.png'))) as img:
+        pixels = img.export_pixels(channel_map='RGBA', storage='long')
+        assert len(pixels) == img.width * img.height * 4 * 4
+        with Image(width=img.width, height=img.height) as copied:
+            copied.import_pixels(pixels, channel_map='RGBA', storage='long')
+            assert copied[0, 0] == img[0, 0]
+            assert copied[-1, -1] == img[-1, -1]
+
+
+def test_export_pixels_into_buffer(fx_asset):
+    with Image(filename=str(fx_asset.join('croptest.png'))) as img:
+        expected = img.export_pixels(x=10, y=20, width=5, height=3,
+                                     channel_map='RGB', storage='short')
+        buffer = bytearray(len(expected) + 8)
+        assert img.export_pixels(x=10, y=20, width=5, height=3,
+                                 channel_map='RGB', storage='short',
+                                 buffer=buffer) is buffer
+        assert buffer[:len(expected)] == expected
+        with raises(ValueError):
+            img.export_pixels(buffer=bytearray(4))
+
+
+def test_export_pixels_invalid_args(fx_asset):
+    with Image(filename=str(fx_asset.join('croptest.png'))) as img:
+        with raises(ValueError):
+            img.export_pixels(channel_map='RGBX')
+        with raises(ValueError):
+            img.export_pixels(storage='quantum')
+        with raises(TypeError):
+            img.export_pixels(x=-1)
+        with raises(ValueError):
+            img.import_pixels(b'\x00', channel_map='RGBA')
+
+
+@mark.parametrize('protocol', range(pickle.HIGHEST_PROTOCOL + 1))
+def test_pickle(fx_asset, protocol):
+    with Image(filename=str(fx_asset.join('beach.jpg'))) as img:
+        dumped = pickle.dumps(img, protocol)
+        with pickle.loads(dumped) as loaded:
+            assert loaded.format == img.format == 'JPEG'
+            assert loaded.size == img.size
+            assert loaded.depth == img.depth
+            assert loaded.colorspace == img.colorspace
+            assert loaded.signature == img.signature
+            assert dict(loaded.metadata) == dict(img.metadata)
+
+
+def test_pickle_sequence(fx_asset):
+    with Image(filename=str(fx_asset.join('nocomments-delay-100.gif'))) as img:
+        with pickle.loads(pickle.dumps(img)) as loaded:
+            assert len(loaded.sequence) == len(img.sequence)
+            for a, b in zip(loaded.sequence, img.sequence):
+                assert a.signature == b.signature
+                assert a.delay == b.delay
+                assert a.page == b.page
+
+
+def test_pickle_empty():
+    with Image() as img:
+        with pickle.loads(pickle.dumps(img)) as loaded:
+            assert loaded.size == (0, 0)
+
+
+@mark.skipif(not hasattr(pickle, 'PickleBuffer'),
+             reason='pickle protocol 5 is unavailable')
+def test_pickle_out_of_band(fx_asset):
+    with Image(filename=str(fx_asset.join('mona-lisa.jpg'))) as img:
+        buffers = []
+        dumped = pickle.dumps(img, 5, buffer_callback=buffers.append)
+        assert buffers
+        assert len(dumped) < len(buffers[0].raw())
+        with pickle.loads(dumped, buffers=buffers) as loaded:
+            assert loaded.signature == img.signature
@@ -0,0 +1,50 @@
+from pytest import raises
+
+from wand.color import Color
+from wand.image import Image
+from wand.montage import contact_sheet, thumbnail
+
+
+def test_thumbnail(fx_asset):
+    beach = str(fx_asset.join('beach.jpg'))
+    with thumbnail(beach, 100, 100) as thumb:
+        assert thumb.size == (100, 75)
+    with open(beach, 'rb') as f:
+        with thumbnail(f, 200, 100) as thumb:
+            assert thumb.size == (133, 100)
+    with Image(filename=str(fx_asset.join('mona-lisa.jpg'))) as img:
+        with thumbnail(img, 1000, 1000) as thumb:
+            assert thumb.size == img.size
+        with thumbnail(img, 1000, 1000, upscale=True) as thumb:
+            assert thumb.size == (671, 1000)
+        assert img.size == (402, 599)
+    with thumbnail(str(fx_asset.join('apple.ico')), 16, 16) as thumb:
+        assert len(thumb.sequence) == 1
+    with raises(TypeError):
+        thumbnail(123, 16, 16)
+
+
+def test_contact_sheet(fx_asset):
+    filenames = [str(fx_asset.join(name))
+                 for name in ('beach.jpg', 'mona-lisa.jpg', 'beach.jpg')]
+    with contact_sheet(filenames, columns=2, cell_size=(100, 100),
+                       spacing=10) as sheet:
+        assert sheet.size == (230, 230)
+        assert sheet[5, 5] == Color('white')
+        # the beach in the first cell is 100x75, centered vertically
+        assert sheet[60, 15] == Color('white')
+        assert sheet[60, 25] != Color('white')
+        # the third cell is empty on its right
+        assert sheet[180, 180] == Color('white')
+    with contact_sheet((f for f in filenames), columns=5,
+                       cell_size=(50, 50), spacing=0, count=3) as sheet:
+        assert sheet.size == (150, 50)
+    with raises(TypeError):
+        contact_sheet((f for f in filenames), columns=5)
+    with contact_sheet(iter(filenames), columns=5, cell_size=(50, 50),
+                       count=1) as sheet:
+        assert sheet.size == (58, 58)
+    with raises(ValueError):
+        contact_sheet([], columns=2)
+    with raises(TypeError):
+        contact_sheet(filenames, columns=0)
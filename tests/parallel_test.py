@@ -0,0 +1,99 @@
+import os
+
+from pytest import mark, raises
+
+from wand.color import Color
+from wand.image import Image
+from wand.parallel import (export_image, import_image, initialize_worker,
+                           process_map)
+
+
+def flop(image):
+    image.flop()
+
+
+def halve(image):
+    resized = image.clone()
+    resized.resize(image.width // 2, image.height // 2)
+    return resized
+
+
+def size_of(image):
+    return image.size
+
+
+def fail_if_small(image):
+    if image.width < 10:
+        raise ValueError('too small')
+
+
+def test_export_import_image(fx_asset):
+    with Image(filename=str(fx_asset.join('croptest.png'))) as img:
+        for shared in True, False:
+            descriptor, block = export_image(img, 'RGBA', 'char',
+                                             shared=shared)
+            try:
+                with import_image(descriptor, 'RGBA', 'char') as copied:
+                    assert copied.size == img.size
+                    assert copied[0, 0] == img[0, 0]
+                    assert copied[-1, -1] == img[-1, -1]
+            finally:
+                if block is not None:
+                    block.close()
+                    block.unlink()
+
+
+@mark.slow
+def test_process_map(fx_asset):
+    with Image(filename=str(fx_asset.join('croptest.png'))) as img:
+        results = process_map(flop, [img, img], processes=2)
+        try:
+            assert len(results) == 2
+            for result in results:
+                assert result.size == img.size
+                assert result[0, 0] == img[-1, 0]
+        finally:
+            for result in results:
+                result.close()
+
+
+@mark.slow
+def test_process_map_values_and_filenames(fx_asset):
+    filename = str(fx_asset.join('croptest.png'))
+    with Image(filename=filename) as img:
+        with Color('red') as red:
+            with Image(width=4, height=6, background=red) as blank:
+                sizes = process_map(size_of, [filename, blank])
+                assert sizes == [img.size, (4, 6)]
+        results = process_map(halve, [img])
+        with results[0] as halved:
+            assert halved.size == (img.width // 2, img.height // 2)
+
+
+@mark.slow
+@mark.skipif(not os.path.isdir('/dev/shm'), reason='no /dev/shm')
+def test_process_map_error_unlinks_shared_memory(fx_asset):
+    before = set(os.listdir('/dev/shm'))
+    with Image(filename=str(fx_asset.join('croptest.png'))) as img:
+        with Image(width=4, height=4) as small:
+            with raises(ValueError):
+                process_map(fail_if_small, [img, small, img, img] * 3,
+                            processes=2)
+    assert set(os.listdir('/dev/shm')) <= before
+
+
+def test_process_map_invalid_args():
+    with raises(TypeError):
+        process_map(None, [])
+    with raises(TypeError):
+        process_map(size_of, [object()])
+
+
+def test_initialize_worker():
+    from wand import resource
+    count = resource.reference_count
+    initialize_worker()
+    try:
+        assert resource.reference_count == count + 1
+    finally:
+        resource.decrement_refcount()
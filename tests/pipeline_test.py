@@ -0,0 +1,114 @@
+from pytest import raises
+
+from wand.color import Color
+from wand.image import Image
+from wand.pipeline import Pipeline, crop_box, decode_hint, optimize
+
+
+def op(name, *args, **kwargs):
+    return name, args, kwargs
+
+
+def test_crop_box():
+    assert crop_box((100, 50)) == (0, 0, 100, 50)
+    assert crop_box((100, 50), 10, 20, -10, -5) == (10, 20, 80, 25)
+    assert crop_box((100, 50), width=20, height=10,
+                    gravity='center') == (40, 20, 20, 10)
+    assert crop_box((100, 50), 90, 0, width=20) == (90, 0, 10, 50)
+    with raises(ValueError):
+        crop_box((100, 50), right=10, width=10)
+    with raises(ValueError):
+        crop_box((100, 50), reset_coords=False)
+
+
+def test_optimize_crop_before_resize():
+    plan = optimize([op('resize', 500, 250),
+                     op('crop', 100, 50, width=200, height=100),
+                     op('strip')],
+                    (1000, 500))
+    assert plan == [
+        ('strip',),
+        ('crop', 200, 100, 400, 200),
+        ('resize', 400, 200, 200, 100, 'undefined', 1),
+    ]
+
+
+def test_optimize_collapse_resizes():
+    plan = optimize([op('resize', 500, 250), op('resize', 100, 50)],
+                    (1000, 500))
+    assert plan == [('resize', 1000, 500, 100, 50, 'undefined', 1)]
+    assert optimize([op('resize', 1000, 500)], (1000, 500)) == []
+
+
+def test_optimize_rotations():
+    assert optimize([op('rotate', 90)], (10, 20)) == [
+        ('transpose',), ('flop',)
+    ]
+    assert optimize([op('rotate', 90), op('rotate', 90)],
+                    (10, 20)) == [('flip',), ('flop',)]
+    assert optimize([op('rotate', -90)], (10, 20)) == [
+        ('transpose',), ('flip',)
+    ]
+    assert optimize([op('rotate', 180), op('rotate', degree=180)],
+                    (10, 20)) == []
+    with raises(ValueError):
+        optimize([op('rotate', 45)], (10, 20))
+
+
+def test_decode_hint():
+    assert decode_hint([op('strip'), op('auto_orient'),
+                        op('resize', 800, 600)]) == '800x800'
+    assert decode_hint([op('crop', 10), op('resize', 80, 60)]) is None
+    assert decode_hint([op('resize', 80)]) is None
+    assert decode_hint([op('rotate', 45), op('resize', 80, 60)]) is None
+
+
+def eager(source, operations):
+    with Image(filename=source) as img:
+        for name, args, kwargs in operations:
+            getattr(img, name)(*args, **kwargs)
+        return img.size, img.signature
+
+
+def test_pipeline_geometry(fx_asset):
+    source = str(fx_asset.join('mona-lisa.jpg'))
+    operations = [op('auto_orient'), op('resize', 200, 300),
+                  op('crop', 50, 60, width=100, height=120),
+                  op('rotate', 90), op('strip'), op('flop')]
+    pipeline = Pipeline(source)
+    for name, args, kwargs in operations:
+        getattr(pipeline, name)(*args, **kwargs)
+    with pipeline.execute() as img:
+        assert img.size == eager(source, operations)[0] == (120, 100)
+    assert list(pipeline.timings)[0] == 'read'
+    assert 'resize' in pipeline.timings
+    assert 'rotate' not in pipeline.timings
+    assert 'transpose' in pipeline.timings
+
+
+def test_pipeline_exact_without_optimization(fx_asset):
+    source = str(fx_asset.join('mona-lisa.jpg'))
+    operations = [op('resize', 200, 300), op('crop', 10, 10, 110, 110),
+                  op('rotate', 270)]
+    pipeline = Pipeline(source, optimize=False, hints=False)
+    for operation in operations:
+        name, args, kwargs = operation
+        pipeline.record(name, *args, **kwargs)
+    with pipeline.execute() as img:
+        assert (img.size, img.signature) == eager(source, operations)
+
+
+def test_pipeline_from_image():
+    with Image(width=40, height=20, background=Color('red')) as img:
+        blob = img.pipeline().resize(20, 10).convert('png').make_blob()
+        assert img.size == (40, 20)
+    with Image(blob=blob) as result:
+        assert result.format == 'PNG'
+        assert result.size == (20, 10)
+
+
+def test_pipeline_invalid():
+    with raises(TypeError):
+        Pipeline(123)
+    with raises(AttributeError):
+        Pipeline(b'').record('no_such_method')
@@ -0,0 +1,106 @@
+import os.path
+
+from pytest import mark, raises
+
+from wand.color import Color
+from wand.image import Image
+from wand.pyramid import generate, level_sizes, tile_boxes
+
+
+def test_level_sizes():
+    assert level_sizes(800, 600, 256) == [
+        (800, 600), (400, 300), (200, 150), (100, 75), (50, 38), (25, 19),
+        (13, 10), (7, 5), (4, 3), (2, 2), (1, 1)
+    ]
+    assert level_sizes(800, 600, 256, 'xyz') == [
+        (800, 600), (400, 300), (200, 150)
+    ]
+    assert level_sizes(100, 100, 256, 'zoomify') == [(100, 100)]
+
+
+def test_tile_boxes():
+    assert tile_boxes(600, 300, 256) == [
+        (0, 0, 0, 0, 256, 256),
+        (1, 0, 256, 0, 512, 256),
+        (2, 0, 512, 0, 600, 256),
+        (0, 1, 0, 256, 256, 300),
+        (1, 1, 256, 256, 512, 300),
+        (2, 1, 512, 256, 600, 300),
+    ]
+    assert tile_boxes(300, 200, 256, 1) == [
+        (0, 0, 0, 0, 257, 200),
+        (1, 0, 255, 0, 300, 200),
+    ]
+
+
+@mark.parametrize('workers', [1, 4])
+def test_generate_dzi(fx_asset, tmpdir, workers):
+    output = str(tmpdir.join('beach'))
+    with Image(filename=str(fx_asset.join('beach.jpg'))) as img:
+        summary = generate(img, output, workers=workers)
+        assert img.size == (800, 600)
+    assert summary == {'width': 800, 'height': 600, 'levels': 11,
+                       'tiles': 12 + 4 + 9}
+    with open(output + '.dzi') as descriptor:
+        dzi = descriptor.read()
+    assert 'TileSize="256"' in dzi and 'Overlap="1"' in dzi
+    assert 'Width="800"' in dzi and 'Height="600"' in dzi
+    files = os.path.join(output + '_files')
+    assert sorted(os.listdir(os.path.join(files, '10'))) == sorted(
+        '{0}_{1}.jpg'.format(column, row)
+        for column in range(4) for row in range(3)
+    )
+    with Image(filename=os.path.join(files, '10', '1_1.jpg')) as tile:
+        assert tile.size == (258, 258)
+    with Image(filename=os.path.join(files, '10', '3_2.jpg')) as tile:
+        assert tile.size == (33, 89)
+    with Image(filename=os.path.join(files, '0', '0_0.jpg')) as tile:
+        assert tile.size == (1, 1)
+
+
+def test_generate_zoomify(fx_asset, tmpdir):
+    output = str(tmpdir.join('beach'))
+    summary = generate(str(fx_asset.join('beach.jpg')), output,
+                       layout='zoomify', format='png')
+    assert summary['levels'] == 3 and summary['tiles'] == 1 + 4 + 12
+    group = os.path.join(output, 'TileGroup0')
+    assert len(os.listdir(group)) == 17
+    with Image(filename=os.path.join(group, '0-0-0.png')) as tile:
+        assert tile.size == (200, 150)
+    with Image(filename=os.path.join(group, '2-3-2.png')) as tile:
+        assert tile.size == (32, 88)
+    with open(os.path.join(output, 'ImageProperties.xml')) as properties:
+        assert 'NUMTILES="17"' in properties.read()
+
+
+def test_generate_xyz(fx_asset, tmpdir):
+    output = str(tmpdir.join('beach'))
+    with Image(filename=str(fx_asset.join('beach.jpg'))) as img:
+        generate(img, output, tile_size=128, layout='xyz')
+    assert sorted(os.listdir(output)) == ['0', '1', '2', '3']
+    assert sorted(os.listdir(os.path.join(output, '3'))) == [
+        str(x) for x in range(7)
+    ]
+    with Image(filename=os.path.join(output, '3', '6', '4.jpg')) as tile:
+        assert tile.size == (128, 128)
+
+
+def test_generate_xyz_background(fx_asset, tmpdir):
+    output = str(tmpdir.join('beach'))
+    with Image(filename=str(fx_asset.join('beach.jpg'))) as img:
+        generate(img, output, tile_size=128, layout='xyz', format='png',
+                 background=Color('blue'))
+    with Image(filename=os.path.join(output, '3', '6', '4.png')) as tile:
+        assert tile.size == (128, 128)
+        assert tile[127, 127] == Color('blue')
+        assert tile[0, 0] != Color('blue')
+
+
+def test_generate_error(fx_asset, tmpdir):
+    with Image(filename=str(fx_asset.join('beach.jpg'))) as img:
+        with raises(ValueError):
+            generate(img, str(tmpdir.join('a')), layout='tms')
+        with raises(TypeError):
+            generate(img, str(tmpdir.join('a')), tile_size=0)
+        with raises(TypeError):
+            generate(123, str(tmpdir.join('a')))
@@ -294,6 +294,14 @@ def test_clone(fx_asset):
             assert single.size == img.sequence[2].size
 
 
+def test_channels(fx_asset):
+    with Image(filename=str(fx_asset.join('apple.ico'))) as img:
+        single = img.sequence[2]
+        assert single.channel_depths['red'] == img.channel_depths['red']
+        with single.channel_images['red'] as red:
+            assert red.size == single.size
+
+
 def test_changes_reflected_back(fx_asset):
     """Changes on each single image should be reflected back to
     the container image.
@@ -0,0 +1,311 @@
+""":mod:`wand.aio` --- :mod:`asyncio` interface
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Every operation of Wand blocks the calling thread until ImageMagick
+finishes it.  This module runs them in a bounded pool of worker threads
+instead, so that image work never stalls an :mod:`asyncio` event loop::
+
+    from wand import aio
+
+    async def thumbnail(blob):
+        async with await aio.open(blob=blob) as img:
+            await img.aresize(128, 128)
+            return await img.amake_blob('png')
+
+Every method of :class:`~wand.image.Image` is available as a coroutine
+method prefixed with ``a`` e.g. :meth:`Image.resize()
+<wand.image.BaseImage.resize>` as ``aresize()``.  Other attributes are
+read and written by :meth:`~AsyncImage.aget()` and
+:meth:`~AsyncImage.aset()` coroutine methods, since even reading some of
+them e.g. :attr:`~wand.image.BaseImage.signature` takes long::
+
+    width, height = await img.aget('size')
+    await img.aset('format', 'png')
+
+.. note::
+
+   It requires Python 3.5 or higher.
+
+.. versionadded:: 0.4.5
+
+"""
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import threading
+
+from .image import BaseImage, Image
+
+__all__ = ('DEFAULT_MAX_WORKERS', 'AsyncImage', 'configure', 'get_executor',
+           'open', 'run')
+
+
+#: (:class:`numbers.Integral`) The default number of worker threads,
+#: i.e. the number of image operations that can run at the same time.
+DEFAULT_MAX_WORKERS = 4
+
+#: (:class:`concurrent.futures.Executor`) The executor to run operations.
+#:
+#: .. warning::
+#:
+#:    Don't touch this global variable.  Use :func:`configure()` and
+#:    :func:`get_executor()` functions instead.
+current_executor = None
+
+executor_lock = threading.Lock()
+
+
+def configure(max_workers=None, executor=None):
+    """Configures the executor which runs image operations.
+
+    :param max_workers: the maximum number of operations running at
+                        the same time.  :const:`DEFAULT_MAX_WORKERS`
+                        by default
+    :type max_workers: :class:`numbers.Integral`
+    :param executor: an executor to use instead of the default
+                     :class:`~concurrent.futures.ThreadPoolExecutor`.
+                     ``max_workers`` cannot be used together
+    :type executor: :class:`concurrent.futures.Executor`
+
+    """
+    global current_executor
+    if max_workers is not None and executor is not None:
+        raise TypeError('max_workers and executor parameters are exclusive '
+                        'each other; use only one at once')
+    if executor is None:
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers or DEFAULT_MAX_WORKERS
+        )
+    with executor_lock:
+        previous = current_executor
+        current_executor = executor
+    if previous is not None:
+        previous.shutdown(wait=False)
+
+
+def get_executor():
+    """Gets the executor which runs image operations, making the default
+    one if it's not configured yet.
+
+    :returns: the executor
+    :rtype: :class:`concurrent.futures.Executor`
+
+    """
+    global current_executor
+    if current_executor is None:
+        with executor_lock:
+            if current_executor is None:
+                current_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=DEFAULT_MAX_WORKERS
+                )
+    return current_executor
+
+
+async def run(function, *args, **kwargs):
+    """Runs the blocking ``function`` in the executor.
+
+    If the awaiting task is cancelled before the ``function`` starts,
+    it never runs.  A ``function`` already running can't be interrupted,
+    but its result is discarded.
+
+    :param function: the function to call
+    :type function: :class:`collections.Callable`
+    :returns: the result of the ``function``
+
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except AttributeError:
+        loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        get_executor(),
+        functools.partial(function, *args, **kwargs)
+    )
+
+
+async def open(*args, **kwargs):
+    """Opens an image in the executor.  It takes the same
+    parameters as :class:`~wand.image.Image`::
+
+        img = await aio.open(filename='pikachu.png')
+
+    :returns: the opened image
+    :rtype: :class:`AsyncImage`
+
+    """
+    return AsyncImage(await run(Image, *args, **kwargs))
+
+
+class AsyncImage(object):
+    """The :mod:`asyncio` wrapper of :class:`~wand.image.Image`.
+    Use :func:`open()` to make one.
+
+    Operations on the same image never run at the same time, because
+    :class:`~wand.image.Image` objects aren't thread-safe.
+
+    :param image: the image to wrap
+    :type image: :class:`~wand.image.BaseImage`
+
+    """
+
+    #: (:class:`frozenset`) The names of attributes of the wrapper itself.
+    own_attributes = frozenset(['image', 'lock'])
+
+    def __init__(self, image):
+        if not isinstance(image, BaseImage):
+            raise TypeError('expected a wand.image.BaseImage instance, '
+                            'not ' + repr(image))
+        #: (:class:`~wand.image.BaseImage`) The wrapped image.
+        self.image = image
+        self.lock = threading.Lock()
+
+    def call(self, name, *args, **kwargs):
+        """Calls the method of the given ``name`` of the wrapped image
+        while holding the lock.  Images returned by the method are
+        wrapped by :class:`AsyncImage` as well.
+
+        .. note::
+
+           It's blocking.  Use ``a``-prefixed coroutine methods instead.
+
+        """
+        with self.lock:
+            result = getattr(self.image, name)(*args, **kwargs)
+        if isinstance(result, BaseImage) and result is not self.image:
+            return type(self)(result)
+        return result
+
+    def get(self, name):
+        """Gets the attribute of the given ``name`` of the wrapped image
+        while holding the lock.
+
+        .. note::
+
+           It's blocking.  Use :meth:`aget()` instead.
+
+        """
+        with self.lock:
+            return getattr(self.image, name)
+
+    def set(self, name, value):
+        """Sets the attribute of the given ``name`` of the wrapped image
+        while holding the lock.
+
+        .. note::
+
+           It's blocking.  Use :meth:`aset()` instead.
+
+        """
+        with self.lock:
+            setattr(self.image, name, value)
+
+    async def aget(self, name):
+        """Gets the attribute of the given ``name`` of the wrapped image
+        in the executor::
+
+            width, height = await img.aget('size')
+
+        :param name: the attribute name e.g. ``'size'``
+        :type name: :class:`str`
+        :returns: the attribute value
+
+        """
+        return await run(self.get, name)
+
+    async def aset(self, name, value):
+        """Sets the attribute of the given ``name`` of the wrapped image
+        in the executor::
+
+            await img.aset('format', 'png')
+
+        :param name: the attribute name e.g. ``'format'``
+        :type name: :class:`str`
+        :param value: the value to set
+
+        """
+        await run(self.set, name, value)
+
+    async def apply(self, operations):
+        """Applies the sequence of ``operations`` one by one::
+
+            await img.apply([
+                ('auto_orient',),
+                ('resize', (640, 480)),
+                ('strip',),
+            ])
+
+        Cancellation is checked between steps, so a cancelled task stops
+        after the operation currently running.
+
+        :param operations: the sequence of ``(name,)``, ``(name, args)``,
+                           or ``(name, args, kwargs)`` tuples
+        :type operations: :class:`collections.Sequence`
+        :returns: the list of results of the operations
+        :rtype: :class:`list`
+
+        """
+        results = []
+        for operation in operations:
+            name = operation[0]
+            args = tuple(operation[1]) if len(operation) > 1 else ()
+            kwargs = dict(operation[2]) if len(operation) > 2 else {}
+            if not callable(getattr(type(self.image), name, None)):
+                raise AttributeError('{0!r} has no method {1!r}'.format(
+                    self.image, name
+                ))
+            results.append(await run(self.call, name, *args, **kwargs))
+        return results
+
+    def __getattr__(self, name):
+        if name in self.own_attributes or name.startswith('__'):
+            raise AttributeError(name)
+        image_type = type(self.image)
+        if name.startswith('a'):
+            method = getattr(image_type, name[1:], None)
+            if inspect.isfunction(method) or inspect.ismethod(method):
+                @functools.wraps(method)
+                async def coroutine(*args, **kwargs):
+                    return await run(self.call, name[1:], *args, **kwargs)
+                return coroutine
+        # Attributes of the image aren't read from the event loop thread,
+        # where they could race with operations running in the executor.
+        attribute = getattr(image_type, name, None)
+        if inspect.isfunction(attribute) or inspect.ismethod(attribute):
+            raise AttributeError(
+                '{0!r} has no attribute {1!r}; use await img.a{1}() '
+                'instead'.format(self, name)
+            )
+        elif attribute is not None or name in vars(self.image):
+            raise AttributeError(
+                "{0!r} has no attribute {1!r}; use await img.aget({1!r}) "
+                'instead'.format(self, name)
+            )
+        raise AttributeError('{0!r} has no attribute {1!r}'.format(
+            self, name
+        ))
+
+    def __setattr__(self, name, value):
+        if name not in self.own_attributes:
+            raise AttributeError(
+                "cannot set {0!r} of {1!r}; use await img.aset({0!r}, ...) "
+                'instead'.format(name, self)
+            )
+        super(AsyncImage, self).__setattr__(name, value)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        await run(self.call, 'close')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.call('close')
+
+    def __repr__(self):
+        return '<{0}.{1} of {2!r}>'.format(
+            type(self).__module__, type(self).__name__, self.image
+        )
@@ -20,8 +20,10 @@ if platform.system() == "Windows":
     except ImportError:
         import _winreg as winreg
 
-__all__ = ('MagickPixelPacket', 'PointInfo', 'AffineMatrix', 'c_magick_char_p',
-           'library', 'libc', 'libmagick', 'load_library')
+__all__ = ('MagickPixelPacket', 'PointInfo', 'AffineMatrix', 'RectangleInfo',
+           'LazyLibrary',
+           'c_magick_char_p', 'bind_all', 'library', 'libc', 'libmagick',
+           'library_cache_path', 'load_library')
 
 
 class c_magick_char_p(ctypes.c_char_p):
@@ -114,28 +116,192 @@ def library_paths():
             yield libwand, libwand
 
 
+def library_cache_path():
+    """Gets the path of the file which caches successfully loaded library
+    paths, so that later processes don't have to search them again.
+    Searching calls :func:`ctypes.util.find_library()` many times, which
+    runs :program:`ldconfig` or :program:`gcc` on Linux.
+
+    It's :file:`$XDG_CACHE_HOME/wand/library-paths` (or
+    :file:`~/.cache/wand/library-paths`) by default.  It can be overridden
+    by :envvar:`WAND_LIBRARY_CACHE` environment variable, and an empty
+    :envvar:`WAND_LIBRARY_CACHE` turns caching off.  Caching is always
+    turned off on Windows, since :func:`library_paths()` has to configure
+    :envvar:`PATH` there anyway.
+
+    :returns: the path of the cache file, or ``None`` if caching is off
+    :rtype: :class:`str`
+
+    .. versionadded:: 0.4.5
+
+    """
+    path = os.environ.get('WAND_LIBRARY_CACHE')
+    if path is not None:
+        return path or None
+    if platform.system() == 'Windows':
+        return None
+    cache_home = os.environ.get('XDG_CACHE_HOME')
+    if not cache_home:
+        cache_home = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'wand', 'library-paths')
+
+
+def library_cache_key():
+    """Makes the key of library paths cached for the current environment.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    return '{0}/{1}/{2}bit:{3}'.format(
+        platform.system(), platform.machine(),
+        ctypes.sizeof(ctypes.c_void_p) * 8,
+        os.environ.get('MAGICK_HOME', '')
+    )
+
+
+def read_library_cache(cache_path):
+    """Reads the cached library paths for the current environment.
+
+    .. note::
+
+       It's only for internal use.
+
+    :returns: a pair of libwand and libmagick paths, or ``None``
+    :rtype: :class:`tuple`
+
+    """
+    key = library_cache_key()
+    try:
+        with open(cache_path) as cache_file:
+            for line in cache_file:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) == 3 and fields[0] == key:
+                    return fields[1], fields[2]
+    except (IOError, OSError, ValueError):
+        pass
+
+
+def write_library_cache(cache_path, libwand_path, libmagick_path):
+    """Caches the library paths for the current environment.  The file is
+    replaced atomically, and any errors are ignored since the cache is
+    only an optimization.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    entries = [library_cache_key(), libwand_path, libmagick_path]
+    if any('\t' in entry or '\n' in entry for entry in entries):
+        return
+    rewrite_library_cache(cache_path, '\t'.join(entries) + '\n')
+
+
+def drop_library_cache(cache_path):
+    """Removes the cached library paths for the current environment,
+    e.g. when they turned out to be stale.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    rewrite_library_cache(cache_path)
+
+
+def rewrite_library_cache(cache_path, line=None):
+    """Replaces the entry of the current environment with the ``line``,
+    or removes it if ``line`` is omitted, keeping entries of other
+    environments.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    key = library_cache_key()
+    lines = [line] if line else []
+    try:
+        with open(cache_path) as cache_file:
+            lines.extend(line for line in cache_file
+                         if not line.startswith(key + '\t'))
+    except (IOError, OSError, ValueError):
+        if not lines:
+            return
+    temp_path = '{0}.{1}.tmp'.format(cache_path, os.getpid())
+    try:
+        directory = os.path.dirname(cache_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(temp_path, 'w') as cache_file:
+            cache_file.writelines(lines)
+        os.rename(temp_path, cache_path)
+    except (IOError, OSError):
+        try:
+            os.remove(temp_path)
+        except (IOError, OSError):
+            pass
+
+
+def load_library_paths(libwand_path, libmagick_path):
+    """Loads the pair of libraries.
+
+    .. note::
+
+       It's only for internal use.
+
+    :raises OSError: when any of them fails to load, or isn't
+                     the expected library
+
+    """
+    libwand = ctypes.CDLL(libwand_path)
+    if libwand_path == libmagick_path:
+        libmagick = libwand
+    else:
+        libmagick = ctypes.CDLL(libmagick_path)
+    # A path can still load after an upgrade left an old or partial
+    # library behind, so make sure that it's really MagickWand.
+    for loaded, symbol in [(libwand, 'MagickWandGenesis'),
+                           (libmagick, 'AcquireExceptionInfo')]:
+        if not hasattr(loaded, symbol):
+            raise OSError('{0} has no {1}()'.format(loaded._name, symbol))
+    return libwand, libmagick
+
+
 def load_library():
     """Loads the MagickWand library.
 
+    .. versionchanged:: 0.4.5
+       Successfully loaded paths are cached in :func:`library_cache_path()`
+       and tried first next time.
+
     :returns: the MagickWand library and the ImageMagick library
     :rtype: :class:`ctypes.CDLL`
 
     """
+    cache_path = library_cache_path()
+    cached_paths = cache_path and read_library_cache(cache_path)
+    if cached_paths:
+        try:
+            return load_library_paths(*cached_paths)
+        except (IOError, OSError):
+            drop_library_cache(cache_path)
     tried_paths = []
     for libwand_path, libmagick_path in library_paths():
         if libwand_path is None or libmagick_path is None:
             continue
+        tried_paths.append(libwand_path)
+        if libwand_path != libmagick_path:
+            tried_paths.append(libmagick_path)
         try:
-            tried_paths.append(libwand_path)
-            libwand = ctypes.CDLL(libwand_path)
-            if libwand_path == libmagick_path:
-                libmagick = libwand
-            else:
-                tried_paths.append(libmagick_path)
-                libmagick = ctypes.CDLL(libmagick_path)
+            libraries = load_library_paths(libwand_path, libmagick_path)
         except (IOError, OSError):
             continue
-        return libwand, libmagick
+        if cache_path:
+            write_library_cache(cache_path, libwand_path, libmagick_path)
+        return libraries
     raise IOError('cannot find library; tried paths: ' + repr(tried_paths))
 
 
@@ -168,6 +334,14 @@ class PointInfo(ctypes.Structure):
                 ('y', ctypes.c_double)]
 
 
+class RectangleInfo(ctypes.Structure):
+
+    _fields_ = [('width', ctypes.c_size_t),
+                ('height', ctypes.c_size_t),
+                ('x', ctypes.c_ssize_t),
+                ('y', ctypes.c_ssize_t)]
+
+
 class AffineMatrix(ctypes.Structure):
     _fields_ = [('sx', ctypes.c_double),
                 ('rx', ctypes.c_double),
@@ -177,6 +351,136 @@ class AffineMatrix(ctypes.Structure):
                 ('ty', ctypes.c_double)]
 
 
+class Prototype(object):
+    """The declared prototype (e.g. ``argtypes``, ``restype``) of a function
+    in :class:`LazyLibrary`.  Attributes set to it are copied to the actual
+    function when it's bound.
+
+    """
+
+    def __repr__(self):
+        return '<{0}.{1} {2!r}>'.format(
+            type(self).__module__, type(self).__name__, vars(self)
+        )
+
+
+class LazyLibrary(object):
+    """The proxy of :class:`ctypes.CDLL` which binds function prototypes
+    lazily.  While it's declaring (i.e. until :meth:`end_declarations()`
+    is called) attribute assignments like::
+
+        library.NewMagickWand.argtypes = []
+        library.NewMagickWand.restype = ctypes.c_void_p
+
+    are only recorded in :attr:`prototypes`.  After that, each function is
+    looked up from the shared library and gets its recorded prototype on its
+    first access, and then cached as a plain attribute.  So processes pay
+    only for functions they actually call.
+
+    :param cdll: the shared library to wrap
+    :type cdll: :class:`ctypes.CDLL`
+
+    .. versionadded:: 0.4.5
+
+    """
+
+    def __init__(self, cdll):
+        #: (:class:`ctypes.CDLL`) The wrapped shared library.
+        self.cdll = cdll
+        #: (:class:`dict`) The declared :class:`Prototype`\ s by function
+        #: names.
+        self.prototypes = {}
+        #: (:class:`bool`) Whether prototypes are being declared.
+        self.declaring = True
+
+    def end_declarations(self):
+        """Ends declaring prototypes.  Functions are bound on their first
+        access after it's called.
+
+        """
+        self.declaring = False
+
+    def bind(self, name):
+        """Looks up the function of the given ``name`` and applies its
+        declared prototype.
+
+        :param name: the function name
+        :type name: :class:`str`
+        :returns: the bound function
+        :raises AttributeError: when the library has no such function
+
+        """
+        function = getattr(self.cdll, name)
+        prototype = self.prototypes.get(name)
+        if prototype is not None:
+            for attr, value in vars(prototype).items():
+                setattr(function, attr, value)
+        self.__dict__[name] = function
+        return function
+
+    def bind_all(self):
+        """Binds every declared function at once.
+
+        :returns: the names of declared functions that the library lacks
+                  e.g. ones added in later versions of ImageMagick
+        :rtype: :class:`list`
+
+        """
+        missing = []
+        for name in sorted(self.prototypes):
+            if name in self.__dict__:
+                continue
+            try:
+                self.bind(name)
+            except AttributeError:
+                missing.append(name)
+        return missing
+
+    def bound(self):
+        """Lists the names of functions bound so far.
+
+        :returns: the names of bound functions
+        :rtype: :class:`list`
+
+        """
+        return sorted(name for name, value in self.__dict__.items()
+                      if isinstance(value, ctypes._CFuncPtr))
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in ('cdll', 'prototypes',
+                                             'declaring'):
+            raise AttributeError(name)
+        if self.declaring:
+            try:
+                return self.prototypes[name]
+            except KeyError:
+                prototype = self.prototypes[name] = Prototype()
+                return prototype
+        return self.bind(name)
+
+    def __repr__(self):
+        return '<{0}.{1} {2!r}>'.format(
+            type(self).__module__, type(self).__name__, self.cdll
+        )
+
+
+def bind_all():
+    """Binds every function of :data:`library` and :data:`libmagick` at
+    once, instead of on their first use.  It's useful for pre-warming
+    long-running processes, or checking the library compatibility.
+
+    :returns: the names of declared functions that the loaded libraries lack
+    :rtype: :class:`list`
+
+    .. versionadded:: 0.4.5
+
+    """
+    missing = library.bind_all()
+    if libmagick is not library:
+        missing.extend(libmagick.bind_all())
+    return missing
+
+
 # Preserve the module itself even if it fails to import
 sys.modules['wand._api'] = sys.modules['wand.api']
 
@@ -209,15 +513,21 @@ except (OSError, IOError):
                       'You probably had not installed ImageMagick library.\n'
                       'Try to install:\n  ' + msg)
 
-#: (:class:`ctypes.CDLL`) The MagickWand library.
-library = libraries[0]
+#: (:class:`LazyLibrary`) The MagickWand library.
+#:
+#: .. versionchanged:: 0.4.5
+#:    It became :class:`LazyLibrary` which wraps :class:`ctypes.CDLL`.
+library = LazyLibrary(libraries[0])
 
-#: (:class:`ctypes.CDLL`) The ImageMagick library.  It is the same with
+#: (:class:`LazyLibrary`) The ImageMagick library.  It is the same with
 #: :data:`library` on platforms other than Windows.
 #:
 #: .. versionadded:: 0.1.10
-libmagick = libraries[1]
+libmagick = (library if libraries[1] is libraries[0]
+             else LazyLibrary(libraries[1]))
 
+# Prototypes below are only declared here; each function is bound on its
+# first use.  See LazyLibrary.
 try:
     library.MagickWandGenesis.argtypes = []
     library.MagickWandTerminus.argtypes = []
@@ -236,6 +546,9 @@ try:
     library.CloneMagickWand.argtypes = [ctypes.c_void_p]
     library.CloneMagickWand.restype = ctypes.c_void_p
 
+    library.MagickGetImage.argtypes = [ctypes.c_void_p]
+    library.MagickGetImage.restype = ctypes.c_void_p
+
     library.IsMagickWand.argtypes = [ctypes.c_void_p]
 
     library.MagickGetException.argtypes = [ctypes.c_void_p,
@@ -275,6 +588,20 @@ try:
     ]
     library.MagickGetImageProperties.restype = ctypes.POINTER(ctypes.c_char_p)
 
+    library.MagickGetImageProfiles.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_char_p,
+        ctypes.POINTER(ctypes.c_size_t)
+    ]
+    library.MagickGetImageProfiles.restype = ctypes.POINTER(ctypes.c_char_p)
+
+    library.MagickGetImageProfile.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_char_p,
+        ctypes.POINTER(ctypes.c_size_t)
+    ]
+    library.MagickGetImageProfile.restype = ctypes.POINTER(ctypes.c_ubyte)
+
     library.MagickSetImageProperty.argtypes = [ctypes.c_void_p,
                                                ctypes.c_char_p,
                                                ctypes.c_char_p]
@@ -453,6 +780,28 @@ try:
                                                ctypes.c_int]  # method
     library.MagickMergeImageLayers.restype = ctypes.c_void_p
 
+    library.MagickExportImagePixels.argtypes = [
+        ctypes.c_void_p,   # wand
+        ctypes.c_ssize_t,  # x
+        ctypes.c_ssize_t,  # y
+        ctypes.c_size_t,   # columns
+        ctypes.c_size_t,   # rows
+        ctypes.c_char_p,   # map
+        ctypes.c_int,      # StorageType
+        ctypes.c_void_p    # pixels
+    ]
+
+    library.MagickImportImagePixels.argtypes = [
+        ctypes.c_void_p,   # wand
+        ctypes.c_ssize_t,  # x
+        ctypes.c_ssize_t,  # y
+        ctypes.c_size_t,   # columns
+        ctypes.c_size_t,   # rows
+        ctypes.c_char_p,   # map
+        ctypes.c_int,      # StorageType
+        ctypes.c_void_p    # pixels
+    ]
+
     library.MagickResetIterator.argtypes = [ctypes.c_void_p]
 
     library.MagickSetLastIterator.argtypes = [ctypes.c_void_p]
@@ -608,6 +957,17 @@ try:
                                             ctypes.POINTER(ctypes.c_double)]
     library.MagickCompareImages.restype = ctypes.c_void_p
 
+    library.MagickGetImageDistortion.argtypes = [
+        ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int,
+        ctypes.POINTER(ctypes.c_double)
+    ]
+
+    library.MagickSimilarityImage.argtypes = [
+        ctypes.c_void_p, ctypes.c_void_p, ctypes.POINTER(RectangleInfo),
+        ctypes.POINTER(ctypes.c_double)
+    ]
+    library.MagickSimilarityImage.restype = ctypes.c_void_p
+
     library.MagickCompositeImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p,
                                              ctypes.c_int, ctypes.c_ssize_t,
                                              ctypes.c_ssize_t]
@@ -711,6 +1071,9 @@ try:
                                            ctypes.c_ssize_t]
     library.MagickSetImagePage.restype = ctypes.c_int
 
+    library.MagickSetImageCompose.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    library.MagickSetImageCompose.restype = ctypes.c_int
+
     library.MagickSetSize.argtypes = [ctypes.c_void_p,
                                       ctypes.c_uint,
                                       ctypes.c_uint]
@@ -1406,18 +1769,24 @@ try:
                                             ctypes.c_bool,
                                             ctypes.c_bool]
 
+    # MagickAutoOrientImage was added in 6.8.9+, we have a fallback function
+    # so it's fine that the library lacks it
+    library.MagickAutoOrientImage.argtypes = [ctypes.c_void_p]
+
+    library.end_declarations()
+    libmagick.end_declarations()
+
+    # Bind a few essential functions eagerly to detect incompatible libraries
+    # at import time.
+    library.MagickWandGenesis
+    library.MagickWandTerminus
+    library.NewMagickWand
+    libmagick.GetMagickVersion
 except AttributeError:
     raise ImportError('MagickWand shared library not found or incompatible\n'
                       'Original exception was raised in:\n' +
                       traceback.format_exc())
 
-try:
-    library.MagickAutoOrientImage.argtypes = [ctypes.c_void_p]
-except AttributeError:
-    # MagickAutoOrientImage was added in 6.8.9+, we have a fallback function
-    # so we pass silently if we cannot import it
-    pass
-
 
 #: (:class:`ctypes.CDLL`) The C standard library.
 libc = None
@@ -0,0 +1,165 @@
+""":mod:`wand.atlas` --- Sprite sheets
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+:func:`pack()` packs many small images e.g. icons into a sprite sheet
+(texture atlas), and tells where each of them is::
+
+    from wand.atlas import pack
+    from wand.image import Image
+
+    icons = dict((name, Image(filename=name + '.png')) for name in names)
+    sheet, boxes = pack(icons, max_size=1024, padding=2)
+    with sheet:
+        sheet.save(filename='sprites.png')
+    left, top, width, height = boxes['home']
+
+Images are placed by the skyline bottom-left heuristic from the tallest
+one, and flattened onto the sheet at once by
+:meth:`~wand.image.BaseImage.flatten_layers()` instead of calling
+:meth:`~wand.image.BaseImage.composite()` for each of them.
+
+.. versionadded:: 0.4.5
+
+"""
+import collections
+import numbers
+
+from .color import Color
+from .image import BaseImage, Image
+
+__all__ = 'pack', 'skyline_layout'
+
+
+def skyline_layout(sizes, max_size, padding=0):
+    """Places rectangles of ``sizes`` into a sheet of at most ``max_size``
+    by the skyline bottom-left heuristic.  Taller rectangles are placed
+    first, each at the lowest and then the leftmost position it fits.
+
+    :param sizes: ``(width, height)`` pairs of rectangles
+    :type sizes: :class:`collections.Sequence`
+    :param max_size: the maximum ``(width, height)`` of the sheet
+    :type max_size: :class:`collections.Sequence`
+    :param padding: the number of pixels between rectangles
+    :type padding: :class:`numbers.Integral`
+    :returns: the pair of the list of ``(left, top)`` positions in
+              the order of ``sizes``, and the ``(width, height)`` of
+              the sheet they actually use
+    :rtype: :class:`tuple`
+    :raises ValueError: when rectangles don't fit in ``max_size``
+
+    """
+    max_width, max_height = max_size
+    # Each rectangle takes its padding at its right and bottom, and
+    # the sheet is wider by the padding so that rectangles at the right
+    # edge don't need it.
+    bin_width = max_width + padding
+    order = sorted(range(len(sizes)),
+                   key=lambda i: (-sizes[i][1], -sizes[i][0], i))
+    # The skyline is the list of (left, top, width) segments from left
+    # to right, which covers the whole width of the sheet.
+    skyline = [(0, 0, bin_width)]
+    positions = [None] * len(sizes)
+    for i in order:
+        width, height = sizes[i]
+        width += padding
+        best = None
+        for index, (left, _, __) in enumerate(skyline):
+            right = left + width
+            if right > bin_width:
+                break
+            top = 0
+            for segment_left, segment_top, _ in skyline[index:]:
+                if segment_left >= right:
+                    break
+                top = max(top, segment_top)
+            if top + height > max_height:
+                continue
+            elif best is None or top < best[0]:
+                best = top, left, index
+        if best is None:
+            raise ValueError('{0}x{1} image does not fit in {2}x{3}'.format(
+                sizes[i][0], sizes[i][1], max_width, max_height
+            ))
+        top, left, index = best
+        positions[i] = left, top
+        right = left + width
+        bottom = top + height + padding
+        segments = skyline[:index]
+        segments.append((left, bottom, width))
+        for segment_left, segment_top, segment_width in skyline[index:]:
+            segment_right = segment_left + segment_width
+            if segment_right <= right:
+                continue
+            elif segment_left < right:
+                segments.append((right, segment_top, segment_right - right))
+            else:
+                segments.append((segment_left, segment_top, segment_width))
+        skyline = []
+        for segment in segments:
+            if skyline and skyline[-1][1] == segment[1]:
+                left, top, width = skyline[-1]
+                skyline[-1] = left, top, width + segment[2]
+            else:
+                skyline.append(segment)
+    used_width = max(left + width
+                     for (left, _), (width, __) in zip(positions, sizes))
+    used_height = max(top + height
+                      for (_, top), (__, height) in zip(positions, sizes))
+    return positions, (used_width, used_height)
+
+
+def pack(images, max_size=2048, padding=0, background=None):
+    """Packs ``images`` into a sprite sheet.
+
+    :param images: images to pack.  if it's a mapping, its keys are used
+                   as keys of the returned boxes instead of indices
+    :type images: :class:`collections.Sequence`,
+                  :class:`collections.Mapping`
+    :param max_size: the maximum width and height of the sheet, or
+                     the ``(width, height)`` pair.  2048 by default
+    :type max_size: :class:`numbers.Integral`, :class:`tuple`
+    :param padding: the number of pixels between images
+    :type padding: :class:`numbers.Integral`
+    :param background: the background color of the sheet.
+                       default is transparent
+    :type background: :class:`~wand.color.Color`
+    :returns: the pair of the sheet, which is as small as its images
+              fit in, and the dictionary of ``(left, top, width, height)``
+              boxes of images
+    :rtype: :class:`tuple`
+    :raises ValueError: when images don't fit in ``max_size``
+
+    """
+    if isinstance(images, collections.Mapping):
+        keys = list(images)
+        images = [images[key] for key in keys]
+    else:
+        images = list(images)
+        keys = list(range(len(images)))
+    if not images:
+        raise ValueError('images cannot be empty')
+    for image in images:
+        if not isinstance(image, BaseImage):
+            raise TypeError('expected wand.image.BaseImage instances, not ' +
+                            repr(image))
+    if isinstance(max_size, numbers.Integral):
+        max_size = max_size, max_size
+    if not isinstance(padding, numbers.Integral) or padding < 0:
+        raise TypeError('padding must be a natural number, not ' +
+                        repr(padding))
+    sizes = [image.size for image in images]
+    positions, size = skyline_layout(sizes, max_size, padding)
+    sheet = Image(width=size[0], height=size[1],
+                  background=background or Color('transparent'))
+    try:
+        layers = [(image, left, top, 'copy')
+                  for image, (left, top) in zip(images, positions)]
+        sheet.flatten_layers(layers)
+    except Exception:
+        sheet.close()
+        raise
+    boxes = dict(
+        (key, (left, top, width, height))
+        for key, (left, top), (width, height) in zip(keys, positions, sizes)
+    )
+    return sheet, boxes
@@ -0,0 +1,431 @@
+""":mod:`wand.batch` --- Batch processing with recipes
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+It applies a chain of image operations declared in a recipe file to every
+image in a directory tree, using a pool of worker processes:
+
+.. sourcecode:: console
+
+   $ python -m wand.batch recipe.json inputs/ outputs/
+   processed 120 image(s), skipped 3, failed 0 in 4.21s
+   28.50 image(s)/s, 12.34 MB/s read
+   read         1.802s
+   auto_orient  0.210s
+   resize       2.015s
+   write        3.908s
+
+A recipe is a JSON (or YAML, if PyYAML is installed) object like:
+
+.. sourcecode:: json
+
+   {
+       "include": ["*.jpg", "*.png"],
+       "format": "webp",
+       "operations": [
+           ["auto_orient"],
+           ["resize", [800, 600]],
+           ["crop", {"width": 400, "height": 300, "gravity": "center"}],
+           ["strip"]
+       ]
+   }
+
+``operations`` is the list of :class:`~wand.image.Image` method calls,
+each of which is ``[name]``, ``[name, args]``, ``[name, kwargs]``,
+or ``[name, args, kwargs]``.  Only methods which change the image in place
+(:const:`OPERATIONS`) are allowed.  They run through
+:class:`~wand.pipeline.Pipeline`, so they are reordered into a cheaper
+order.  ``include`` is the list of glob patterns of file names to process
+(every file by default), and ``format`` is the output format (the input
+format by default).
+
+Output files have the same relative paths as their inputs (with the
+extension of ``format`` if given).  Inputs which would be written to
+the same output e.g. :file:`a.jpg` and :file:`a.png` with ``format`` fail
+instead of overwriting each other.  Outputs newer than both their input
+and the recipe are skipped unless ``--force`` is given.
+
+.. versionadded:: 0.4.5
+
+"""
+from __future__ import print_function
+
+import argparse
+import collections
+import fnmatch
+import itertools
+import json
+import multiprocessing
+import os
+import os.path
+import sys
+import time
+
+from .compat import string_type
+from .parallel import initialize_worker
+from .pipeline import Pipeline
+
+__all__ = ('OPERATIONS', 'Job', 'load_recipe', 'main', 'make_pipeline',
+           'parse_operation', 'plan_jobs', 'run', 'run_job')
+
+
+#: (:class:`frozenset`) The names of :class:`~wand.image.Image` methods
+#: which recipes can use.  Only methods which change the image in place
+#: are allowed, so that recipes can't e.g. :meth:`~wand.image.Image.save()`
+#: or :meth:`~wand.resource.Resource.destroy()` the working image.
+OPERATIONS = frozenset([
+    'auto_orient', 'blur', 'border', 'caption', 'contrast_stretch', 'crop',
+    'distort', 'equalize', 'evaluate', 'extent', 'flip', 'flop', 'frame',
+    'function', 'gamma', 'gaussian_blur', 'level', 'linear_stretch',
+    'liquid_rescale', 'merge_layers', 'modulate', 'negate', 'normalize',
+    'quantize', 'resample', 'reset_coords', 'resize', 'rotate', 'sample',
+    'strip', 'threshold', 'transform', 'transform_colorspace',
+    'transparent_color', 'transparentize', 'transpose', 'transverse', 'trim',
+    'unsharp_mask'
+])
+
+
+#: (:class:`collections.namedtuple`) A file to process.  It consists of
+#: ``source`` and ``destination`` paths, and the ``recipe``.
+Job = collections.namedtuple('Job', ['source', 'destination', 'recipe'])
+
+
+def parse_operation(operation):
+    """Parses an operation of a recipe into a ``(name, args, kwargs)``
+    tuple.
+
+    :param operation: ``[name]``, ``[name, args]``, ``[name, kwargs]``,
+                      or ``[name, args, kwargs]``
+    :type operation: :class:`collections.Sequence`
+    :returns: the ``(name, args, kwargs)`` tuple
+    :rtype: :class:`tuple`
+    :raises ValueError: when the operation is invalid, or its name is not
+                        in :const:`OPERATIONS`
+
+    """
+    if isinstance(operation, string_type):
+        operation = [operation]
+    if not (isinstance(operation, (list, tuple)) and
+            1 <= len(operation) <= 3 and
+            isinstance(operation[0], string_type)):
+        raise ValueError('operation must be [name, args, kwargs], not ' +
+                         repr(operation))
+    name = operation[0]
+    args = []
+    kwargs = {}
+    for argument in operation[1:]:
+        if isinstance(argument, dict):
+            kwargs = argument
+        elif isinstance(argument, (list, tuple)):
+            args = argument
+        else:
+            args = [argument]
+    if name not in OPERATIONS:
+        raise ValueError(repr(name) + ' is not an allowed operation; see '
+                         'wand.batch.OPERATIONS')
+    return name, tuple(args), dict((str(k), v) for k, v in kwargs.items())
+
+
+def load_recipe(filename):
+    """Loads a recipe file.  Files of ``.yaml`` or ``.yml`` extension are
+    loaded as YAML, and others as JSON.
+
+    :param filename: the recipe filename
+    :type filename: :class:`basestring`
+    :returns: the recipe which has ``include``, ``format``,
+              and ``operations`` (parsed by :func:`parse_operation()`)
+    :rtype: :class:`dict`
+    :raises ValueError: when the recipe is invalid
+
+    """
+    with open(filename) as recipe_file:
+        if filename.lower().endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError('PyYAML is required to load YAML recipes')
+            recipe = yaml.safe_load(recipe_file)
+        else:
+            recipe = json.load(recipe_file)
+    if not isinstance(recipe, dict):
+        raise ValueError('recipe must be an object, not ' + repr(recipe))
+    unknown = set(recipe) - set(['include', 'format', 'operations'])
+    if unknown:
+        raise ValueError('unknown recipe keys: ' + ', '.join(sorted(unknown)))
+    include = recipe.get('include') or ['*']
+    if isinstance(include, string_type):
+        include = [include]
+    format = recipe.get('format')
+    if format is not None and not isinstance(format, string_type):
+        raise ValueError('format must be a string, not ' + repr(format))
+    return {
+        'include': list(include),
+        'format': format,
+        'operations': [parse_operation(operation)
+                       for operation in recipe.get('operations') or []],
+    }
+
+
+def plan_jobs(recipe, input_dir, output_dir, force=False,
+              recipe_mtime=0):
+    """Finds files to process in ``input_dir``.
+
+    :param recipe: the recipe loaded by :func:`load_recipe()`
+    :type recipe: :class:`dict`
+    :param input_dir: the directory of input images
+    :type input_dir: :class:`basestring`
+    :param output_dir: the directory to write output images
+    :type output_dir: :class:`basestring`
+    :param force: whether to process even up-to-date files
+    :type force: :class:`bool`
+    :param recipe_mtime: the modification time of the recipe.
+                         outputs older than it are outdated
+    :type recipe_mtime: :class:`numbers.Real`
+    :returns: the list of :class:`Job`\\ s to run, the number of
+              skipped up-to-date files, and the list of ``(job, error)``
+              pairs of files which can't be processed since other files
+              are written to the same destination
+    :rtype: :class:`tuple`
+
+    """
+    candidates = []
+    format = recipe['format']
+    output_path = os.path.realpath(output_dir)
+    for directory, dirnames, filenames in os.walk(input_dir):
+        # Outputs inside the input tree mustn't be processed again.
+        dirnames[:] = sorted(
+            dirname for dirname in dirnames
+            if os.path.realpath(os.path.join(directory, dirname)) !=
+            output_path
+        )
+        for filename in sorted(filenames):
+            if not any(fnmatch.fnmatch(filename, pattern)
+                       for pattern in recipe['include']):
+                continue
+            source = os.path.join(directory, filename)
+            relative = os.path.relpath(source, input_dir)
+            if format:
+                relative = os.path.splitext(relative)[0] + '.' + \
+                    format.lower()
+            candidates.append(Job(source, os.path.join(output_dir, relative),
+                                  recipe))
+    sources = collections.defaultdict(list)
+    for job in candidates:
+        sources[os.path.normcase(job.destination)].append(job.source)
+    jobs = []
+    skipped = 0
+    conflicts = []
+    for job in candidates:
+        colliding = sources[os.path.normcase(job.destination)]
+        if len(colliding) > 1:
+            conflicts.append((job, '{0} is also the output of {1}'.format(
+                job.destination,
+                ', '.join(s for s in colliding if s != job.source)
+            )))
+            continue
+        elif not force:
+            try:
+                mtime = os.path.getmtime(job.destination)
+            except OSError:
+                pass
+            else:
+                if mtime >= max(os.path.getmtime(job.source), recipe_mtime):
+                    skipped += 1
+                    continue
+        jobs.append(job)
+    return jobs, skipped, conflicts
+
+
+def make_pipeline(source, recipe):
+    """Makes a :class:`~wand.pipeline.Pipeline` of the ``recipe``.
+
+    :param source: the source of the pipeline e.g. a filename
+    :param recipe: the recipe loaded by :func:`load_recipe()`
+    :type recipe: :class:`dict`
+    :returns: the pipeline
+    :rtype: :class:`~wand.pipeline.Pipeline`
+
+    """
+    pipeline = Pipeline(source)
+    for name, args, kwargs in recipe['operations']:
+        pipeline.record(name, *args, **kwargs)
+    if recipe['format']:
+        pipeline.convert(recipe['format'])
+    return pipeline
+
+
+def run_job(job):
+    """Processes a :class:`Job`.  The output is written to a temporary file
+    first and then renamed, so that interrupted runs never leave
+    incomplete outputs which look up to date.
+
+    :param job: the job to run
+    :type job: :class:`Job`
+    :returns: the ``(job, error, timings, input_bytes)`` tuple.
+              ``error`` is the error message or ``None``
+    :rtype: :class:`tuple`
+
+    """
+    pipeline = make_pipeline(job.source, job.recipe)
+    temp_path = '{0}.{1}.tmp'.format(job.destination, os.getpid())
+    try:
+        input_bytes = os.path.getsize(job.source)
+        blob = pipeline.make_blob()
+        directory = os.path.dirname(job.destination)
+        if directory and not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+        with open(temp_path, 'wb') as output:
+            output.write(blob)
+        if os.name == 'nt' and os.path.exists(job.destination):
+            os.remove(job.destination)
+        os.rename(temp_path, job.destination)
+    except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return job, '{0}: {1}'.format(type(e).__name__, e), {}, 0
+    return job, None, dict(pipeline.timings), input_bytes
+
+
+def run(recipe, input_dir, output_dir, processes=None, force=False,
+        recipe_mtime=0, report=None):
+    """Applies the ``recipe`` to images in ``input_dir``.
+
+    :param recipe: the recipe loaded by :func:`load_recipe()`
+    :type recipe: :class:`dict`
+    :param input_dir: the directory of input images
+    :type input_dir: :class:`basestring`
+    :param output_dir: the directory to write output images
+    :type output_dir: :class:`basestring`
+    :param processes: the number of worker processes.  the number of CPUs
+                      by default.  1 to process in the current process
+    :type processes: :class:`numbers.Integral`
+    :param force: whether to process even up-to-date files
+    :type force: :class:`bool`
+    :param recipe_mtime: the modification time of the recipe
+    :type recipe_mtime: :class:`numbers.Real`
+    :param report: an optional function called with the result tuple of
+                   :func:`run_job()` for each file
+    :type report: :class:`collections.Callable`
+    :returns: the summary which has ``processed``, ``skipped``, ``failed``
+              (the list of ``(source, error)`` pairs), ``elapsed``,
+              ``input_bytes``, and ``timings`` (total seconds by stages)
+    :rtype: :class:`dict`
+
+    """
+    started_at = time.time()
+    jobs, skipped, conflicts = plan_jobs(recipe, input_dir, output_dir,
+                                         force=force,
+                                         recipe_mtime=recipe_mtime)
+    summary = {
+        'processed': 0,
+        'skipped': skipped,
+        'failed': [],
+        'input_bytes': 0,
+        'timings': collections.OrderedDict(),
+    }
+    if processes == 1 or len(jobs) < 2:
+        pool = None
+        results = (run_job(job) for job in jobs)
+    else:
+        pool = multiprocessing.Pool(processes, initializer=initialize_worker)
+        results = pool.imap_unordered(run_job, jobs)
+    results = itertools.chain(
+        ((job, error, {}, 0) for job, error in conflicts),
+        results
+    )
+    try:
+        for result in results:
+            job, error, timings, input_bytes = result
+            if error:
+                summary['failed'].append((job.source, error))
+            else:
+                summary['processed'] += 1
+                summary['input_bytes'] += input_bytes
+                for stage, seconds in timings.items():
+                    summary['timings'][stage] = \
+                        summary['timings'].get(stage, 0) + seconds
+            if report is not None:
+                report(result)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    summary['elapsed'] = time.time() - started_at
+    return summary
+
+
+def format_summary(summary):
+    """Formats the ``summary`` returned by :func:`run()` for humans.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    elapsed = summary['elapsed'] or 1e-9
+    lines = [
+        'processed {0} image(s), skipped {1}, failed {2} in {3:.2f}s'.format(
+            summary['processed'], summary['skipped'],
+            len(summary['failed']), summary['elapsed']
+        ),
+        '{0:.2f} image(s)/s, {1:.2f} MB/s read'.format(
+            summary['processed'] / elapsed,
+            summary['input_bytes'] / elapsed / 1000000
+        ),
+    ]
+    width = max([len(stage) for stage in summary['timings']] + [0])
+    for stage, seconds in summary['timings'].items():
+        lines.append('{0:{1}}  {2:.3f}s'.format(stage, width, seconds))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """The command line interface.
+
+    :param argv: the command line arguments without the program name
+    :type argv: :class:`collections.Sequence`
+    :returns: the exit status
+    :rtype: :class:`numbers.Integral`
+
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m wand.batch',
+        description='Applies a recipe of image operations to a directory '
+                    'tree of images.'
+    )
+    parser.add_argument('recipe', help='JSON or YAML recipe file')
+    parser.add_argument('input_dir', help='directory of input images')
+    parser.add_argument('output_dir', help='directory to write outputs')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of worker processes '
+                             '[default: number of CPUs]')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='process even up-to-date outputs')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='print each processed file')
+    args = parser.parse_args(argv)
+    try:
+        recipe = load_recipe(args.recipe)
+    except (IOError, OSError, ValueError) as e:
+        parser.error('invalid recipe: {0}'.format(e))
+    if not os.path.isdir(args.input_dir):
+        parser.error('not a directory: ' + args.input_dir)
+
+    def report(result):
+        job, error, _, __ = result
+        if error:
+            print('{0}: {1}'.format(job.source, error), file=sys.stderr)
+        elif args.verbose:
+            print('{0} -> {1}'.format(job.source, job.destination))
+    summary = run(recipe, args.input_dir, args.output_dir,
+                  processes=args.jobs, force=args.force,
+                  recipe_mtime=os.path.getmtime(args.recipe), report=report)
+    print(format_summary(summary))
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
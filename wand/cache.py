@@ -0,0 +1,338 @@
+""":mod:`wand.cache` --- Derived image cache
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+:class:`DerivativeCache` stores encoded results of
+:class:`~wand.pipeline.Pipeline`\\ s on disk, so that repeated requests for
+the same derivative of the same source skip decoding, processing, and
+encoding entirely::
+
+    from wand.cache import DerivativeCache
+    from wand.pipeline import Pipeline
+
+    cache = DerivativeCache('/var/cache/thumbnails', max_bytes=2 ** 30)
+
+    def thumbnail(path):
+        return Pipeline(path).resize(128, 128).make_blob('jpeg', cache=cache)
+
+Results are addressed by the digest of the source content, the recorded
+operations, the output format, and versions of Wand and ImageMagick, so
+entries never go stale; they are only evicted in least recently used order
+when the cache grows larger than ``max_bytes``.  Entries are written
+atomically, so a cache directory can be shared by several processes.
+
+.. versionadded:: 0.4.5
+
+"""
+import ctypes
+import hashlib
+import os
+import os.path
+import tempfile
+
+from .api import library
+from .compat import binary, binary_type, string_type, xrange
+from .image import BaseImage, Image
+from .version import MAGICK_VERSION, VERSION
+
+__all__ = ('DerivativeCache', 'source_digest')
+
+
+def source_digest(source):
+    """Computes the SHA-256 digest of the content of a pipeline source.
+
+    :param source: a filename, a blob, or an image.  images are digested
+                   by pixels, geometry, orientation, compression quality,
+                   properties, and profiles of all their frames
+    :returns: the hexadecimal digest
+    :rtype: :class:`str`
+
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, BaseImage):
+        frames = source.sequence if isinstance(source, Image) else [source]
+        digest.update(binary('image:{0}:{1}:'.format(
+            len(frames), source.format
+        )))
+        for frame in frames:
+            digest.update(binary('{0}x{1}:{2!r}:'.format(
+                frame.width, frame.height, frame.page
+            )))
+            digest.update(binary(frame.signature))
+            digest_attributes(digest, frame)
+    elif isinstance(source, binary_type):
+        digest.update(b'blob:')
+        digest.update(source)
+    elif isinstance(source, string_type):
+        digest.update(b'file:')
+        with open(source, 'rb') as source_file:
+            for chunk in iter(lambda: source_file.read(1 << 20), b''):
+                digest.update(chunk)
+    else:
+        raise TypeError('cannot digest ' + repr(source))
+    return digest.hexdigest()
+
+
+def digest_attributes(digest, image):
+    """Updates the ``digest`` with attributes of the ``image`` which
+    affect derived images besides its pixels: the orientation (for
+    :meth:`~wand.image.BaseImage.auto_orient()`), the compression quality
+    (for encoders), and properties and profiles e.g. EXIF (written unless
+    :meth:`~wand.image.BaseImage.strip()`\\ ped).
+
+    .. note::
+
+       It's only for internal use.
+
+    :param digest: a hash object
+    :param image: a single frame
+    :type image: :class:`~wand.image.BaseImage`
+
+    """
+    digest.update(binary('{0}:{1}:'.format(image.orientation,
+                                           image.compression_quality)))
+    wand = image.wand
+    number = ctypes.c_size_t()
+    names_p = library.MagickGetImageProperties(wand, b'', number)
+    names = sorted(names_p[i] for i in xrange(number.value))
+    library.MagickRelinquishMemory(names_p)
+    for name in names:
+        value = library.MagickGetImageProperty(wand, name)
+        digest.update(b'property:' + name + b'=' + (value.value or b'') +
+                      b'\0')
+    names_p = library.MagickGetImageProfiles(wand, b'', number)
+    names = sorted(names_p[i] for i in xrange(number.value))
+    library.MagickRelinquishMemory(names_p)
+    length = ctypes.c_size_t()
+    for name in names:
+        profile_p = library.MagickGetImageProfile(wand, name, length)
+        digest.update(binary('profile:{0}:'.format(length.value)) + name)
+        if profile_p:
+            digest.update(ctypes.string_at(profile_p, length.value))
+            library.MagickRelinquishMemory(profile_p)
+
+
+class DerivativeCache(object):
+    """The on-disk cache of encoded derived images.
+
+    :param path: the directory to store entries.  it's made if missing
+    :type path: :class:`basestring`
+    :param max_bytes: the maximum total size of entries.
+                      1 GiB by default
+    :type max_bytes: :class:`numbers.Integral`
+
+    """
+
+    #: (:class:`float`) The ratio of ``max_bytes`` to shrink the cache to
+    #: when it gets full, so that eviction doesn't run on every write.
+    low_water_mark = 0.9
+
+    def __init__(self, path, max_bytes=2 ** 30):
+        if not isinstance(path, string_type):
+            raise TypeError('path must be a string, not ' + repr(path))
+        #: (:class:`basestring`) The directory of entries.
+        self.path = path
+        #: (:class:`numbers.Integral`) The maximum total size of entries.
+        self.max_bytes = max_bytes
+        self.estimated_bytes = None
+
+    def key(self, digest, operations, format=None, options=None):
+        """Makes the key of a derived image.
+
+        :param digest: the digest of the source content made by
+                       :func:`source_digest()`
+        :type digest: :class:`str`
+        :param operations: the list of ``(name, args, kwargs)`` tuples
+        :type operations: :class:`collections.Sequence`
+        :param format: the output format
+        :type format: :class:`basestring`
+        :param options: other output options which affect the result
+                        e.g. ``{'quality': 85}``
+        :type options: :class:`collections.Mapping`
+        :returns: the hexadecimal key
+        :rtype: :class:`str`
+
+        """
+        normalized = [(name, tuple(args), sorted(kwargs.items()))
+                      for name, args, kwargs in operations]
+        description = repr((
+            VERSION, MAGICK_VERSION, digest, normalized,
+            format and format.lower(), sorted((options or {}).items())
+        ))
+        return hashlib.sha256(binary(description)).hexdigest()
+
+    def entry_path(self, key):
+        """Gets the path of the entry of the ``key``.
+
+        .. note::
+
+           It's only for internal use.
+
+        """
+        return os.path.join(self.path, key[:2], key)
+
+    def get(self, key):
+        """Gets the blob cached for the ``key``, and marks it recently used.
+
+        :param key: the key made by :meth:`key()`
+        :type key: :class:`str`
+        :returns: the cached blob, or ``None`` if it's missing
+        :rtype: :class:`bytes`
+
+        """
+        path = self.entry_path(key)
+        try:
+            with open(path, 'rb') as entry:
+                blob = entry.read()
+            os.utime(path, None)
+        except (IOError, OSError):
+            return None
+        return blob
+
+    def put(self, key, blob):
+        """Stores the ``blob`` for the ``key``.  The entry is written to
+        a temporary file first and then renamed, so readers never see
+        incomplete entries.  Errors are ignored since the cache is only
+        an optimization.
+
+        :param key: the key made by :meth:`key()`
+        :type key: :class:`str`
+        :param blob: the encoded image
+        :type blob: :class:`bytes`
+
+        """
+        path = self.entry_path(key)
+        temp_path = None
+        try:
+            directory = os.path.dirname(path)
+            if not os.path.isdir(directory):
+                try:
+                    os.makedirs(directory)
+                except OSError:
+                    if not os.path.isdir(directory):
+                        raise
+            # The temporary file has a unique name, so that threads and
+            # processes writing the same key don't write into each other's.
+            fd, temp_path = tempfile.mkstemp(prefix=key + '.', suffix='.tmp',
+                                             dir=directory)
+            with os.fdopen(fd, 'wb') as entry:
+                entry.write(blob)
+            if os.name == 'nt' and os.path.exists(path):
+                os.remove(path)
+            os.rename(temp_path, path)
+        except (IOError, OSError):
+            if temp_path is not None:
+                try:
+                    os.remove(temp_path)
+                except (IOError, OSError):
+                    pass
+            return
+        if self.estimated_bytes is None:
+            self.estimated_bytes = self.total_bytes()
+        else:
+            self.estimated_bytes += len(blob)
+        if self.estimated_bytes > self.max_bytes:
+            self.evict()
+
+    def entries(self):
+        """Lists entries.
+
+        :returns: the list of ``(last_used, size, path)`` tuples
+        :rtype: :class:`list`
+
+        """
+        entries = []
+        if not os.path.isdir(self.path):
+            return entries
+        for directory, _, filenames in os.walk(self.path):
+            for filename in filenames:
+                if filename.endswith('.tmp'):
+                    continue
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def total_bytes(self):
+        """Sums the sizes of all entries.
+
+        :returns: the total size in bytes
+        :rtype: :class:`numbers.Integral`
+
+        """
+        return sum(size for _, size, __ in self.entries())
+
+    def evict(self, target_bytes=None):
+        """Removes least recently used entries until the total size gets
+        less than or equal to ``target_bytes``.
+
+        :param target_bytes: the size to shrink to.  ``max_bytes`` times
+                             :attr:`low_water_mark` by default
+        :type target_bytes: :class:`numbers.Integral`
+        :returns: the number of removed entries
+        :rtype: :class:`numbers.Integral`
+
+        """
+        if target_bytes is None:
+            target_bytes = int(self.max_bytes * self.low_water_mark)
+        entries = self.entries()
+        entries.sort()
+        total = sum(size for _, size, __ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self.estimated_bytes = total
+        return removed
+
+    def clear(self):
+        """Removes all entries."""
+        self.evict(0)
+
+    def make_blob(self, pipeline, format=None, options=None):
+        """Gets the blob of the ``pipeline`` result from the cache, or runs
+        the ``pipeline`` and caches its result if it's missing.
+        :meth:`Pipeline.make_blob() <wand.pipeline.Pipeline.make_blob>`
+        with ``cache`` parameter calls it.
+
+        :param pipeline: the pipeline to run
+        :type pipeline: :class:`~wand.pipeline.Pipeline`
+        :param format: the output format
+        :type format: :class:`basestring`
+        :param options: other options which affect the result
+        :type options: :class:`collections.Mapping`
+        :returns: the blob
+        :rtype: :class:`bytes`
+
+        .. note::
+
+           Pipelines reading file objects aren't cached.
+
+        """
+        try:
+            digest = source_digest(pipeline.source)
+        except TypeError:
+            # File objects can't be digested without consuming them.
+            return pipeline.make_blob(format)
+        options = dict(options or {}, optimize=pipeline.optimize,
+                       hints=pipeline.hints)
+        key = self.key(digest, pipeline.operations,
+                       format or pipeline.format, options)
+        blob = self.get(key)
+        if blob is None:
+            blob = pipeline.make_blob(format)
+            self.put(key, blob)
+        return blob
+
+    def __repr__(self):
+        return '<{0}.{1} {2!r}>'.format(
+            type(self).__module__, type(self).__name__, self.path
+        )
@@ -0,0 +1,239 @@
+""":mod:`wand.compare` --- Batch image comparison
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+:func:`batch()` compares many pairs of images at once, e.g. screenshots
+of visual regression tests against their expected images::
+
+    from wand.compare import batch
+
+    pairs = [('actual/home.png', 'expected/home.png'),
+             ('actual/login.png', 'expected/login.png')]
+    for result in batch(pairs, 'root_mean_square', threshold=0.01,
+                        diff_dir='diffs/'):
+        if not result.passed:
+            print(result.actual, result.status, result.distortion)
+
+Pairs are decoded and compared in a pool of worker threads (ImageMagick
+releases the GIL while it works).  Pairs of different sizes fail and
+pairs of the same :attr:`~wand.image.BaseImage.signature` pass without
+computing the metric, and the metric is computed by
+:meth:`~wand.image.BaseImage.compare()` without making difference
+images.  Difference images are made only for failed pairs, and only if
+``diff_dir`` is given.
+
+.. versionadded:: 0.4.5
+
+"""
+import collections
+import multiprocessing.pool
+import os
+import os.path
+
+from .compat import binary_type, string_type
+from .exceptions import WandException
+from .image import COMPARE_METRICS, BaseImage, Image
+
+__all__ = ('SIMILARITY_METRICS', 'ComparisonResult', 'batch',
+           'compare_pair', 'passes')
+
+
+#: (:class:`frozenset`) The set of metrics of :const:`COMPARE_METRICS`
+#: which get larger for more similar images, unlike other metrics.
+#: Pairs pass when their distortions in these metrics are greater than
+#: or equal to the threshold.
+SIMILARITY_METRICS = frozenset(['normalized_cross_correlation',
+                                'peak_signal_to_noise_ratio'])
+
+#: (:class:`dict`) The distortions of identical images in metrics that
+#: aren't zero for them.
+IDENTICAL_DISTORTIONS = {
+    'normalized_cross_correlation': 1.0,
+    'peak_signal_to_noise_ratio': float('inf'),
+}
+
+
+#: The result of a pair compared by :func:`batch()`.
+#:
+#: - ``actual``: the actual image of the pair as given.
+#: - ``expected``: the expected image of the pair as given.
+#: - ``passed``: whether the pair passed.
+#: - ``status``: ``'identical'``, ``'similar'`` (passed within the
+#:   threshold), ``'different'`` (failed over the threshold),
+#:   ``'size_mismatch'``, or ``'error'``.
+#: - ``distortion``: the distortion, or ``None`` if it isn't computed.
+#: - ``diff``: the path of the difference image, or ``None``.
+#: - ``error``: the error message if the status is ``'error'``.
+ComparisonResult = collections.namedtuple(
+    'ComparisonResult',
+    ['actual', 'expected', 'passed', 'status', 'distortion', 'diff', 'error']
+)
+
+
+def passes(metric, distortion, threshold):
+    """Tells whether the ``distortion`` in the ``metric`` is acceptable.
+
+    :param metric: one of :const:`~wand.image.COMPARE_METRICS`
+    :type metric: :class:`basestring`
+    :param distortion: the distortion
+    :type distortion: :class:`numbers.Real`
+    :param threshold: the maximum distortion, or the minimum one for
+                      :const:`SIMILARITY_METRICS`
+    :type threshold: :class:`numbers.Real`
+    :rtype: :class:`bool`
+
+    """
+    if metric in SIMILARITY_METRICS:
+        return distortion >= threshold
+    return distortion <= threshold
+
+
+def open_image(source):
+    """Opens the ``source`` of a pair, unless it's an image already.
+
+    .. note::
+
+       It's only for internal use.
+
+    :returns: a pair of the image and whether it has to be closed
+    :rtype: :class:`tuple`
+
+    """
+    if isinstance(source, BaseImage):
+        return source, False
+    elif isinstance(source, binary_type):
+        return Image(blob=source), True
+    elif isinstance(source, string_type):
+        return Image(filename=source), True
+    raise TypeError('expected a filename, a blob, or a wand.image.BaseImage '
+                    'instance, not ' + repr(source))
+
+
+def diff_path(diff_dir, index, actual, format):
+    """Makes the path of the difference image of the ``index``-th pair.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    if isinstance(actual, string_type):
+        name = os.path.splitext(os.path.basename(actual))[0]
+        filename = '{0}-{1}.{2}'.format(index, name, format)
+    else:
+        filename = '{0}.{1}'.format(index, format)
+    return os.path.join(diff_dir, filename)
+
+
+def compare_pair(actual, expected, metric, threshold, diff_dir=None,
+                 diff_format='png', index=0):
+    """Compares a pair.  It's what :func:`batch()` runs for each pair.
+
+    :param actual: the actual image, its filename, or its blob
+    :param expected: the expected image, its filename, or its blob
+    :param metric: one of :const:`~wand.image.COMPARE_METRICS`
+    :type metric: :class:`basestring`
+    :param threshold: the maximum distortion to pass, or the minimum one
+                      for :const:`SIMILARITY_METRICS`
+    :type threshold: :class:`numbers.Real`
+    :param diff_dir: the directory to write difference images of failed
+                     pairs into.  they aren't made by default
+    :type diff_dir: :class:`basestring`
+    :param diff_format: the format of difference images
+    :type diff_format: :class:`basestring`
+    :param index: the index of the pair, used for the name of
+                  the difference image
+    :type index: :class:`numbers.Integral`
+    :returns: the result
+    :rtype: :class:`ComparisonResult`
+
+    """
+    opened = []
+    try:
+        try:
+            actual_image, close = open_image(actual)
+            if close:
+                opened.append(actual_image)
+            expected_image, close = open_image(expected)
+            if close:
+                opened.append(expected_image)
+            if actual_image.size != expected_image.size:
+                return ComparisonResult(actual, expected, False,
+                                        'size_mismatch', None, None, None)
+            elif actual_image.signature == expected_image.signature:
+                distortion = IDENTICAL_DISTORTIONS.get(metric, 0.0)
+                return ComparisonResult(actual, expected, True, 'identical',
+                                        distortion, None, None)
+            distortion = actual_image.compare(expected_image, metric,
+                                              return_image=False)
+            if passes(metric, distortion, threshold):
+                return ComparisonResult(actual, expected, True, 'similar',
+                                        distortion, None, None)
+            diff = None
+            if diff_dir is not None:
+                diff = diff_path(diff_dir, index, actual, diff_format)
+                diff_image, _ = actual_image.compare(expected_image, metric)
+                with diff_image:
+                    diff_image.format = diff_format
+                    diff_image.save(filename=diff)
+            return ComparisonResult(actual, expected, False, 'different',
+                                    distortion, diff, None)
+        except (WandException, IOError, OSError) as e:
+            return ComparisonResult(actual, expected, False, 'error',
+                                    None, None, str(e))
+    finally:
+        for image in opened:
+            image.close()
+
+
+def batch(pairs, metric='root_mean_square', threshold=0.0, workers=None,
+          diff_dir=None, diff_format='png'):
+    """Compares each of ``pairs`` in a pool of worker threads.
+
+    :param pairs: ``(actual, expected)`` pairs of images, filenames,
+                  or blobs.  the same image object must not appear in
+                  more than one pair, since images aren't thread-safe
+    :type pairs: :class:`collections.Iterable`
+    :param metric: one of :const:`~wand.image.COMPARE_METRICS`.
+                   ``'root_mean_square'`` by default
+    :type metric: :class:`basestring`
+    :param threshold: the maximum distortion to pass, or the minimum one
+                      for :const:`SIMILARITY_METRICS`.  0 by default
+    :type threshold: :class:`numbers.Real`
+    :param workers: the number of worker threads.  the number of CPUs
+                    by default.  1 to compare in the current thread
+    :type workers: :class:`numbers.Integral`
+    :param diff_dir: the directory to write difference images of failed
+                     pairs into.  they aren't made by default
+    :type diff_dir: :class:`basestring`
+    :param diff_format: the format of difference images.
+                        ``'png'`` by default
+    :type diff_format: :class:`basestring`
+    :returns: the list of :class:`ComparisonResult` in the order of
+              ``pairs``
+    :rtype: :class:`list`
+
+    """
+    if not isinstance(metric, string_type):
+        raise TypeError('metric must be a string, not ' + repr(metric))
+    elif metric not in COMPARE_METRICS:
+        raise ValueError('expected a string from COMPARE_METRICS, not ' +
+                         repr(metric))
+    if diff_dir is not None and not os.path.isdir(diff_dir):
+        os.makedirs(diff_dir)
+    tasks = [(index, actual, expected)
+             for index, (actual, expected) in enumerate(pairs)]
+
+    def run(task):
+        index, actual, expected = task
+        return compare_pair(actual, expected, metric, threshold,
+                            diff_dir=diff_dir, diff_format=diff_format,
+                            index=index)
+
+    if workers == 1 or len(tasks) < 2:
+        return [run(task) for task in tasks]
+    pool = multiprocessing.pool.ThreadPool(workers)
+    try:
+        return pool.map(run, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
@@ -919,6 +919,7 @@ class Drawing(Resource):
             raise TypeError('image must be a wand.image.Image instance, not ' +
                             repr(image))
         res = library.MagickDrawImage(image.wand, self.resource)
+        image.dirty = True
         if not res:
             self.raise_exception()
 
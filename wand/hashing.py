@@ -0,0 +1,333 @@
+""":mod:`wand.hashing` --- Perceptual hashes
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Perceptual hashes made by :meth:`BaseImage.perceptual_hash()
+<wand.image.BaseImage.perceptual_hash>` are integers whose bits describe
+the rough look of images, so that near-duplicate images have hashes of
+small :func:`hamming_distance()`.  :class:`HashIndex` finds them among
+a large number of hashes without comparing every pair::
+
+    from wand.hashing import HashIndex
+    from wand.image import Image
+
+    index = HashIndex()
+    for filename in filenames:
+        with Image(filename=filename) as img:
+            index.add(img.perceptual_hash(), filename)
+
+    with Image(filename='upload.jpg') as img:
+        for distance, hash_, filename in index.query(img.perceptual_hash(),
+                                                     max_distance=6):
+            print(filename, 'looks like upload.jpg')
+
+.. versionadded:: 0.4.5
+
+"""
+import math
+import numbers
+
+from .compat import string_type, xrange
+
+__all__ = ('PERCEPTUAL_HASH_METHODS', 'HashIndex', 'hamming_distance',
+           'hash_pixels', 'perceptual_sample_size')
+
+
+#: (:class:`tuple`) The list of perceptual hash methods.
+#:
+#: - ``'ahash'``: Average hash.  Each bit tells whether the pixel is
+#:   brighter than the average.  The fastest but the least robust.
+#: - ``'dhash'``: Difference hash.  Each bit tells whether the pixel is
+#:   brighter than the next pixel to the right.  Robust against changes
+#:   of brightness and contrast.
+#: - ``'phash'``: DCT hash.  Each bit tells whether the low frequency
+#:   component of the discrete cosine transform is larger than
+#:   the median.  The most robust but the slowest.
+PERCEPTUAL_HASH_METHODS = 'ahash', 'dhash', 'phash'
+
+#: (:class:`numbers.Integral`) How many times larger the sample for
+#: ``'phash'`` is than the hash in each dimension.
+PHASH_FACTOR = 4
+
+#: (:class:`dict`) The cache of DCT coefficient tables.
+#:
+#: .. note::
+#:
+#:    It's only for internal use.
+dct_tables = {}
+
+
+def perceptual_sample_size(method, size):
+    """Gets the size of the grayscale sample which the ``method`` needs
+    to make a hash of ``size`` squared bits.
+
+    :param method: one of :const:`PERCEPTUAL_HASH_METHODS`
+    :type method: :class:`basestring`
+    :param size: the hash consists of ``size`` squared bits
+    :type size: :class:`numbers.Integral`
+    :returns: the pair of ``(width, height)``
+    :rtype: :class:`tuple`
+
+    """
+    if not isinstance(method, string_type):
+        raise TypeError('method must be a string, not ' + repr(method))
+    elif method not in PERCEPTUAL_HASH_METHODS:
+        raise ValueError('method must be one of ' +
+                         repr(PERCEPTUAL_HASH_METHODS) + ', not ' +
+                         repr(method))
+    elif not isinstance(size, numbers.Integral) or size < 2:
+        raise TypeError('size must be an integer greater than 1, not ' +
+                        repr(size))
+    if method == 'dhash':
+        return size + 1, size
+    elif method == 'phash':
+        return size * PHASH_FACTOR, size * PHASH_FACTOR
+    return size, size
+
+
+def pack_bits(bits):
+    """Packs the iterable of booleans into an integer, the first one
+    being the most significant bit.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    value = 0
+    for bit in bits:
+        value = (value << 1) | bool(bit)
+    return value
+
+
+def dct_table(length, count):
+    """Gets the table of DCT-II coefficients ``table[k][i]`` for
+    the first ``count`` frequencies of ``length`` samples.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    key = length, count
+    try:
+        return dct_tables[key]
+    except KeyError:
+        pass
+    table = [
+        [math.cos(math.pi * k * (2 * i + 1) / (2.0 * length))
+         for i in xrange(length)]
+        for k in xrange(count)
+    ]
+    dct_tables[key] = table
+    return table
+
+
+def hash_pixels(method, pixels, size):
+    """Makes the perceptual hash from grayscale ``pixels``.
+
+    :param method: one of :const:`PERCEPTUAL_HASH_METHODS`
+    :type method: :class:`basestring`
+    :param pixels: the row-major intensities of the sample of
+                   :func:`perceptual_sample_size()`
+    :type pixels: :class:`collections.Sequence`
+    :param size: the hash consists of ``size`` squared bits
+    :type size: :class:`numbers.Integral`
+    :returns: the hash
+    :rtype: :class:`numbers.Integral`
+
+    """
+    width, height = perceptual_sample_size(method, size)
+    if len(pixels) != width * height:
+        raise ValueError('expected {0} pixels, not {1}'.format(
+            width * height, len(pixels)
+        ))
+    rows = [pixels[y * width:(y + 1) * width] for y in xrange(height)]
+    if method == 'dhash':
+        return pack_bits(row[x] > row[x + 1]
+                         for row in rows for x in xrange(size))
+    elif method == 'ahash':
+        average = sum(pixels) / float(len(pixels))
+        return pack_bits(pixel > average for pixel in pixels)
+    # The separable 2D DCT, of which only the lowest size x size
+    # frequencies are computed.
+    row_table = dct_table(width, size)
+    column_table = dct_table(height, size)
+    row_frequencies = [
+        [sum(c * p for c, p in zip(coefficients, row))
+         for coefficients in row_table]
+        for row in rows
+    ]
+    frequencies = [
+        sum(c * row[u] for c, row in zip(coefficients, row_frequencies))
+        for coefficients in column_table
+        for u in xrange(size)
+    ]
+    # The DC term only reflects the average brightness; leave it out
+    # when taking the median.
+    ordered = sorted(frequencies[1:])
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        median = ordered[middle]
+    else:
+        median = (ordered[middle - 1] + ordered[middle]) / 2.0
+    return pack_bits(frequency > median for frequency in frequencies)
+
+
+def hamming_distance(a, b):
+    """Counts the different bits of two hashes.
+
+    :param a: a hash
+    :type a: :class:`numbers.Integral`
+    :param b: another hash
+    :type b: :class:`numbers.Integral`
+    :returns: the number of different bits
+    :rtype: :class:`numbers.Integral`
+
+    """
+    return bin(a ^ b).count('1')
+
+
+class HashIndex(object):
+    """The index of perceptual hashes for looking up hashes within
+    the given Hamming distance.  It's a BK-tree, which usually
+    visits only a small part of hashes for small distances, instead of
+    comparing with every hash.
+
+    :param items: optional ``(hash, value)`` pairs to add
+    :type items: :class:`collections.Iterable`
+
+    """
+
+    def __init__(self, items=()):
+        #: The root node.  Each node is a list of the hash, the list of
+        #: values added with the hash, and the dictionary of child nodes
+        #: keyed by their distance to the node.
+        self.root = None
+        self.length = 0
+        self.update(items)
+
+    def add(self, hash_, value=None):
+        """Adds the ``hash_`` with the associated ``value``.  The same hash
+        can be added several times with different values.
+
+        :param hash_: the perceptual hash
+        :type hash_: :class:`numbers.Integral`
+        :param value: an optional value to associate, e.g. a filename
+
+        """
+        if not isinstance(hash_, numbers.Integral):
+            raise TypeError('hash must be an integer, not ' + repr(hash_))
+        self.length += 1
+        if self.root is None:
+            self.root = [hash_, [value], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming_distance(hash_, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            children = node[2]
+            try:
+                node = children[distance]
+            except KeyError:
+                children[distance] = [hash_, [value], {}]
+                return
+
+    def update(self, items):
+        """Adds ``(hash, value)`` pairs.
+
+        :param items: ``(hash, value)`` pairs to add
+        :type items: :class:`collections.Iterable`
+
+        """
+        for hash_, value in items:
+            self.add(hash_, value)
+
+    def query(self, hash_, max_distance=0):
+        """Finds hashes within ``max_distance`` from the ``hash_``.
+
+        :param hash_: the perceptual hash to look up
+        :type hash_: :class:`numbers.Integral`
+        :param max_distance: the maximum Hamming distance
+        :type max_distance: :class:`numbers.Integral`
+        :returns: the list of ``(distance, hash, value)`` triples
+                  ordered by distance
+        :rtype: :class:`list`
+
+        """
+        if not isinstance(hash_, numbers.Integral):
+            raise TypeError('hash must be an integer, not ' + repr(hash_))
+        elif not isinstance(max_distance, numbers.Integral) or \
+                max_distance < 0:
+            raise TypeError('max_distance must be a natural number, not ' +
+                            repr(max_distance))
+        results = []
+        if self.root is None:
+            return results
+        stack = [self.root]
+        while stack:
+            node_hash, values, children = stack.pop()
+            distance = hamming_distance(hash_, node_hash)
+            if distance <= max_distance:
+                results.extend((distance, node_hash, value)
+                               for value in values)
+            # By the triangle inequality, only children at distances
+            # within max_distance from the distance can have matches.
+            low = distance - max_distance
+            high = distance + max_distance
+            stack.extend(child for d, child in children.items()
+                         if low <= d <= high)
+        results.sort(key=lambda result: result[:2])
+        return results
+
+    def nearest(self, hash_, max_distance=None):
+        """Finds the nearest hash to the ``hash_``.
+
+        :param hash_: the perceptual hash to look up
+        :type hash_: :class:`numbers.Integral`
+        :param max_distance: the optional maximum Hamming distance
+        :type max_distance: :class:`numbers.Integral`
+        :returns: the ``(distance, hash, value)`` triple,
+                  or ``None`` if there's nothing close enough
+        :rtype: :class:`tuple`
+
+        """
+        if not isinstance(hash_, numbers.Integral):
+            raise TypeError('hash must be an integer, not ' + repr(hash_))
+        best = None
+        if self.root is None:
+            return best
+        limit = max_distance
+        stack = [self.root]
+        while stack:
+            node_hash, values, children = stack.pop()
+            distance = hamming_distance(hash_, node_hash)
+            if ((limit is None or distance <= limit) and
+                    (best is None or distance < best[0])):
+                best = distance, node_hash, values[0]
+                limit = distance
+                if distance == 0:
+                    break
+            stack.extend(child for d, child in children.items()
+                         if limit is None or abs(d - distance) <= limit)
+        return best
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        """Iterates over ``(hash, value)`` pairs in no particular order."""
+        if self.root is None:
+            return
+        stack = [self.root]
+        while stack:
+            node_hash, values, children = stack.pop()
+            for value in values:
+                yield node_hash, value
+            stack.extend(children.values())
+
+    def __repr__(self):
+        return '<{0}.{1} ({2} hashes)>'.format(
+            type(self).__module__, type(self).__name__, len(self)
+        )
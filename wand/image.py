@@ -10,27 +10,33 @@ error happened)::
         print('height =', i.height)
 
 """
+import array
 import collections
 import ctypes
 import functools
+import hashlib
 import numbers
+import operator
+import pickle
 import weakref
 
 from . import compat
-from .api import MagickPixelPacket, libc, libmagick, library
+from .api import MagickPixelPacket, RectangleInfo, libc, libmagick, library
 from .color import Color
 from .compat import (binary, binary_type, encode_filename, file_types,
                      string_type, text, xrange)
 from .exceptions import MissingDelegateError, WandException
-from .resource import DestroyedResourceError, Resource
+from .resource import (DestroyedResourceError, Resource, acquire_wand,
+                       release_wand)
 from .font import Font
+from .hashing import hash_pixels, perceptual_sample_size
 
 
 __all__ = ('ALPHA_CHANNEL_TYPES', 'CHANNELS', 'COLORSPACE_TYPES',
            'COMPARE_METRICS', 'COMPOSITE_OPERATORS', 'COMPRESSION_TYPES',
            'EVALUATE_OPS', 'FILTER_TYPES',
            'GRAVITY_TYPES', 'IMAGE_TYPES', 'ORIENTATION_TYPES', 'UNIT_TYPES',
-           'FUNCTION_TYPES',
+           'FUNCTION_TYPES', 'HASH_ALGORITHMS', 'STORAGE_TYPES',
            'BaseImage', 'ChannelDepthDict', 'ChannelImageDict',
            'ClosedImageError', 'HistogramDict', 'Image', 'ImageProperty',
            'Iterator', 'Metadata', 'OptionDict', 'manipulative')
@@ -535,6 +541,173 @@ IMAGE_LAYER_METHOD = ('undefined', 'coalesce', 'compareany', 'compareclear',
                       'removezero', 'composite', 'merge', 'flatten', 'mosaic',
                       'trimbounds')
 
+#: (:class:`tuple`) The list of pixel storage types that can be used with
+#: :meth:`BaseImage.export_pixels()` and :meth:`BaseImage.import_pixels()`.
+#:
+#: - ``'undefined'``
+#: - ``'char'``
+#: - ``'double'``
+#: - ``'float'``
+#: - ``'integer'``
+#: - ``'long'``
+#: - ``'quantum'``
+#: - ``'short'``
+#:
+#: .. note::
+#:
+#:    ``'undefined'`` and ``'quantum'`` are listed only to keep indices
+#:    in sync with :c:type:`StorageType`; they cannot be exported.
+#:
+#: .. versionadded:: 0.4.5
+STORAGE_TYPES = ('undefined', 'char', 'double', 'float', 'integer', 'long',
+                 'quantum', 'short')
+
+#: (:class:`dict`) The mapping of :const:`STORAGE_TYPES` to :mod:`ctypes`
+#: types of a single channel value.  Note that ``'long'`` is 32-bit as
+#: :c:type:`LongPixel` of ImageMagick, not :c:type:`unsigned long`.
+STORAGE_CTYPES = {'char': ctypes.c_ubyte, 'double': ctypes.c_double,
+                  'float': ctypes.c_float, 'integer': ctypes.c_uint,
+                  'long': ctypes.c_uint32, 'short': ctypes.c_ushort}
+
+#: (:class:`frozenset`) The set of channel letters which can be used in
+#: a channel map of :meth:`BaseImage.export_pixels()` e.g. ``'RGBA'``.
+PIXEL_MAP_CHANNELS = frozenset('RGBAOCYMKIP')
+
+#: (:class:`tuple`) The list of hash algorithms that
+#: :meth:`BaseImage.content_hash()` and :meth:`BaseImage.fingerprint()`
+#: can use.
+#:
+#: - ``'xxh64'``: XXH64 through the optional :mod:`xxhash` package.
+#:   The fastest one.
+#: - ``'blake2b'``: 128-bit BLAKE2b through :mod:`hashlib`.
+#:   Requires Python 3.6 or higher.
+#:
+#: .. versionadded:: 0.4.5
+HASH_ALGORITHMS = 'xxh64', 'blake2b'
+
+#: (:class:`numbers.Integral`) The minimum width and height of templates
+#: downsampled for the coarse search of :meth:`BaseImage.find()`.
+FIND_MIN_TEMPLATE_SIZE = 16
+
+#: (:class:`numbers.Integral`) How many pixels around the offset found on
+#: the coarser level :meth:`BaseImage.find()` searches again on the finer
+#: level.
+FIND_MARGIN = 4
+
+#: (:class:`numbers.Integral`) The number of pixel bytes exported at once
+#: by :meth:`BaseImage.content_hash()`, so that hashing a large image
+#: doesn't allocate a buffer as large as the image.
+CONTENT_HASH_CHUNK_SIZE = 1 << 22
+
+
+def compare_metric_index(metric):
+    """Gets the index of the ``metric`` in :const:`COMPARE_METRICS`.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    if not isinstance(metric, string_type):
+        raise TypeError('metric must be a string, not ' + repr(metric))
+    try:
+        return COMPARE_METRICS.index(metric)
+    except ValueError:
+        raise ValueError('expected a string from COMPARE_METRICS, not ' +
+                         repr(metric))
+
+
+def similarity_offset(image, template):
+    """Finds the offset in the ``image`` where the ``template`` is the most
+    similar through :c:func:`MagickSimilarityImage()`.
+
+    .. note::
+
+       It's only for internal use.
+
+    :returns: the triple of ``(x, y, similarity)`` where ``similarity`` is
+              the normalized root mean squared error
+    :rtype: :class:`tuple`
+
+    """
+    offset = RectangleInfo()
+    similarity = ctypes.c_double()
+    similarity_wand = library.MagickSimilarityImage(image.wand, template.wand,
+                                                    ctypes.byref(offset),
+                                                    ctypes.byref(similarity))
+    if not similarity_wand:
+        image.raise_exception()
+        raise ValueError(
+            'failed to search {0!r} in {1!r}'.format(template, image)
+        )
+    # Only the offset matters; drop the similarity map.
+    BaseImage(similarity_wand).destroy()
+    return offset.x, offset.y, similarity.value
+
+
+def changed_span(a, b, tolerance=0, channels=4):
+    """Finds the first and the last pixels of which any channel value
+    differs by more than ``tolerance`` between two :class:`array.array`\\ s
+    of channel values.
+
+    .. note::
+
+       It's only for internal use.
+
+    :returns: the pair of ``(first, last)`` pixel indices,
+              or ``None`` if there's no such pixel
+    :rtype: :class:`tuple`
+
+    """
+    if a == b:
+        return None
+    differences = list(map(abs, map(operator.sub, a, b)))
+    if max(differences) <= tolerance:
+        return None
+    first = next(i for i, difference in enumerate(differences)
+                 if difference > tolerance)
+    last = next(i for i in xrange(len(differences) - 1, first - 1, -1)
+                if differences[i] > tolerance)
+    return first // channels, last // channels
+
+
+def connected_tiles(tiles):
+    """Groups 8-connected ``(column, row)`` tiles, and yields the list of
+    tiles of each group.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    tiles = set(tiles)
+    while tiles:
+        stack = [tiles.pop()]
+        group = []
+        while stack:
+            column, row = stack.pop()
+            group.append((column, row))
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    neighbor = column + dx, row + dy
+                    if neighbor in tiles:
+                        tiles.remove(neighbor)
+                        stack.append(neighbor)
+        yield group
+
+
+def apply_tile(function, tile):
+    """Applies the ``function`` to the ``tile`` for
+    :meth:`BaseImage.map_tiles()`.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    result = function(tile)
+    return tile if result is None else result
+
 
 def manipulative(function):
     """Mark the operation manipulating itself instead of returning new one."""
@@ -546,6 +719,102 @@ def manipulative(function):
     return wrapped
 
 
+class lazy_property(object):
+    """The non-data descriptor which makes the attribute of the given
+    ``name`` by calling the ``factory`` with the image on its first access,
+    and then caches it in the instance.  It saves allocating mapping objects
+    that most images never use.
+
+    .. note::
+
+       It's only for internal use.
+
+    .. versionadded:: 0.4.5
+
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+
+    def __get__(self, image, cls=None):
+        if image is None:
+            return self
+        value = self.factory(image)
+        image.__dict__[self.name] = value
+        return value
+
+
+def new_hash(algorithm=None):
+    """Makes a new hash object of the given ``algorithm``.
+
+    .. note::
+
+       It's only for internal use.
+
+    :param algorithm: one of :const:`HASH_ALGORITHMS`.  ``'xxh64'`` if
+                      :mod:`xxhash` is installed, ``'blake2b'`` otherwise
+                      by default
+    :type algorithm: :class:`basestring`
+    :returns: a hash object which has ``update()`` and ``hexdigest()``
+
+    """
+    if algorithm is not None and algorithm not in HASH_ALGORITHMS:
+        raise ValueError('algorithm must be one of ' +
+                         repr(HASH_ALGORITHMS) + ', not ' + repr(algorithm))
+    if algorithm in (None, 'xxh64'):
+        try:
+            import xxhash
+        except ImportError:
+            if algorithm is not None:
+                raise ValueError('xxhash package is required to use xxh64')
+        else:
+            return xxhash.xxh64()
+    try:
+        return hashlib.blake2b(digest_size=16)
+    except AttributeError:
+        raise ValueError('blake2b requires Python 3.6 or higher')
+
+
+def make_sequence(image):
+    from .sequence import Sequence
+    return Sequence(image)
+
+
+#: (:class:`tuple`) The pair of the :data:`wand.resource.generation` and
+#: the transparent :c:type:`PixelWand` made in the generation.
+#:
+#: .. note::
+#:
+#:    It's only for internal use.  Use :func:`transparent_background()`
+#:    function instead.
+transparent_background_cache = None, None
+
+
+def transparent_background():
+    """Gets the shared :c:type:`PixelWand` of transparent color.  It's set
+    to images before reading so that formats without background (e.g. SVG)
+    get transparent background.  Unlike :class:`~wand.color.Color` it's
+    made only once per :data:`wand.resource.generation`.
+
+    .. note::
+
+       It's only for internal use.
+
+    :returns: a pointer to the transparent :c:type:`PixelWand`
+    :rtype: :class:`ctypes.c_void_p`
+
+    """
+    global transparent_background_cache
+    from . import resource
+    generation, pixel_wand = transparent_background_cache
+    if generation != resource.generation or not pixel_wand:
+        pixel_wand = library.NewPixelWand()
+        library.PixelSetColor(pixel_wand, b'transparent')
+        transparent_background_cache = resource.generation, pixel_wand
+    return pixel_wand
+
+
 class BaseImage(Resource):
     """The abstract base of :class:`Image` (container) and
     :class:`~wand.sequence.SingleImage`.  That means the most of
@@ -565,7 +834,25 @@ class BaseImage(Resource):
     #:
     #: .. versionchanged:: 0.3.9
     #:    Added ``'pdf:use-cropbox'`` option.
-    options = None
+    #:
+    #: .. versionchanged:: 0.4.5
+    #:    It's made lazily on the first access.
+    options = lazy_property('options', lambda image: OptionDict(image))
+
+    #: (:class:`ChannelImageDict`) The mapping of separated channels
+    #: from the image. ::
+    #:
+    #:     with image.channel_images['red'] as red_image:
+    #:         display(red_image)
+    channel_images = lazy_property('channel_images',
+                                   lambda image: ChannelImageDict(image))
+
+    #: (:class:`ChannelDepthDict`) The mapping of channels to their depth.
+    #: Read only.
+    #:
+    #: .. versionadded:: 0.3.0
+    channel_depths = lazy_property('channel_depths',
+                                   lambda image: ChannelDepthDict(image))
 
     #: (:class:`collections.Sequence`) The list of
     #: :class:`~wand.sequence.SingleImage`\ s that the image contains.
@@ -573,11 +860,15 @@ class BaseImage(Resource):
     #: .. versionadded:: 0.3.0
     sequence = None
 
-    #: (:class:`bool`) Whether the image is changed or not.
-    dirty = None
+    _dirty = None
+
+    #: (:class:`tuple`) The pair of the iterator index and the signature
+    #: of the image at the index, or ``None``.  It's dropped whenever
+    #: the image gets :attr:`dirty`.
+    _signature = None
 
     c_is_resource = library.IsMagickWand
-    c_destroy_resource = library.DestroyMagickWand
+    c_destroy_resource = staticmethod(release_wand)
     c_get_exception = library.MagickGetException
     c_clear_exception = library.MagickClearException
 
@@ -585,9 +876,6 @@ class BaseImage(Resource):
 
     def __init__(self, wand):
         self.wand = wand
-        self.channel_images = ChannelImageDict(self)
-        self.channel_depths = ChannelDepthDict(self)
-        self.options = OptionDict(self)
         self.dirty = False
 
     @property
@@ -607,11 +895,28 @@ class BaseImage(Resource):
             self.resource = wand
         except TypeError:
             raise TypeError(repr(wand) + ' is not a MagickWand instance')
+        self._signature = None
 
     @wand.deleter
     def wand(self):
         del self.resource
 
+    @property
+    def dirty(self):
+        """(:class:`bool`) Whether the image is changed or not.
+
+        .. versionchanged:: 0.4.5
+           Setting it :const:`True` also drops the cached :attr:`signature`.
+
+        """
+        return self._dirty
+
+    @dirty.setter
+    def dirty(self, dirty):
+        self._dirty = dirty
+        if dirty:
+            self._signature = None
+
     def clone(self):
         """Clones the image. It is equivalent to call :class:`Image` with
         ``image`` parameter. ::
@@ -700,6 +1005,11 @@ class BaseImage(Resource):
 
     def __eq__(self, other):
         if isinstance(other, type(self)):
+            if self is other:
+                return True
+            # Differently shaped images can't be equal; don't hash pixels.
+            if self.size != other.size or self.depth != other.depth:
+                return False
             return self.signature == other.signature
         return False
 
@@ -1205,9 +1515,150 @@ class BaseImage(Resource):
 
         .. versionadded:: 0.1.9
 
+        .. versionchanged:: 0.4.5
+           It's computed only once until the image is manipulated.
+
         """
-        signature = library.MagickGetImageSignature(self.wand)
-        return text(signature.value)
+        wand = self.wand
+        index = library.MagickGetIteratorIndex(wand)
+        cached = self._signature
+        if cached is not None and cached[0] == index:
+            return cached[1]
+        signature = text(library.MagickGetImageSignature(wand).value)
+        self._signature = index, signature
+        return signature
+
+    def content_hash(self, algorithm=None, channel_map='RGBA',
+                     storage='char'):
+        """Computes a fast non-cryptographic hash of the pixels and the size
+        of the image.  It's meant for cache keys and deduplication, and is
+        much cheaper than :attr:`signature` on large images.  Pixels are
+        exported and hashed in chunks, so memory use doesn't grow with the
+        image size.
+
+        Digests made by different algorithms (including the default one
+        on different machines) can't be compared each other.
+
+        :param algorithm: one of :const:`HASH_ALGORITHMS`.  ``'xxh64'`` if
+                          :mod:`xxhash` is installed, ``'blake2b'``
+                          otherwise by default
+        :type algorithm: :class:`basestring`
+        :param channel_map: channel letters to hash
+        :type channel_map: :class:`basestring`
+        :param storage: the type of each channel value to hash.
+                        ``'short'`` or wider keeps more than 8 bits of
+                        each channel
+        :type storage: :class:`basestring`
+        :returns: the hexadecimal digest
+        :rtype: :class:`str`
+
+        .. versionadded:: 0.4.5
+
+        """
+        hasher = new_hash(algorithm)
+        _, __, width, height, channel_map, ___, size = \
+            self._pixels_geometry(0, 0, None, None, channel_map, storage)
+        hasher.update(binary('{0}x{1}:{2}:{3}:'.format(
+            width, height, channel_map, storage
+        )))
+        row_size = size // height
+        rows = max(1, CONTENT_HASH_CHUNK_SIZE // row_size)
+        buffer = bytearray(row_size * min(rows, height))
+        view = memoryview(buffer)
+        for top in xrange(0, height, rows):
+            count = min(rows, height - top)
+            self.export_pixels(0, top, width, count, channel_map, storage,
+                               buffer)
+            hasher.update(view[:row_size * count])
+        return hasher.hexdigest()
+
+    def _sample_pixels(self, width, height, channel_map, smooth=False):
+        """Samples the current image down to ``width`` x ``height``, and
+        exports its pixels in ``'char'`` storage.  The image itself isn't
+        changed.
+
+        If ``smooth`` is :const:`True` each pixel is the average of
+        4 x 4 sampled pixels, which is less sensitive to resampling of
+        the source than plain point sampling.
+
+        """
+        # Only the current image, whose pixel cache is shared until
+        # it's sampled.
+        sampled = BaseImage(library.MagickGetImage(self.wand))
+        try:
+            if smooth:
+                r = (library.MagickSampleImage(sampled.wand,
+                                               width * 4, height * 4) and
+                     library.MagickResizeImage(sampled.wand, width, height,
+                                               FILTER_TYPES.index('box'), 1))
+            else:
+                r = library.MagickSampleImage(sampled.wand, width, height)
+            if not r:
+                sampled.raise_exception()
+            return sampled.export_pixels(channel_map=channel_map,
+                                         storage='char')
+        finally:
+            sampled.destroy()
+
+    def fingerprint(self, size=16, algorithm=None):
+        """Computes a cheap hash of the image from the
+        ``size`` x ``size`` pixels sampled out of it, and its original size.
+        It's much faster than :meth:`content_hash()` on large images, but
+        changes on few pixels may not change it.  It's useful as the first
+        pass of deduplication followed by :meth:`content_hash()`.
+
+        :param size: the width and height of the sampled pixels
+        :type size: :class:`numbers.Integral`
+        :param algorithm: one of :const:`HASH_ALGORITHMS`.
+                          the same to :meth:`content_hash()` by default
+        :type algorithm: :class:`basestring`
+        :returns: the hexadecimal digest
+        :rtype: :class:`str`
+
+        .. versionadded:: 0.4.5
+
+        """
+        if not isinstance(size, numbers.Integral) or size < 1:
+            raise TypeError('size must be a natural number, not ' +
+                            repr(size))
+        hasher = new_hash(algorithm)
+        hasher.update(binary('{0}x{1}:{2}:'.format(
+            self.width, self.height, size
+        )))
+        hasher.update(self._sample_pixels(size, size, 'RGBA'))
+        return hasher.hexdigest()
+
+    def perceptual_hash(self, method='dhash', size=8):
+        """Computes the perceptual hash of the image.  Unlike
+        :meth:`content_hash()`, similar looking images (e.g. resized,
+        recompressed, or slightly retouched ones) get similar hashes,
+        so that near-duplicates can be found by :func:`Hamming distance
+        <wand.hashing.hamming_distance>` of their hashes.  Use
+        :class:`~wand.hashing.HashIndex` to look up many of them::
+
+            with Image(filename='pikachu.png') as a:
+                with Image(filename='pikachu-small.jpg') as b:
+                    distance = hamming_distance(a.perceptual_hash(),
+                                                b.perceptual_hash())
+                    assert distance <= 10
+
+        It's computed from a tiny grayscale sample of the image, so its
+        cost hardly depends on the image size.
+
+        :param method: one of :const:`~wand.hashing.PERCEPTUAL_HASH_METHODS`.
+                       ``'dhash'`` by default
+        :type method: :class:`basestring`
+        :param size: the hash consists of ``size`` squared bits
+        :type size: :class:`numbers.Integral`
+        :returns: the hash
+        :rtype: :class:`numbers.Integral`
+
+        .. versionadded:: 0.4.5
+
+        """
+        width, height = perceptual_sample_size(method, size)
+        pixels = self._sample_pixels(width, height, 'I', smooth=True)
+        return hash_pixels(method, pixels, size)
 
     @property
     def alpha_channel(self):
@@ -1347,6 +1798,152 @@ class BaseImage(Resource):
         """
         return HistogramDict(self)
 
+    def _pixels_geometry(self, x, y, width, height, channel_map, storage):
+        """Validates the arguments of :meth:`export_pixels()` and
+        :meth:`import_pixels()`, and returns a tuple of normalized
+        ``(x, y, width, height, channel_map, storage_index, buffer_size)``.
+
+        """
+        if not isinstance(x, numbers.Integral) or x < 0:
+            raise TypeError('x must be a natural number, not ' + repr(x))
+        elif not isinstance(y, numbers.Integral) or y < 0:
+            raise TypeError('y must be a natural number, not ' + repr(y))
+        if width is None:
+            width = self.width - x
+        if height is None:
+            height = self.height - y
+        if not isinstance(width, numbers.Integral) or width < 1:
+            raise TypeError('width must be a natural number, not ' +
+                            repr(width))
+        elif not isinstance(height, numbers.Integral) or height < 1:
+            raise TypeError('height must be a natural number, not ' +
+                            repr(height))
+        if not isinstance(channel_map, string_type):
+            raise TypeError('channel_map must be a string, not ' +
+                            repr(channel_map))
+        channel_map = channel_map.upper()
+        if not channel_map or not PIXEL_MAP_CHANNELS.issuperset(channel_map):
+            raise ValueError('channel_map must consist of ' +
+                             ''.join(sorted(PIXEL_MAP_CHANNELS)) +
+                             ', not ' + repr(channel_map))
+        try:
+            storage_ctype = STORAGE_CTYPES[storage]
+        except KeyError:
+            raise ValueError('storage must be one of ' +
+                             repr(sorted(STORAGE_CTYPES)) + ', not ' +
+                             repr(storage))
+        size = (width * height * len(channel_map) *
+                ctypes.sizeof(storage_ctype))
+        return (x, y, width, height, channel_map,
+                STORAGE_TYPES.index(storage), size)
+
+    def export_pixels(self, x=0, y=0, width=None, height=None,
+                      channel_map='RGBA', storage='char', buffer=None):
+        """Exports the raw pixels of the given area into a buffer.
+        Pixels are laid out row by row, and each pixel consists of
+        the channels listed in ``channel_map`` in that order::
+
+            with Image(filename='pikachu.png') as img:
+                rgba = img.export_pixels(channel_map='RGBA', storage='char')
+                assert len(rgba) == img.width * img.height * 4
+
+        :param x: the left offset of the area
+        :type x: :class:`numbers.Integral`
+        :param y: the top offset of the area
+        :type y: :class:`numbers.Integral`
+        :param width: the width of the area.  the rest of the image width
+                      by default
+        :type width: :class:`numbers.Integral`
+        :param height: the height of the area.  the rest of the image height
+                       by default
+        :type height: :class:`numbers.Integral`
+        :param channel_map: channel letters to export e.g. ``'RGB'``,
+                            ``'RGBA'``, ``'I'`` (intensity), ``'CMYK'``
+        :type channel_map: :class:`basestring`
+        :param storage: the type of each channel value.  one of
+                        :const:`STORAGE_CTYPES` keys
+        :type storage: :class:`basestring`
+        :param buffer: an optional writable buffer (e.g. :class:`bytearray`,
+                       :class:`memoryview`) to export pixels into.
+                       a new :class:`bytearray` is allocated if omitted
+        :returns: the buffer containing pixels
+        :rtype: :class:`bytearray`
+        :raises ValueError: when ``buffer`` is too small
+
+        .. versionadded:: 0.4.5
+
+        """
+        x, y, width, height, channel_map, storage, size = \
+            self._pixels_geometry(x, y, width, height, channel_map, storage)
+        if buffer is None:
+            buffer = bytearray(size)
+        else:
+            view = memoryview(buffer)
+            if len(view) * view.itemsize < size:
+                raise ValueError(
+                    'buffer must be at least {0} bytes'.format(size)
+                )
+            del view
+        pixels = (ctypes.c_char * size).from_buffer(buffer)
+        r = library.MagickExportImagePixels(self.wand, x, y, width, height,
+                                            binary(channel_map), storage,
+                                            ctypes.addressof(pixels))
+        del pixels
+        if not r:
+            self.raise_exception()
+        return buffer
+
+    @manipulative
+    def import_pixels(self, data, x=0, y=0, width=None, height=None,
+                      channel_map='RGBA', storage='char'):
+        """Imports raw pixels (e.g. exported by :meth:`export_pixels()`)
+        into the given area of the image.  The image has to be large enough
+        to contain the area; use :meth:`Image.blank()` first for an empty
+        image.
+
+        :param data: the pixels to import
+        :type data: :class:`bytes`, :class:`bytearray`, :class:`memoryview`
+        :param x: the left offset of the area
+        :type x: :class:`numbers.Integral`
+        :param y: the top offset of the area
+        :type y: :class:`numbers.Integral`
+        :param width: the width of the area.  the rest of the image width
+                      by default
+        :type width: :class:`numbers.Integral`
+        :param height: the height of the area.  the rest of the image height
+                       by default
+        :type height: :class:`numbers.Integral`
+        :param channel_map: channel letters of each pixel in ``data``
+        :type channel_map: :class:`basestring`
+        :param storage: the type of each channel value.  one of
+                        :const:`STORAGE_CTYPES` keys
+        :type storage: :class:`basestring`
+        :raises ValueError: when ``data`` is too small for the area
+
+        .. versionadded:: 0.4.5
+
+        """
+        x, y, width, height, channel_map, storage, size = \
+            self._pixels_geometry(x, y, width, height, channel_map, storage)
+        view = memoryview(data)
+        if len(view) * view.itemsize < size:
+            raise ValueError('data must be at least {0} bytes'.format(size))
+        if not view.readonly:
+            # Writable buffers (e.g. shared memory) are passed without copy.
+            pixels = (ctypes.c_char * size).from_buffer(data)
+            address = ctypes.addressof(pixels)
+        elif isinstance(data, binary_type):
+            pixels = address = data
+        else:
+            pixels = address = view.tobytes()
+        del view
+        r = library.MagickImportImagePixels(self.wand, x, y, width, height,
+                                            binary(channel_map), storage,
+                                            address)
+        del pixels, address
+        if not r:
+            self.raise_exception()
+
     @manipulative
     def distort(self, method, arguments, best_fit=False):
         """Distorts an image using various distorting methods.
@@ -2249,29 +2846,447 @@ class BaseImage(Resource):
                                             alpha, fuzz, invert)
         self.raise_exception()
 
-    def compare(self, image, metric='undefined'):
+    def compare(self, image, metric='undefined', return_image=True):
         """Compares an image to a reconstructed image.
 
+        If you need only the distortion (e.g. for visual regression tests),
+        pass ``return_image=False``, which doesn't make the difference image
+        at all::
+
+            with Image(filename='expected.png') as expected:
+                with Image(filename='actual.png') as actual:
+                    assert expected.compare(actual, 'root_mean_square',
+                                            return_image=False) < 0.01
+
         :param image: The reference image
         :type image: :class:`wand.image.Image`
         :param metric: The metric type to use for comparing.
+                       See :const:`COMPARE_METRICS`
         :type metric: :class:`basestring`
+        :param return_image: whether to make the difference image.
+                             :const:`True` by default
+        :type return_image: :class:`bool`
         :returns: The difference image(:class:`wand.image.Image`),
                   the computed distortion between the images
-                  (:class:`numbers.Integral`)
-        :rtype: :class:`tuple`
+                  (:class:`numbers.Real`).  only the distortion
+                  if ``return_image`` is :const:`False`
+        :rtype: :class:`tuple`, :class:`numbers.Real`
+
+        .. versionadded:: 0.4.3
+
+        .. versionchanged:: 0.4.5
+           Added ``return_image`` parameter.
 
-        ..versionadded:: 0.4.3
         """
-        if not isinstance(metric, string_type):
-            raise TypeError('metric must be a string, not ' + repr(metric))
+        if not isinstance(image, BaseImage):
+            raise TypeError('image must be a wand.image.BaseImage instance, '
+                            'not ' + repr(image))
+        metric_index = compare_metric_index(metric)
+        distortion = ctypes.c_double()
+        if not return_image:
+            r = library.MagickGetImageDistortion(self.wand, image.wand,
+                                                 metric_index,
+                                                 ctypes.byref(distortion))
+            if not r:
+                self.raise_exception()
+            return distortion.value
+        compared_wand = library.MagickCompareImages(self.wand, image.wand,
+                                                    metric_index,
+                                                    ctypes.byref(distortion))
+        if not compared_wand:
+            self.raise_exception()
+        compared = Image()
+        compared.wand = compared_wand
+        return compared, distortion.value
+
+    def distortions(self, image, metrics=COMPARE_METRICS[1:]):
+        """Computes distortions between the image and the reference
+        ``image`` in several metrics at once, without making difference
+        images::
 
-        metric = COMPARE_METRICS.index(metric)
+            scores = actual.distortions(expected, ['root_mean_square',
+                                                   'peak_absolute'])
+
+        :param image: The reference image
+        :type image: :class:`wand.image.Image`
+        :param metrics: metric types to compute.  every metric of
+                        :const:`COMPARE_METRICS` except ``'undefined'``
+                        by default
+        :type metrics: :class:`collections.Iterable`
+        :returns: the ordered mapping of metrics to distortions
+        :rtype: :class:`collections.OrderedDict`
+
+        .. versionadded:: 0.4.5
+
+        """
+        if not isinstance(image, BaseImage):
+            raise TypeError('image must be a wand.image.BaseImage instance, '
+                            'not ' + repr(image))
+        if isinstance(metrics, string_type):
+            raise TypeError('metrics must be a list of strings, not ' +
+                            repr(metrics))
+        metrics = [(metric, compare_metric_index(metric))
+                   for metric in metrics]
+        wand = self.wand
+        reference = image.wand
         distortion = ctypes.c_double()
-        compared_image = library.MagickCompareImages(self.wand, image.wand,
-                                                     metric,
-                                                     ctypes.byref(distortion))
-        return Image(BaseImage(compared_image)), distortion.value
+        result = collections.OrderedDict()
+        for metric, metric_index in metrics:
+            r = library.MagickGetImageDistortion(wand, reference,
+                                                 metric_index,
+                                                 ctypes.byref(distortion))
+            if not r:
+                self.raise_exception()
+            result[metric] = distortion.value
+        return result
+
+    def diff_bounds(self, other, fuzz=0, tile_size=16):
+        """Finds the bounding boxes of regions which differ between the image
+        and the ``other`` image of the same size, e.g. to re-encode only
+        changed parts of a frame::
+
+            for left, top, width, height in frame.diff_bounds(previous):
+                with frame[left:left + width, top:top + height] as changed:
+                    changed.save(filename='patch-{0}-{1}.png'.format(left,
+                                                                     top))
+
+        Pixels are compared tile by tile from exported buffers in strips,
+        so it doesn't make a difference image.  Changed tiles touching each
+        other make a region, and each region is shrunk to the exact bounds
+        of changed pixels, which are found within the strip as well.
+
+        :param other: the image to compare
+        :type other: :class:`BaseImage`
+        :param fuzz: pixels whose all channels differ by at most ``fuzz``
+                     are regarded as the same.  it's in the
+                     :attr:`quantum_range`, like :meth:`trim()`
+        :type fuzz: :class:`numbers.Real`
+        :param tile_size: the width and height of tiles.  regions closer
+                          than this are likely merged
+        :type tile_size: :class:`numbers.Integral`
+        :returns: the list of ``(left, top, width, height)`` boxes, from top
+                  to bottom.  empty if the images are the same
+        :rtype: :class:`list`
+        :raises ValueError: when images are of different sizes
+
+        .. versionadded:: 0.4.5
+
+        """
+        if not isinstance(other, BaseImage):
+            raise TypeError('other must be a wand.image.BaseImage instance, '
+                            'not ' + repr(other))
+        elif not isinstance(fuzz, numbers.Real) or fuzz < 0:
+            raise TypeError('fuzz must be a non-negative number, not ' +
+                            repr(fuzz))
+        elif not isinstance(tile_size, numbers.Integral) or tile_size < 1:
+            raise TypeError('tile_size must be a natural number, not ' +
+                            repr(tile_size))
+        width, height = self.size
+        if other.size != (width, height):
+            raise ValueError('{0!r} and {1!r} are of different sizes'.format(
+                self, other
+            ))
+        # Pixels are exported as RGBA of 16 bits unless the library is Q8,
+        # so that no change is rounded away.
+        if self.quantum_range <= 255:
+            storage, typecode, maximum = 'char', 'B', 255
+        else:
+            storage, typecode, maximum = 'short', 'H', 65535
+        tolerance = int(fuzz * maximum // self.quantum_range)
+        pixel_bytes = 4 * (1 if storage == 'char' else 2)
+        stride = width * pixel_bytes
+        tile_bytes = tile_size * pixel_bytes
+        # The exact (left, top, right, bottom) bounds of changed pixels in
+        # each changed tile, found while its strip is exported.
+        tiles = {}
+        for row, top in enumerate(xrange(0, height, tile_size)):
+            rows = min(tile_size, height - top)
+            a = self.export_pixels(0, top, width, rows, storage=storage)
+            b = other.export_pixels(0, top, width, rows, storage=storage)
+            if a == b:
+                continue
+            a = memoryview(a)
+            b = memoryview(b)
+            for y in xrange(rows):
+                start = y * stride
+                end = start + stride
+                if a[start:end] == b[start:end]:
+                    continue
+                for x in xrange(start, end, tile_bytes):
+                    x_end = min(x + tile_bytes, end)
+                    if a[x:x_end] == b[x:x_end]:
+                        continue
+                    span = changed_span(
+                        array.array(typecode, a[x:x_end].tobytes()),
+                        array.array(typecode, b[x:x_end].tobytes()),
+                        tolerance
+                    )
+                    if span is None:
+                        continue
+                    pixel = (x - start) // pixel_bytes
+                    left = pixel + span[0]
+                    right = pixel + span[1] + 1
+                    key = (x - start) // tile_bytes, row
+                    box = tiles.get(key)
+                    if box is None:
+                        tiles[key] = [left, top + y, right, top + y + 1]
+                    else:
+                        box[0] = min(box[0], left)
+                        box[2] = max(box[2], right)
+                        box[3] = top + y + 1
+        bounds = []
+        for group in connected_tiles(tiles):
+            boxes = [tiles[tile] for tile in group]
+            left = min(box[0] for box in boxes)
+            top = min(box[1] for box in boxes)
+            right = max(box[2] for box in boxes)
+            bottom = max(box[3] for box in boxes)
+            bounds.append((left, top, right - left, bottom - top))
+        bounds.sort(key=lambda box: (box[1], box[0]))
+        return bounds
+
+    def find(self, template, metric='root_mean_square', threshold=None,
+             levels=None):
+        """Finds where the ``template`` image appears in the image, e.g.
+        a logo or a button in a screenshot::
+
+            with Image(filename='screenshot.png') as screenshot:
+                with Image(filename='button.png') as button:
+                    found = screenshot.find(button, threshold=0.05)
+                    if found:
+                        x, y, score = found
+
+        The search runs in ImageMagick by :c:func:`MagickSimilarityImage()`.
+        It's costly for large images, so it first searches on downsampled
+        copies of both images, and then refines the found offset on larger
+        copies only around the offset found on the smaller ones.  The search
+        is led by the root mean squared error, and the ``metric`` is used
+        for the score of the found offset.
+
+        :param template: the image to find
+        :type template: :class:`BaseImage`
+        :param metric: the metric of the score.
+                       See :const:`COMPARE_METRICS`
+        :type metric: :class:`basestring`
+        :param threshold: the maximum score (the minimum one for
+                          :const:`~wand.compare.SIMILARITY_METRICS`)
+                          to accept.  the best match is always accepted
+                          by default
+        :type threshold: :class:`numbers.Real`
+        :param levels: the number of times to halve the images for
+                       the coarse search.  0 searches exhaustively on
+                       the original images, which never misses the best
+                       match but is much slower.  chosen by the template
+                       size by default
+        :type levels: :class:`numbers.Integral`
+        :returns: the triple of ``(x, y, score)``, or ``None`` if the score
+                  isn't within the ``threshold``
+        :rtype: :class:`tuple`
+        :raises ValueError: when the ``template`` is larger than the image
+
+        .. versionadded:: 0.4.5
+
+        """
+        if not isinstance(template, BaseImage):
+            raise TypeError('template must be a wand.image.BaseImage '
+                            'instance, not ' + repr(template))
+        compare_metric_index(metric)
+        template_width, template_height = template.size
+        if template_width > self.width or template_height > self.height:
+            raise ValueError('template {0!r} is larger than {1!r}'.format(
+                template, self
+            ))
+        if levels is None:
+            levels = 0
+            smaller = min(template_width, template_height)
+            while smaller >= FIND_MIN_TEMPLATE_SIZE * 2 and levels < 4:
+                smaller //= 2
+                levels += 1
+        elif not isinstance(levels, numbers.Integral) or levels < 0:
+            raise TypeError('levels must be a natural number, not ' +
+                            repr(levels))
+        # Only the current images, whose pixel caches are shared until
+        # they're changed.
+        images = [BaseImage(library.MagickGetImage(self.wand))]
+        templates = [BaseImage(library.MagickGetImage(template.wand))]
+        try:
+            for _ in xrange(levels):
+                image = images[-1]
+                smaller_template = templates[-1]
+                if min(smaller_template.size) < FIND_MIN_TEMPLATE_SIZE * 2:
+                    break
+                image = BaseImage(library.CloneMagickWand(image.wand))
+                images.append(image)
+                image.resize(image.width // 2, image.height // 2)
+                smaller_template = BaseImage(
+                    library.CloneMagickWand(smaller_template.wand)
+                )
+                templates.append(smaller_template)
+                smaller_template.resize(smaller_template.width // 2,
+                                        smaller_template.height // 2)
+            x, y, _ = similarity_offset(images[-1], templates[-1])
+            for image, level_template in reversed(list(zip(images[:-1],
+                                                           templates[:-1]))):
+                width, height = level_template.size
+                left = max(0, x * 2 - FIND_MARGIN)
+                top = max(0, y * 2 - FIND_MARGIN)
+                right = min(image.width, x * 2 + width + FIND_MARGIN)
+                bottom = min(image.height, y * 2 + height + FIND_MARGIN)
+                window = BaseImage(library.CloneMagickWand(image.wand))
+                try:
+                    window.crop(left, top, right, bottom)
+                    x, y, _ = similarity_offset(window, level_template)
+                finally:
+                    window.destroy()
+                x += left
+                y += top
+            found = BaseImage(library.CloneMagickWand(images[0].wand))
+            try:
+                found.crop(x, y, width=template_width, height=template_height)
+                score = found.compare(templates[0], metric,
+                                      return_image=False)
+            finally:
+                found.destroy()
+        finally:
+            for image in images + templates:
+                image.destroy()
+        if threshold is not None:
+            from .compare import passes
+            if not passes(metric, score, threshold):
+                return None
+        return x, y, score
+
+    @manipulative
+    def map_tiles(self, function, tile=(512, 512), overlap=16, workers=None,
+                  processes=False):
+        """Splits the image into tiles, applies the ``function`` to each tile
+        in a pool of workers, and puts the results back together.  It makes
+        operations that don't scale across cores by themselves parallel
+        on very large images::
+
+            img.map_tiles(lambda tile: tile.gaussian_blur(4, 2), overlap=16)
+
+        Each tile is cropped with ``overlap`` extra pixels on each side,
+        so that operations reading neighbor pixels (e.g. blurring) see
+        the same pixels as on the whole image.  The extra pixels are
+        dropped from the results.  Use ``overlap`` at least the radius of
+        such operations to avoid seams.
+
+        The ``function`` takes an :class:`Image` tile, and either manipulates
+        it in place (returning ``None``) or returns another image of the same
+        size.  The tile is closed after it's put back.
+
+        :param function: the function to apply to each tile
+        :type function: :class:`collections.Callable`
+        :param tile: the ``(width, height)`` of tiles without overlap
+        :type tile: :class:`collections.Sequence`
+        :param overlap: the number of extra pixels on each side of tiles
+        :type overlap: :class:`numbers.Integral`
+        :param workers: the number of workers.  the number of CPUs
+                        by default.  1 to run in the current thread
+        :type workers: :class:`numbers.Integral`
+        :param processes: whether to use worker processes instead of threads,
+                          through :func:`wand.parallel.process_map()`.
+                          the ``function`` has to be picklable then,
+                          and only pixels are transferred
+        :type processes: :class:`bool`
+        :raises ValueError: when the ``function`` changes the size of tiles
+
+        .. versionadded:: 0.4.5
+
+        """
+        if not callable(function):
+            raise TypeError('function must be callable, not ' +
+                            repr(function))
+        elif not (isinstance(tile, collections.Sequence) and
+                  len(tile) == 2 and
+                  all(isinstance(v, numbers.Integral) and v > 0
+                      for v in tile)):
+            raise TypeError('tile must be a (width, height) pair of natural '
+                            'numbers, not ' + repr(tile))
+        elif not isinstance(overlap, numbers.Integral) or overlap < 0:
+            raise TypeError('overlap must be a natural number, not ' +
+                            repr(overlap))
+        import multiprocessing
+        import multiprocessing.pool
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        elif not isinstance(workers, numbers.Integral) or workers < 1:
+            raise TypeError('workers must be a natural number, not ' +
+                            repr(workers))
+        tile_width, tile_height = tile
+        width, height = self.size
+        boxes = []
+        for top in xrange(0, height, tile_height):
+            for left in xrange(0, width, tile_width):
+                right = min(width, left + tile_width)
+                bottom = min(height, top + tile_height)
+                boxes.append((
+                    (left, top, right, bottom),
+                    (max(0, left - overlap), max(0, top - overlap),
+                     min(width, right + overlap),
+                     min(height, bottom + overlap))
+                ))
+        pool = None
+        if processes:
+            from .parallel import initialize_worker, process_map
+            pool = multiprocessing.Pool(workers,
+                                        initializer=initialize_worker)
+
+            def run_batch(tiles):
+                return process_map(function, tiles, pool=pool)
+        elif workers > 1 and len(boxes) > 1:
+            pool = multiprocessing.pool.ThreadPool(workers)
+
+            def run_batch(tiles):
+                return pool.map(functools.partial(apply_tile, function),
+                                tiles, chunksize=1)
+        else:
+            def run_batch(tiles):
+                return [apply_tile(function, t) for t in tiles]
+        copy = COMPOSITE_OPERATORS.index('copy')
+        # Tiles are cropped from the copy of the current image, so that
+        # pasting results doesn't change pixels other tiles have to read.
+        source = BaseImage(library.MagickGetImage(self.wand))
+        try:
+            # Only a few batches of tiles are alive at once.
+            batch_size = workers * 2
+            for i in xrange(0, len(boxes), batch_size):
+                batch = boxes[i:i + batch_size]
+                tiles = [source[outer[0]:outer[2], outer[1]:outer[3]]
+                         for _, outer in batch]
+                results = []
+                try:
+                    results = run_batch(tiles)
+                    for (inner, outer), result in zip(batch, results):
+                        left, top, right, bottom = inner
+                        if not isinstance(result, BaseImage):
+                            raise TypeError('function must return an image '
+                                            'or None, not ' + repr(result))
+                        elif result.size != (outer[2] - outer[0],
+                                             outer[3] - outer[1]):
+                            raise ValueError(
+                                'function must not change the size of '
+                                'tiles; {0!r} became {1!r}'.format(
+                                    outer, result.size
+                                )
+                            )
+                        result.crop(left - outer[0], top - outer[1],
+                                    width=right - left, height=bottom - top)
+                        library.MagickCompositeImage(self.wand, result.wand,
+                                                     copy, left, top)
+                        self.raise_exception()
+                finally:
+                    returned = [r for r in results
+                                if isinstance(r, BaseImage) and
+                                all(r is not t for t in tiles)]
+                    for image in tiles + returned:
+                        image.destroy()
+        finally:
+            source.destroy()
+            if pool is not None:
+                pool.close()
+                pool.join()
 
     @manipulative
     def composite(self, image, left, top):
@@ -2346,6 +3361,88 @@ class BaseImage(Resource):
                                             op, int(left), int(top))
         self.raise_exception()
 
+    @manipulative
+    def flatten_layers(self, layers):
+        """Composites several ``layers`` onto the image at once.  It's
+        equivalent to calling :meth:`composite()` or
+        :meth:`composite_channel()` for each layer, but layers are
+        flattened by a single :c:func:`MagickMergeImageLayers()` call
+        instead of a pass over the image for each of them. ::
+
+            with Image(filename='background.png') as img:
+                img.flatten_layers([(photo, 40, 40),
+                                    (shadow, 36, 44, 'multiply'),
+                                    (logo, 0, 0, 'screen')])
+
+        :param layers: ``(image, left, top)`` or
+                       ``(image, left, top, operator)`` tuples, composited
+                       in order.  ``operator`` is one of
+                       :const:`COMPOSITE_OPERATORS`, ``'over'`` by default.
+                       only the current frame of each image is used
+        :type layers: :class:`collections.Iterable`
+        :raises ValueError: when an ``operator`` is invalid
+
+        .. note::
+
+           Like :meth:`merge_layers()`, the image becomes a single image
+           of the flattened current frame.
+
+        .. versionadded:: 0.4.5
+
+        """
+        normalized = []
+        for layer in layers:
+            if len(layer) == 3:
+                image, left, top = layer
+                operator = 'over'
+            else:
+                image, left, top, operator = layer
+            if not isinstance(image, BaseImage):
+                raise TypeError('expected a wand.image.BaseImage instance, '
+                                'not ' + repr(image))
+            elif not isinstance(left, numbers.Integral):
+                raise TypeError('left must be an integer, not ' + repr(left))
+            elif not isinstance(top, numbers.Integral):
+                raise TypeError('top must be an integer, not ' + repr(top))
+            elif operator not in COMPOSITE_OPERATORS:
+                raise ValueError(repr(operator) + ' is an invalid composite '
+                                 'operator type; see wand.image.COMPOSITE_'
+                                 'OPERATORS dictionary')
+            normalized.append((image, left, top,
+                               COMPOSITE_OPERATORS.index(operator)))
+        if not normalized:
+            return
+        width, height = self.size
+        with Image() as stack:
+            # The base layer is copied as it is onto the canvas of its
+            # own size and background.
+            base = BaseImage(library.MagickGetImage(self.wand))
+            try:
+                library.MagickAddImage(stack.wand, base.wand)
+            finally:
+                base.destroy()
+            library.MagickSetLastIterator(stack.wand)
+            library.MagickSetImagePage(stack.wand, width, height, 0, 0)
+            library.MagickSetImageCompose(stack.wand,
+                                          COMPOSITE_OPERATORS.index('copy'))
+            for image, left, top, operator in normalized:
+                frame = BaseImage(library.MagickGetImage(image.wand))
+                try:
+                    library.MagickAddImage(stack.wand, frame.wand)
+                finally:
+                    frame.destroy()
+                library.MagickSetLastIterator(stack.wand)
+                library.MagickSetImagePage(stack.wand, 0, 0, left, top)
+                library.MagickSetImageCompose(stack.wand, operator)
+            stack.raise_exception()
+            library.MagickSetFirstIterator(stack.wand)
+            flattened = library.MagickMergeImageLayers(
+                stack.wand, IMAGE_LAYER_METHOD.index('flatten')
+            )
+            if not flattened:
+                stack.raise_exception()
+        self.wand = flattened
+
     @manipulative
     def equalize(self):
         """Equalizes the image histogram
@@ -2457,6 +3554,7 @@ class BaseImage(Resource):
         if not r:
             self.raise_exception()
 
+    @manipulative
     def negate(self, grayscale=False, channel=None):
         """Negate the colors in the reference image.
 
@@ -2795,20 +3893,13 @@ class Image(BaseImage):
     #: (:class:`Metadata`) The metadata mapping of the image.  Read only.
     #:
     #: .. versionadded:: 0.3.0
-    metadata = None
+    metadata = lazy_property('metadata', lambda image: Metadata(image))
 
-    #: (:class:`ChannelImageDict`) The mapping of separated channels
-    #: from the image. ::
-    #:
-    #:     with image.channel_images['red'] as red_image:
-    #:         display(red_image)
-    channel_images = None
-
-    #: (:class:`ChannelDepthDict`) The mapping of channels to their depth.
-    #: Read only.
+    #: (:class:`collections.Sequence`) The list of
+    #: :class:`~wand.sequence.SingleImage`\ s that the image contains.
     #:
     #: .. versionadded:: 0.3.0
-    channel_depths = None
+    sequence = lazy_property('sequence', make_sequence)
 
     def __init__(self, image=None, blob=None, file=None, filename=None,
                  format=None, width=None, height=None, depth=None,
@@ -2832,7 +3923,7 @@ class Image(BaseImage):
             raise ValueError('Depth must be 8, 16 or 32')
         with self.allocate():
             if image is None:
-                wand = library.NewMagickWand()
+                wand = acquire_wand()
                 super(Image, self).__init__(wand)
             if image is not None:
                 if not isinstance(image, BaseImage):
@@ -2843,11 +3934,12 @@ class Image(BaseImage):
             elif any(a is not None for a in open_args):
                 if format:
                     format = binary(format)
-                with Color('transparent') as bg:  # FIXME: parameterize this
-                    result = library.MagickSetBackgroundColor(self.wand,
-                                                              bg.resource)
-                    if not result:
-                        self.raise_exception()
+                # FIXME: parameterize this
+                result = library.MagickSetBackgroundColor(
+                    self.wand, transparent_background()
+                )
+                if not result:
+                    self.raise_exception()
 
                 # allow setting the width, height and depth
                 # (needed for loading raw data)
@@ -2875,16 +3967,17 @@ class Image(BaseImage):
                 # clear the wand format, otherwise any subsequent call to
                 # MagickGetImageBlob will silently change the image to this
                 # format again.
-                library.MagickSetFormat(self.wand, binary(""))
+                if format:
+                    library.MagickSetFormat(self.wand, b'')
             elif width is not None and height is not None:
                 self.blank(width, height, background)
                 if depth:
                     r = library.MagickSetImageDepth(self.wand, depth)
                     if not r:
                         raise self.raise_exception()
-            self.metadata = Metadata(self)
-            from .sequence import Sequence
-            self.sequence = Sequence(self)
+            else:
+                # Nothing can fail on an empty wand.
+                return
         self.raise_exception()
 
     def destroy(self):
@@ -2894,8 +3987,10 @@ class Image(BaseImage):
         manager.
 
         """
-        while self.sequence:
-            self.sequence.pop()
+        # The sequence is made lazily; don't make one only to empty it.
+        sequence = self.__dict__.get('sequence')
+        while sequence:
+            sequence.pop()
         super(Image, self).destroy()
 
     def read(self, file=None, filename=None, blob=None, resolution=None):
@@ -2948,6 +4043,7 @@ class Image(BaseImage):
         elif filename is not None:
             filename = encode_filename(filename)
             r = library.MagickReadImage(self.wand, filename)
+        self._signature = None
         if not r:
             self.raise_exception()
 
@@ -2963,6 +4059,7 @@ class Image(BaseImage):
         """
         self.destroy()
 
+    @manipulative
     def clear(self):
         """Clears resources associated with the image, leaving the image blank,
         and ready to be used with new image.
@@ -2972,6 +4069,7 @@ class Image(BaseImage):
         """
         library.ClearMagickWand(self.wand)
 
+    @manipulative
     def level(self, black=0.0, white=None, gamma=1.0, channel=None):
         """Adjusts the levels of an image by scaling the colors falling
         between specified black and white points to the full available
@@ -3138,6 +4236,7 @@ class Image(BaseImage):
         with background:
             r = library.MagickNewImage(self.wand, width, height,
                                        background.resource)
+            self._signature = None
             if not r:
                 self.raise_exception()
         return self
@@ -3162,6 +4261,28 @@ class Image(BaseImage):
         cloned.format = format
         return cloned
 
+    def pipeline(self, **options):
+        """Makes a :class:`~wand.pipeline.Pipeline` which records operations
+        and runs them on a copy of the image lazily, in an optimized
+        order. ::
+
+            blob = (img.pipeline()
+                       .resize(800, 600)
+                       .crop(0, 0, width=400, height=300)
+                       .make_blob('png'))
+
+        It takes the same keyword options as
+        :class:`~wand.pipeline.Pipeline` e.g. ``optimize``.
+
+        :returns: a new pipeline
+        :rtype: :class:`~wand.pipeline.Pipeline`
+
+        .. versionadded:: 0.4.5
+
+        """
+        from .pipeline import Pipeline
+        return Pipeline(self, **options)
+
     def save(self, file=None, filename=None):
         """Saves the image into the ``file`` or ``filename``. It takes
         only one argument at a time.
@@ -3251,6 +4372,7 @@ class Image(BaseImage):
             return blob
         self.raise_exception()
 
+    @manipulative
     def strip(self):
         """Strips an image of all profiles and comments.
 
@@ -3261,6 +4383,7 @@ class Image(BaseImage):
         if not result:
             self.raise_exception()
 
+    @manipulative
     def trim(self, color=None, fuzz=0):
         """Remove solid border from image. Uses top left pixel as a guide
         by default, or you can also specify the ``color`` to remove.
@@ -3359,6 +4482,7 @@ class Image(BaseImage):
         except AttributeError:
             self._auto_orient()
 
+    @manipulative
     def border(self, color, width, height):
         """Surrounds the image with a border.
 
@@ -3479,6 +4603,7 @@ class Image(BaseImage):
                                          linear_range * black_point,
                                          linear_range * white_point)
 
+    @manipulative
     def normalize(self, channel=None):
         """Normalize color channels.
 
@@ -3509,6 +4634,54 @@ class Image(BaseImage):
             extra_format=' {self.format!r} ({self.width}x{self.height})'
         )
 
+    def __reduce_ex__(self, protocol):
+        """Pickles the image losslessly.  Every frame is serialized in
+        the MIFF format, which holds raw pixels together with properties
+        (size, depth, colorspace, page, delay, metadata, profiles), so images
+        can be cheaply sent to other processes e.g. through
+        :class:`concurrent.futures.ProcessPoolExecutor`.  The original
+        :attr:`format` is restored after unpickling.
+
+        With pickle protocol 5 or higher the serialized pixels are passed
+        as a :class:`pickle.PickleBuffer` so that they can be transferred
+        out-of-band without being copied into the pickle stream.
+
+        .. versionadded:: 0.4.5
+
+        """
+        if not self.sequence:
+            return type(self), ()
+        fmt = self.format
+        with self.convert('miff') as converted:
+            blob = converted.make_blob()
+        if protocol >= 5 and PickleBuffer is not None:
+            blob = PickleBuffer(blob)
+        return unpickle_image, (blob, fmt)
+
+
+#: (:class:`type`) :class:`pickle.PickleBuffer` if it's available
+#: (Python 3.8 or higher), or ``None``.
+PickleBuffer = getattr(pickle, 'PickleBuffer', None)
+
+
+def unpickle_image(blob, format=None):
+    """Restores an :class:`Image` pickled by :meth:`Image.__reduce_ex__()`.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    if not isinstance(blob, binary_type):
+        blob = memoryview(blob).tobytes()
+    image = Image(blob=blob)
+    if format:
+        format = binary(format)
+        for index in xrange(len(image.sequence)):
+            with image.sequence.index_context(index):
+                library.MagickSetImageFormat(image.wand, format)
+    return image
+
 
 class Iterator(Resource, collections.Iterator):
     """Row iterator for :class:`Image`. It shouldn't be instantiated
@@ -0,0 +1,153 @@
+""":mod:`wand.montage` --- Contact sheets
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+:func:`contact_sheet()` lays out thumbnails of many images in a grid::
+
+    import glob
+
+    from wand.montage import contact_sheet
+
+    with contact_sheet(glob.glob('photos/*.jpg'), columns=10) as sheet:
+        sheet.save(filename='sheet.jpg')
+
+Unlike appending images to a :class:`~wand.sequence.Sequence`, sources
+are read one at a time.  Each source is decoded at a reduced scale if
+possible (``jpeg:size``), downsized to fit its cell, composited onto
+the sheet which is allocated in advance, and freed before the next one is
+read, so memory usage depends on the size of the sheet, not the number
+of sources.
+
+.. versionadded:: 0.4.5
+
+"""
+import numbers
+
+from .api import library
+from .color import Color
+from .compat import binary, binary_type, string_type
+from .image import BaseImage, Image, transparent_background
+
+__all__ = 'contact_sheet', 'thumbnail'
+
+
+def thumbnail(source, width, height, filter='undefined', upscale=False):
+    """Reads the ``source`` downsized to fit in ``width`` x ``height``,
+    keeping its aspect ratio.  Only the first frame is kept.
+
+    :param source: a filename, a blob, a file object, or an image which
+                   is cloned and never changed
+    :param width: the maximum width
+    :type width: :class:`numbers.Integral`
+    :param height: the maximum height
+    :type height: :class:`numbers.Integral`
+    :param filter: the resize filter.
+                   see :const:`~wand.image.FILTER_TYPES`
+    :type filter: :class:`basestring`
+    :param upscale: whether to enlarge images smaller than the box
+    :type upscale: :class:`bool`
+    :returns: a new image.  it has to be closed by the caller
+    :rtype: :class:`~wand.image.Image`
+
+    """
+    if isinstance(source, BaseImage):
+        image = Image(image=source)
+    else:
+        image = Image()
+    try:
+        if not isinstance(source, BaseImage):
+            library.MagickSetBackgroundColor(image.wand,
+                                             transparent_background())
+            # The hint is square as in wand.pipeline.decode_hint(), so
+            # that it's still large enough for any aspect ratio.
+            library.MagickSetOption(
+                image.wand, b'jpeg:size',
+                binary('{0}x{0}'.format(max(width, height)))
+            )
+            if isinstance(source, string_type):
+                image.read(filename=source)
+            elif isinstance(source, binary_type):
+                image.read(blob=source)
+            elif callable(getattr(source, 'read', None)):
+                image.read(file=source)
+            else:
+                raise TypeError('source must be an image, a filename, '
+                                'a blob, or a file object, not ' +
+                                repr(source))
+        while len(image.sequence) > 1:
+            del image.sequence[-1]
+        ratio = min(width / float(image.width),
+                    height / float(image.height))
+        if ratio < 1 or upscale:
+            image.resize(max(1, int(round(image.width * ratio))),
+                         max(1, int(round(image.height * ratio))),
+                         filter=filter)
+    except Exception:
+        image.close()
+        raise
+    return image
+
+
+def contact_sheet(sources, columns, cell_size=(128, 128), spacing=4,
+                  background=None, filter='undefined', count=None):
+    """Makes a contact sheet, thumbnails of ``sources`` in a grid,
+    row by row.  Each thumbnail is centered in its cell.
+
+    :param sources: filenames, blobs, file objects, or images.  it can be
+                    an iterator e.g. a generator if ``count`` is given,
+                    then they're read as they're generated
+    :type sources: :class:`collections.Iterable`
+    :param columns: the number of columns
+    :type columns: :class:`numbers.Integral`
+    :param cell_size: the ``(width, height)`` of cells
+    :type cell_size: :class:`tuple`
+    :param spacing: the number of pixels between and around cells
+    :type spacing: :class:`numbers.Integral`
+    :param background: the background color.  default is white
+    :type background: :class:`~wand.color.Color`
+    :param filter: the resize filter of thumbnails.
+                   see :const:`~wand.image.FILTER_TYPES`
+    :type filter: :class:`basestring`
+    :param count: the number of sources.  ``len(sources)`` by default,
+                  and required if ``sources`` has no length.
+                  sources more than it are ignored
+    :type count: :class:`numbers.Integral`
+    :returns: the contact sheet.  it has to be closed by the caller
+    :rtype: :class:`~wand.image.Image`
+
+    """
+    if not isinstance(columns, numbers.Integral) or columns < 1:
+        raise TypeError('columns must be a natural number, not ' +
+                        repr(columns))
+    elif not isinstance(spacing, numbers.Integral) or spacing < 0:
+        raise TypeError('spacing must be a natural number, not ' +
+                        repr(spacing))
+    cell_width, cell_height = cell_size
+    if count is None:
+        try:
+            count = len(sources)
+        except TypeError:
+            raise TypeError('count is required for sources without '
+                            'length e.g. generators: ' + repr(sources))
+    if count < 1:
+        raise ValueError('sources cannot be empty')
+    rows = -(-count // columns)
+    columns = min(columns, count)
+    sheet = Image(width=columns * (cell_width + spacing) + spacing,
+                  height=rows * (cell_height + spacing) + spacing,
+                  background=background or Color('white'))
+    try:
+        for index, source in enumerate(sources):
+            if index >= count:
+                break
+            row, column = divmod(index, columns)
+            with thumbnail(source, cell_width, cell_height,
+                           filter=filter) as thumb:
+                left = (spacing + column * (cell_width + spacing) +
+                        (cell_width - thumb.width) // 2)
+                top = (spacing + row * (cell_height + spacing) +
+                       (cell_height - thumb.height) // 2)
+                sheet.composite(thumb, left, top)
+    except Exception:
+        sheet.close()
+        raise
+    return sheet
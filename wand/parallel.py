@@ -0,0 +1,328 @@
+""":mod:`wand.parallel` --- Process pool processing
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Most of heavy operations in ImageMagick release the GIL, but operations
+implemented in Python (e.g. :class:`~wand.image.Iterator`,
+:class:`~wand.color.Color` construction, :class:`~wand.drawing.Drawing`
+argument marshalling) hold it, so threads don't scale for them.
+:func:`process_map()` distributes such work to a pool of processes instead::
+
+    from wand.parallel import process_map
+
+    def posterize(image):
+        for row in image:
+            ...
+        return image
+
+    results = process_map(posterize, images, processes=4)
+
+Decoded pixels are transferred between processes through
+:mod:`multiprocessing.shared_memory` (exported and imported by
+:meth:`~wand.image.BaseImage.export_pixels()` and
+:meth:`~wand.image.BaseImage.import_pixels()`) rather than pickling
+encoded blobs, so nothing is encoded nor decoded twice.
+
+.. note::
+
+   Only pixels and the size of the first frame are transferred.
+   The format, metadata and other frames aren't.
+
+.. note::
+
+   :mod:`multiprocessing.shared_memory` is available since Python 3.8.
+   On older Pythons pixels are pickled as raw bytes instead, which is
+   still cheaper than encoding.
+
+.. versionadded:: 0.4.5
+
+"""
+import ctypes
+import itertools
+import multiprocessing
+import os
+
+from .compat import string_type
+from .image import STORAGE_CTYPES, BaseImage, Image
+from .resource import increment_refcount
+from .version import QUANTUM_DEPTH
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+__all__ = ('default_storage', 'export_image', 'import_image',
+           'initialize_worker', 'process_map')
+
+
+#: (:class:`bool`) Whether results can be transferred through shared memory.
+#: On Windows a shared memory block is freed as soon as the worker that
+#: created it closes its handle, so results are pickled there instead.
+SHARED_RESULTS = shared_memory is not None and os.name != 'nt'
+
+
+def initialize_worker():
+    """Preloads the MagickWand library once per worker process.  It's
+    the ``initializer`` for pools passed to :func:`process_map()`::
+
+        pool = multiprocessing.Pool(4, initializer=initialize_worker)
+
+    The worker keeps the library instantiated until it exits, so that
+    :c:func:`MagickWandGenesis` isn't repeated for every task.
+
+    """
+    increment_refcount()
+
+
+def default_storage():
+    """Chooses the pixel storage type that doesn't lose precision for
+    the linked ImageMagick library.
+
+    :returns: ``'char'`` for Q8 builds, ``'short'`` otherwise
+    :rtype: :class:`str`
+
+    """
+    return 'char' if QUANTUM_DEPTH == 8 else 'short'
+
+
+def export_image(image, channel_map, storage, shared=True):
+    """Exports pixels of the ``image`` into a transferable descriptor.
+
+    :param image: the image to export
+    :type image: :class:`~wand.image.BaseImage`
+    :param channel_map: channel letters to export e.g. ``'RGBA'``
+    :type channel_map: :class:`basestring`
+    :param storage: the type of each channel value
+    :type storage: :class:`basestring`
+    :param shared: whether to use shared memory if possible
+    :type shared: :class:`bool`
+    :returns: a pair of the descriptor and the
+              :class:`~multiprocessing.shared_memory.SharedMemory` that has
+              to be kept open until the descriptor is consumed (or ``None``)
+    :rtype: :class:`tuple`
+
+    """
+    width, height = image.size
+    if shared and shared_memory is not None:
+        size = (width * height * len(channel_map) *
+                ctypes.sizeof(STORAGE_CTYPES[storage]))
+        block = shared_memory.SharedMemory(create=True, size=size)
+        try:
+            image.export_pixels(channel_map=channel_map, storage=storage,
+                                buffer=block.buf)
+        except Exception:
+            block.close()
+            block.unlink()
+            raise
+        return ('shm', block.name, width, height), block
+    pixels = image.export_pixels(channel_map=channel_map, storage=storage)
+    return ('bytes', bytes(pixels), width, height), None
+
+
+def import_image(descriptor, channel_map, storage):
+    """Makes a new :class:`~wand.image.Image` from the ``descriptor``
+    made by :func:`export_image()`.  It doesn't unlink the shared memory.
+
+    :param descriptor: the descriptor made by :func:`export_image()`
+    :type descriptor: :class:`tuple`
+    :param channel_map: channel letters of the exported pixels
+    :type channel_map: :class:`basestring`
+    :param storage: the type of each channel value
+    :type storage: :class:`basestring`
+    :returns: a new image
+    :rtype: :class:`~wand.image.Image`
+
+    """
+    kind, data, width, height = descriptor
+    image = Image(width=width, height=height)
+    try:
+        if kind == 'shm':
+            block = shared_memory.SharedMemory(name=data)
+            try:
+                image.import_pixels(block.buf, channel_map=channel_map,
+                                    storage=storage)
+            finally:
+                block.close()
+        else:
+            image.import_pixels(data, channel_map=channel_map,
+                                storage=storage)
+    except Exception:
+        image.close()
+        raise
+    return image
+
+
+def run_task(task):
+    """Runs a task of :func:`process_map()` inside a worker process.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    function, source, channel_map, storage = task
+    if isinstance(source, string_type):
+        image = Image(filename=source)
+    else:
+        image = import_image(source, channel_map, storage)
+    with image:
+        result = function(image)
+        if result is None:
+            result = image
+        if not isinstance(result, BaseImage):
+            return 'value', result
+        try:
+            descriptor, block = export_image(result, channel_map, storage,
+                                             shared=SHARED_RESULTS)
+        finally:
+            if result is not image:
+                result.close()
+    if block is not None:
+        # The block remains until the parent process unlinks it.
+        block.close()
+    return 'image', descriptor
+
+
+def process_map(function, images, processes=None, pool=None,
+                channel_map='RGBA', storage=None):
+    """Applies the ``function`` to each of ``images`` in a pool of worker
+    processes, and returns the results in order.
+
+    The ``function`` takes an :class:`~wand.image.Image` and can either
+    manipulate it in place (returning ``None``), return another image,
+    or return any other picklable value.  It has to be picklable as well
+    (i.e. a module-level function).  Images returned by workers come back
+    as new :class:`~wand.image.Image` objects which have to be closed
+    by the caller.
+
+    :param function: the function to apply to each image
+    :type function: :class:`collections.Callable`
+    :param images: images or filenames to process.  filenames are read
+                   by workers directly without any transfer
+    :type images: :class:`collections.Iterable`
+    :param processes: the number of worker processes.
+                      the number of CPUs by default
+    :type processes: :class:`numbers.Integral`
+    :param pool: an optional existing :class:`multiprocessing.pool.Pool`
+                 to reuse.  it should have been made with
+                 :func:`initialize_worker()` as ``initializer``
+    :type pool: :class:`multiprocessing.pool.Pool`
+    :param channel_map: channel letters to transfer
+    :type channel_map: :class:`basestring`
+    :param storage: the type of each channel value to transfer.
+                    :func:`default_storage()` by default
+    :type storage: :class:`basestring`
+    :returns: the list of results
+    :rtype: :class:`list`
+
+    .. versionadded:: 0.4.5
+
+    """
+    if not callable(function):
+        raise TypeError('function must be callable, not ' + repr(function))
+    if storage is None:
+        storage = default_storage()
+    # Inputs are exported batch by batch, so that only a few of them are
+    # in shared memory at once.
+    batch_size = (processes or multiprocessing.cpu_count()) * 2
+    images = iter(images)
+    results = []
+    own_pool = pool is None
+    try:
+        while True:
+            batch = list(itertools.islice(images, batch_size))
+            if not batch:
+                break
+            if pool is None:
+                pool = multiprocessing.Pool(processes,
+                                            initializer=initialize_worker)
+            results.extend(map_batch(pool, function, batch, channel_map,
+                                     storage))
+        return results
+    except Exception:
+        for result in results:
+            if isinstance(result, BaseImage):
+                result.close()
+        raise
+    finally:
+        if own_pool and pool is not None:
+            pool.close()
+            pool.join()
+
+
+def map_batch(pool, function, images, channel_map, storage):
+    """Runs a batch of :func:`process_map()`.  Every shared memory block
+    made for the batch, by the parent or by workers, is unlinked before
+    it returns, even if a task fails.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    tasks = []
+    blocks = []
+    try:
+        for image in images:
+            if isinstance(image, string_type):
+                source = image
+            elif isinstance(image, BaseImage):
+                source, block = export_image(image, channel_map, storage)
+                if block is not None:
+                    blocks.append(block)
+            else:
+                raise TypeError('expected a wand.image.BaseImage or '
+                                'a filename, not ' + repr(image))
+            tasks.append((function, source, channel_map, storage))
+        results = []
+        error = None
+        iterator = pool.imap(run_task, tasks, chunksize=1)
+        # Every result is collected even after a failure, since blocks
+        # made by succeeded workers have to be unlinked anyway.
+        for _ in tasks:
+            try:
+                kind, value = next(iterator)
+            except Exception as e:
+                if error is None:
+                    error = e
+                continue
+            if kind == 'image':
+                descriptor = value
+                try:
+                    if error is None:
+                        value = import_image(descriptor, channel_map,
+                                             storage)
+                except Exception as e:
+                    error = e
+                finally:
+                    if descriptor[0] == 'shm':
+                        unlink_shared_memory(descriptor[1])
+            if error is None:
+                results.append(value)
+        if error is not None:
+            for result in results:
+                if isinstance(result, BaseImage):
+                    result.close()
+            raise error
+        return results
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def unlink_shared_memory(name):
+    """Frees the shared memory block of the given ``name`` made by
+    a worker process.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    try:
+        block = shared_memory.SharedMemory(name=name)
+    except (IOError, OSError):
+        return
+    block.close()
+    block.unlink()
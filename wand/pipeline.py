@@ -0,0 +1,528 @@
+""":mod:`wand.pipeline` --- Deferred operation pipelines
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+:class:`Pipeline` records image operations instead of running them
+immediately, and runs them when the result is requested by
+:meth:`~Pipeline.make_blob()` or :meth:`~Pipeline.save()`::
+
+    from wand.pipeline import Pipeline
+
+    blob = (Pipeline('photo.jpg')
+            .auto_orient()
+            .resize(800, 600)
+            .crop(100, 100, width=400, height=300)
+            .strip()
+            .make_blob('png'))
+
+Before running, operations are rearranged into a cheaper but equivalent
+order:
+
+- Crops are moved before resizes, with their coordinates scaled, so that
+  fewer pixels get resampled.
+- Consecutive resizes are collapsed into the last one.
+- Rotations by multiples of 90 degrees are merged, and turned into
+  :meth:`~wand.image.Image.transpose()`,
+  :meth:`~wand.image.BaseImage.flip()` and
+  :meth:`~wand.image.BaseImage.flop()`.
+- :meth:`~wand.image.Image.strip()` is moved first.
+
+If the first geometric operation is a resize, the decoder is hinted with
+the final size as well (``jpeg:size``), so that JPEG images are decoded at
+a reduced scale in the first place.
+
+Since crops are moved before resizes and JPEG decoding may be scaled,
+results can slightly differ from running the same operations eagerly
+in resampling details, though never in their geometry.  Pass
+``optimize=False`` and ``hints=False`` to get the exact eager behavior.
+
+.. versionadded:: 0.4.5
+
+"""
+import collections
+import numbers
+import time
+
+from .api import library
+from .compat import binary, binary_type, string_type
+from .image import GRAVITY_TYPES, BaseImage, Image, transparent_background
+
+__all__ = ('GEOMETRIC_OPERATIONS', 'Pipeline', 'crop_box', 'decode_hint',
+           'optimize')
+
+
+#: (:class:`frozenset`) The names of recorded operations which
+#: :func:`optimize()` understands.  Other operations are run as they are,
+#: and operations aren't moved across them.
+GEOMETRIC_OPERATIONS = frozenset([
+    'crop', 'resize', 'rotate', 'strip', 'flip', 'flop', 'transpose',
+    'transverse'
+])
+
+#: (:class:`dict`) Rotations by multiples of 90 degrees as sequences of
+#: lossless operations.
+ROTATIONS = {
+    0: (),
+    90: (('transpose',), ('flop',)),
+    180: (('flip',), ('flop',)),
+    270: (('transpose',), ('flip',)),
+}
+
+
+def crop_box(size, left=0, top=0, right=None, bottom=None, width=None,
+             height=None, reset_coords=True, gravity=None):
+    """Resolves arguments of :meth:`~wand.image.BaseImage.crop()` into
+    an absolute box, in the same way the method does.
+
+    :param size: the ``(width, height)`` of the image to crop
+    :type size: :class:`tuple`
+    :returns: the ``(left, top, width, height)`` box
+    :rtype: :class:`tuple`
+    :raises ValueError: when arguments can't be resolved statically.
+                        :meth:`~wand.image.BaseImage.crop()` will
+                        report the actual error
+
+    """
+    image_width, image_height = size
+    if not reset_coords:
+        raise ValueError('reset_coords=False cannot be optimized')
+    if right is not None and width is not None or \
+       bottom is not None and height is not None:
+        raise ValueError('exclusive parameters')
+    if gravity:
+        if width is None or height is None or gravity not in GRAVITY_TYPES:
+            raise ValueError('invalid gravity')
+        if gravity in ('north_west', 'north', 'north_east'):
+            top = 0
+        elif gravity in ('west', 'center', 'east'):
+            top = int(image_height / 2) - int(height / 2)
+        else:
+            top = image_height - height
+        if gravity in ('north_west', 'west', 'south_west'):
+            left = 0
+        elif gravity in ('north', 'center', 'south'):
+            left = int(image_width / 2) - int(width / 2)
+        else:
+            left = image_width - width
+
+    def abs_(n, m, null=None):
+        if n is None:
+            return m if null is None else null
+        elif not isinstance(n, numbers.Integral) or n > m:
+            raise ValueError('invalid offset: ' + repr(n))
+        return m + n if n < 0 else n
+    left = abs_(left, image_width, 0)
+    top = abs_(top, image_height, 0)
+    if width is None:
+        width = abs_(right, image_width) - left
+    if height is None:
+        height = abs_(bottom, image_height) - top
+    if not (isinstance(width, numbers.Integral) and
+            isinstance(height, numbers.Integral)) or width < 1 or height < 1:
+        raise ValueError('invalid size')
+    # ImageMagick clips the crop region to the image.
+    width = min(width, image_width - left)
+    height = min(height, image_height - top)
+    if width < 1 or height < 1:
+        raise ValueError('the crop region is out of the image')
+    return left, top, width, height
+
+
+def normalize(operation, size):
+    """Resolves a recorded ``operation`` on an image of the given ``size``
+    into the normalized form :func:`optimize()` deals with.
+
+    .. note::
+
+       It's only for internal use.
+
+    :returns: the normalized operation and the size after it.
+              the operation is ``None`` if it does nothing
+    :rtype: :class:`tuple`
+    :raises ValueError: when the operation can't be normalized
+
+    """
+    name, args, kwargs = operation
+    width, height = size
+    if name == 'crop':
+        box = crop_box(size, *args, **kwargs)
+        if box == (0, 0, width, height):
+            return None, size
+        return ('crop',) + box, box[2:]
+    elif name == 'resize':
+        arguments = dict(zip(('width', 'height', 'filter', 'blur'), args))
+        arguments.update(kwargs)
+        new_width = arguments.pop('width', None) or width
+        new_height = arguments.pop('height', None) or height
+        filter = arguments.pop('filter', 'undefined')
+        blur = arguments.pop('blur', 1)
+        if arguments or not (isinstance(new_width, numbers.Integral) and
+                             isinstance(new_height, numbers.Integral)):
+            raise ValueError('invalid arguments')
+        if ((new_width, new_height) == size and filter == 'undefined' and
+                blur == 1):
+            return None, size
+        return (('resize', width, height, new_width, new_height, filter,
+                 blur),
+                (new_width, new_height))
+    elif name == 'rotate':
+        arguments = dict(zip(('degree', 'background', 'reset_coords'), args))
+        arguments.update(kwargs)
+        degree = arguments.get('degree')
+        if (not isinstance(degree, numbers.Real) or degree % 90 or
+                not arguments.get('reset_coords', True)):
+            raise ValueError('only rotations by multiples of 90 degrees '
+                             'can be optimized')
+        degree = int(degree) % 360
+        if degree in (90, 270):
+            size = height, width
+        return ('rotate', degree), size
+    elif name in ('flip', 'flop', 'transpose', 'transverse', 'strip'):
+        if args or kwargs:
+            raise ValueError('invalid arguments')
+        if name in ('transpose', 'transverse'):
+            size = height, width
+        return (name,), size
+    raise ValueError('cannot optimize ' + repr(name))
+
+
+def push(plan, operation):
+    """Appends the normalized ``operation`` to the ``plan``, moving it
+    before resizes or merging it if possible.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    last = plan[-1] if plan else None
+    if operation[0] == 'crop' and last and last[0] == 'resize':
+        # Crop the corresponding region of the source and then resize it
+        # to the size of the crop.
+        _, left, top, width, height = operation
+        _, src_width, src_height, dst_width, dst_height, filter, blur = last
+        plan.pop()
+        x_scale = float(src_width) / dst_width
+        y_scale = float(src_height) / dst_height
+        src_left = int(round(left * x_scale))
+        src_top = int(round(top * y_scale))
+        src_right = min(src_width, int(round((left + width) * x_scale)))
+        src_bottom = min(src_height, int(round((top + height) * y_scale)))
+        box = (src_left, src_top,
+               max(1, src_right - src_left), max(1, src_bottom - src_top))
+        if box != (0, 0, src_width, src_height):
+            push(plan, ('crop',) + box)
+        push(plan, ('resize', box[2], box[3], width, height, filter, blur))
+    elif operation[0] == 'resize' and last and last[0] == 'resize':
+        plan[-1] = ('resize', last[1], last[2]) + operation[3:]
+    elif operation[0] == 'rotate' and last and last[0] == 'rotate':
+        plan[-1] = ('rotate', (last[1] + operation[1]) % 360)
+    else:
+        plan.append(operation)
+
+
+def optimize(operations, size):
+    """Rearranges the recorded ``operations`` on an image of the given
+    ``size`` into a cheaper but equivalent plan.  All ``operations`` have
+    to be in :const:`GEOMETRIC_OPERATIONS`.
+
+    :param operations: the list of ``(name, args, kwargs)`` tuples
+    :type operations: :class:`collections.Sequence`
+    :param size: the ``(width, height)`` of the image
+    :type size: :class:`tuple`
+    :returns: the list of normalized operations e.g.
+              ``('crop', left, top, width, height)``,
+              ``('resize', from_width, from_height, width, height,
+              filter, blur)``, ``('strip',)``
+    :rtype: :class:`list`
+    :raises ValueError: when any of ``operations`` can't be optimized
+
+    """
+    strip = False
+    plan = []
+    for operation in operations:
+        normalized, size = normalize(operation, size)
+        if normalized is None:
+            continue
+        elif normalized[0] == 'strip':
+            strip = True
+        else:
+            push(plan, normalized)
+    result = [('strip',)] if strip else []
+    for operation in plan:
+        if operation[0] == 'rotate':
+            result.extend(ROTATIONS[operation[1]])
+        else:
+            result.append(operation)
+    return result
+
+
+def decode_hint(operations):
+    """Derives the ``jpeg:size`` decoder hint from the recorded
+    ``operations``.  It's only possible when the first geometric operation
+    is a resize to an explicit size.  The hint is square so that
+    it's still valid after the image is oriented or rotated.
+
+    :param operations: the list of ``(name, args, kwargs)`` tuples
+    :type operations: :class:`collections.Sequence`
+    :returns: the hint e.g. ``'800x800'``, or ``None``
+    :rtype: :class:`str`
+
+    """
+    for name, args, kwargs in operations:
+        if name in ('strip', 'auto_orient', 'flip', 'flop', 'transpose',
+                    'transverse'):
+            continue
+        elif name == 'rotate':
+            degree = args[0] if args else kwargs.get('degree')
+            if isinstance(degree, numbers.Real) and not degree % 90:
+                continue
+        elif name == 'resize':
+            arguments = dict(zip(('width', 'height'), args))
+            arguments.update(kwargs)
+            width = arguments.get('width')
+            height = arguments.get('height')
+            if (isinstance(width, numbers.Integral) and
+                    isinstance(height, numbers.Integral) and
+                    width > 0 and height > 0):
+                length = max(width, height)
+                return '{0}x{0}'.format(length)
+        return None
+
+
+class Pipeline(object):
+    """Records image operations and runs them lazily.  Every recording
+    method returns the pipeline itself so that calls can be chained.
+
+    :param source: the image to process.  a filename, a blob, a file
+                   object, or an :class:`~wand.image.Image` which is
+                   cloned and never changed
+    :param optimize: whether to rearrange operations.  ``True`` by default
+    :type optimize: :class:`bool`
+    :param hints: whether to give the decoder hints.  ``True`` by default
+    :type hints: :class:`bool`
+
+    """
+
+    def __init__(self, source, optimize=True, hints=True):
+        if not isinstance(source, (BaseImage, string_type, binary_type)) \
+           and not callable(getattr(source, 'read', None)):
+            raise TypeError('source must be an image, a filename, a blob, '
+                            'or a file object, not ' + repr(source))
+        self.source = source
+        self.optimize = optimize
+        self.hints = hints
+        #: (:class:`list`) The recorded ``(name, args, kwargs)`` tuples.
+        self.operations = []
+        #: (:class:`basestring`) The format to convert to, if recorded.
+        self.format = None
+        #: (:class:`collections.OrderedDict`) The seconds spent in each
+        #: stage (``'read'``, operation names, and ``'write'``) during
+        #: the last run.
+        self.timings = collections.OrderedDict()
+
+    def record(self, name, *args, **kwargs):
+        """Records an arbitrary method call of :class:`~wand.image.Image`.
+        Operations other than :const:`GEOMETRIC_OPERATIONS` are run as they
+        are.
+
+        :param name: the method name e.g. ``'sharpen'``
+        :type name: :class:`str`
+        :returns: the pipeline itself
+        :rtype: :class:`Pipeline`
+
+        """
+        if not callable(getattr(Image, name, None)):
+            raise AttributeError('wand.image.Image has no method ' +
+                                 repr(name))
+        self.operations.append((name, args, kwargs))
+        return self
+
+    def crop(self, *args, **kwargs):
+        """Records :meth:`~wand.image.BaseImage.crop()`."""
+        return self.record('crop', *args, **kwargs)
+
+    def resize(self, *args, **kwargs):
+        """Records :meth:`~wand.image.BaseImage.resize()`."""
+        return self.record('resize', *args, **kwargs)
+
+    def rotate(self, *args, **kwargs):
+        """Records :meth:`~wand.image.BaseImage.rotate()`."""
+        return self.record('rotate', *args, **kwargs)
+
+    def strip(self):
+        """Records :meth:`~wand.image.Image.strip()`."""
+        return self.record('strip')
+
+    def auto_orient(self):
+        """Records :meth:`~wand.image.Image.auto_orient()`."""
+        return self.record('auto_orient')
+
+    def transform(self, *args, **kwargs):
+        """Records :meth:`~wand.image.BaseImage.transform()`."""
+        return self.record('transform', *args, **kwargs)
+
+    def flip(self):
+        """Records :meth:`~wand.image.BaseImage.flip()`."""
+        return self.record('flip')
+
+    def flop(self):
+        """Records :meth:`~wand.image.BaseImage.flop()`."""
+        return self.record('flop')
+
+    def transpose(self):
+        """Records :meth:`~wand.image.Image.transpose()`."""
+        return self.record('transpose')
+
+    def transverse(self):
+        """Records :meth:`~wand.image.Image.transverse()`."""
+        return self.record('transverse')
+
+    def convert(self, format):
+        """Records the format to convert to.
+
+        :param format: the format e.g. ``'png'``
+        :type format: :class:`basestring`
+        :returns: the pipeline itself
+        :rtype: :class:`Pipeline`
+
+        """
+        if not isinstance(format, string_type):
+            raise TypeError('format must be a string, not ' + repr(format))
+        self.format = format
+        return self
+
+    def open(self):
+        """Reads the source image with decoder hints.
+
+        :returns: a new image
+        :rtype: :class:`~wand.image.Image`
+
+        """
+        source = self.source
+        if isinstance(source, BaseImage):
+            return Image(image=source)
+        image = Image()
+        try:
+            library.MagickSetBackgroundColor(image.wand,
+                                             transparent_background())
+            hint = decode_hint(self.operations) if self.hints else None
+            if hint:
+                library.MagickSetOption(image.wand, b'jpeg:size',
+                                        binary(hint))
+            if isinstance(source, string_type):
+                image.read(filename=source)
+            elif isinstance(source, binary_type):
+                image.read(blob=source)
+            else:
+                image.read(file=source)
+        except Exception:
+            image.close()
+            raise
+        return image
+
+    def execute(self):
+        """Runs recorded operations.  The pipeline can be run again.
+
+        :returns: the resulting image.  it has to be closed by the caller
+        :rtype: :class:`~wand.image.Image`
+
+        """
+        timings = self.timings = collections.OrderedDict()
+        started_at = time.time()
+        image = self.open()
+        timings['read'] = time.time() - started_at
+        try:
+            operations = self.operations
+            index = 0
+            while index < len(operations):
+                end = index
+                while (end < len(operations) and
+                       operations[end][0] in GEOMETRIC_OPERATIONS):
+                    end += 1
+                steps = None
+                if self.optimize and end > index and \
+                   len(image.sequence) == 1:
+                    # Optimizes each run of geometric operations with
+                    # the actual size of the image at the moment.
+                    try:
+                        steps = optimize(operations[index:end], image.size)
+                    except ValueError:
+                        pass
+                if steps is None:
+                    end = max(end, index + 1)
+                    steps = [('call',) + operation
+                             for operation in operations[index:end]]
+                for step in steps:
+                    self.run_step(image, step)
+                index = end
+            if self.format:
+                image.format = self.format
+        except Exception:
+            image.close()
+            raise
+        return image
+
+    def run_step(self, image, step):
+        """Runs a ``step`` on the ``image``.  It's either a normalized
+        operation made by :func:`optimize()`, or a ``('call', name, args,
+        kwargs)`` tuple which :meth:`execute()` makes for operations run
+        as they are.
+
+        .. note::
+
+           It's only for internal use.
+
+        """
+        started_at = time.time()
+        name = step[0]
+        if name == 'call':
+            name, args, kwargs = step[1:]
+            getattr(image, name)(*args, **kwargs)
+        elif name == 'crop':
+            left, top, width, height = step[1:]
+            image.crop(left, top, width=width, height=height)
+        elif name == 'resize':
+            width, height, filter, blur = step[3:]
+            image.resize(width, height, filter=filter, blur=blur)
+        else:
+            getattr(image, name)()
+        self.timings[name] = (self.timings.get(name, 0) +
+                              time.time() - started_at)
+
+    def make_blob(self, format=None, cache=None):
+        """Runs recorded operations and makes the binary string of the
+        result.
+
+        :param format: the format to write e.g. ``'png'``.
+                       the recorded format or the source format by default
+        :type format: :class:`basestring`
+        :param cache: an optional cache to look up the result first,
+                      and to store the result if it's missing
+        :type cache: :class:`~wand.cache.DerivativeCache`
+        :returns: a blob (bytes) string
+        :rtype: :class:`bytes`
+
+        """
+        if cache is not None:
+            return cache.make_blob(self, format)
+        with self.execute() as image:
+            started_at = time.time()
+            blob = image.make_blob(format)
+            self.timings['write'] = time.time() - started_at
+        return blob
+
+    def save(self, file=None, filename=None):
+        """Runs recorded operations and saves the result.  It takes the
+        same parameters as :meth:`Image.save() <wand.image.Image.save>`.
+
+        """
+        with self.execute() as image:
+            started_at = time.time()
+            image.save(file=file, filename=filename)
+            self.timings['write'] = time.time() - started_at
+
+    def __repr__(self):
+        return '<{0}.{1} {2!r}>'.format(
+            type(self).__module__, type(self).__name__,
+            [name for name, _, __ in self.operations]
+        )
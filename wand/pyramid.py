@@ -0,0 +1,332 @@
+""":mod:`wand.pyramid` --- Tile pyramids
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+:func:`generate()` cuts a large image into a pyramid of tiles for tiled
+viewers, e.g. OpenSeadragon, Leaflet::
+
+    from wand.pyramid import generate
+
+    generate('scan.tiff', 'public/scan', layout='dzi')
+    # public/scan.dzi, public/scan_files/0/0_0.jpg, ...
+
+Each level is made by halving the previous level rather than the original
+image, and only one level is kept at once.  Tiles are cut out in batches,
+and encoded and written by a pool of worker threads as soon as they're
+cut.
+
+Supported layouts:
+
+``'dzi'``
+   `Deep Zoom`__.  ``output`` is the path without extension; it writes
+   :file:`{output}.dzi` and :file:`{output}_files/{level}/{column}_{row}.jpg`.
+   Level 0 is 1x1 pixel.
+
+``'zoomify'``
+   Zoomify.  ``output`` is a directory; it writes
+   :file:`ImageProperties.xml` and
+   :file:`TileGroup{n}/{level}-{column}-{row}.jpg`.  ``overlap`` is ignored.
+
+``'xyz'``
+   The ``z/x/y`` layout of slippy maps.  ``output`` is a directory;
+   it writes :file:`{z}/{x}/{y}.jpg`.  Zoom level 0 fits in a tile.
+   ``overlap`` is ignored.  Tiles at the right and bottom edges are padded
+   with ``background`` to the full ``tile_size``, since slippy map clients
+   draw every tile at the same size.
+
+__ https://msdn.microsoft.com/en-us/library/cc645077(v=vs.95).aspx
+
+.. versionadded:: 0.4.5
+
+"""
+import multiprocessing
+import multiprocessing.pool
+import numbers
+import os
+import os.path
+
+from .api import library
+from .color import Color
+from .compat import string_type, xrange
+from .image import BaseImage, Image
+
+__all__ = ('LAYOUTS', 'generate', 'level_sizes', 'tile_boxes')
+
+
+#: (:class:`tuple`) The list of supported layouts.
+LAYOUTS = 'dzi', 'zoomify', 'xyz'
+
+#: (:class:`numbers.Integral`) The number of tiles in a Zoomify tile group.
+ZOOMIFY_TILE_GROUP_SIZE = 256
+
+DZI_TEMPLATE = '''\
+<?xml version="1.0" encoding="UTF-8"?>
+<Image xmlns="http://schemas.microsoft.com/deepzoom/2008"
+       Format="{extension}" Overlap="{overlap}" TileSize="{tile_size}">
+  <Size Width="{width}" Height="{height}"/>
+</Image>
+'''
+
+ZOOMIFY_TEMPLATE = (
+    '<IMAGE_PROPERTIES WIDTH="{width}" HEIGHT="{height}" NUMTILES="{tiles}" '
+    'NUMIMAGES="1" VERSION="1.8" TILESIZE="{tile_size}" />\n'
+)
+
+
+def level_sizes(width, height, tile_size, layout='dzi'):
+    """Lists sizes of levels from the original size to the smallest one,
+    each of which is the half of the previous one (rounded up).
+
+    :param width: the width of the original image
+    :type width: :class:`numbers.Integral`
+    :param height: the height of the original image
+    :type height: :class:`numbers.Integral`
+    :param tile_size: the width and height of tiles
+    :type tile_size: :class:`numbers.Integral`
+    :param layout: one of :const:`LAYOUTS`.  the smallest level is
+                   1x1 for ``'dzi'``, and fits in a tile for others
+    :type layout: :class:`basestring`
+    :returns: the list of ``(width, height)`` pairs
+    :rtype: :class:`list`
+
+    """
+    sizes = [(width, height)]
+    while True:
+        width, height = sizes[-1]
+        if layout == 'dzi':
+            if width == height == 1:
+                break
+        elif width <= tile_size and height <= tile_size:
+            break
+        sizes.append((max(1, (width + 1) // 2), max(1, (height + 1) // 2)))
+    return sizes
+
+
+def tile_boxes(width, height, tile_size, overlap=0):
+    """Lists tiles of a level.
+
+    :param width: the width of the level
+    :type width: :class:`numbers.Integral`
+    :param height: the height of the level
+    :type height: :class:`numbers.Integral`
+    :param tile_size: the width and height of tiles without overlap
+    :type tile_size: :class:`numbers.Integral`
+    :param overlap: the number of pixels tiles share with their neighbors
+                    on each side
+    :type overlap: :class:`numbers.Integral`
+    :returns: the list of ``(column, row, left, top, right, bottom)``
+              tuples, row by row
+    :rtype: :class:`list`
+
+    """
+    boxes = []
+    for row, top in enumerate(xrange(0, height, tile_size)):
+        for column, left in enumerate(xrange(0, width, tile_size)):
+            boxes.append((
+                column, row,
+                max(0, left - overlap), max(0, top - overlap),
+                min(width, left + tile_size + overlap),
+                min(height, top + tile_size + overlap)
+            ))
+    return boxes
+
+
+def write_tile(task):
+    """Encodes a tile, padded to the given size if it's smaller, and
+    writes it into the file.  It's run by workers of :func:`generate()`.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    tile, path, format, quality, size, background = task
+    try:
+        if size is not None and tile.size != size:
+            padded = Image(width=size[0], height=size[1],
+                           background=background)
+            try:
+                padded.composite(tile, 0, 0)
+            except Exception:
+                padded.close()
+                raise
+            tile.close()
+            tile = padded
+        tile.format = format
+        if quality is not None:
+            tile.compression_quality = quality
+        blob = tile.make_blob()
+    finally:
+        tile.close()
+    with open(path, 'wb') as tile_file:
+        tile_file.write(blob)
+
+
+def make_directory(path):
+    """Makes the directory and its parents unless it exists.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+
+def generate(image, output, tile_size=256, overlap=1, format='jpeg',
+             layout='dzi', quality=None, filter='undefined', workers=None,
+             background=None):
+    """Generates the tile pyramid of the ``image``.
+
+    :param image: the image, or its filename.  only the current frame
+                  is used, and the image isn't changed
+    :type image: :class:`~wand.image.BaseImage`, :class:`basestring`
+    :param output: the path to write the pyramid.  see the module
+                   documentation for each layout
+    :type output: :class:`basestring`
+    :param tile_size: the width and height of tiles without overlap
+    :type tile_size: :class:`numbers.Integral`
+    :param overlap: the number of pixels tiles share with their neighbors
+                    on each side.  only for ``'dzi'``
+    :type overlap: :class:`numbers.Integral`
+    :param format: the format of tiles
+    :type format: :class:`basestring`
+    :param layout: one of :const:`LAYOUTS`
+    :type layout: :class:`basestring`
+    :param quality: the optional
+                    :attr:`~wand.image.BaseImage.compression_quality`
+                    of tiles
+    :type quality: :class:`numbers.Integral`
+    :param filter: the filter to halve levels with.
+                   see :const:`~wand.image.FILTER_TYPES`
+    :type filter: :class:`basestring`
+    :param workers: the number of threads encoding tiles.  the number of
+                    CPUs by default
+    :type workers: :class:`numbers.Integral`
+    :param background: the color to pad edge tiles with.  only for
+                       ``'xyz'``.  default is transparent
+    :type background: :class:`~wand.color.Color`
+    :returns: the summary which has ``width``, ``height``, ``levels``,
+              and ``tiles`` (the number of written tiles)
+    :rtype: :class:`dict`
+
+    """
+    if layout not in LAYOUTS:
+        raise ValueError('layout must be one of ' + repr(LAYOUTS) +
+                         ', not ' + repr(layout))
+    elif not isinstance(output, string_type):
+        raise TypeError('output must be a string, not ' + repr(output))
+    elif not isinstance(format, string_type):
+        raise TypeError('format must be a string, not ' + repr(format))
+    elif not isinstance(tile_size, numbers.Integral) or tile_size < 1:
+        raise TypeError('tile_size must be a natural number, not ' +
+                        repr(tile_size))
+    elif not isinstance(overlap, numbers.Integral) or overlap < 0:
+        raise TypeError('overlap must be a natural number, not ' +
+                        repr(overlap))
+    if layout != 'dzi':
+        overlap = 0
+    extension = 'jpg' if format.lower() in ('jpeg', 'jpg') else format.lower()
+    if isinstance(image, string_type):
+        with Image(filename=image) as opened:
+            return generate(opened, output, tile_size=tile_size,
+                            overlap=overlap, format=format, layout=layout,
+                            quality=quality, filter=filter, workers=workers,
+                            background=background)
+    elif not isinstance(image, BaseImage):
+        raise TypeError('image must be a wand.image.BaseImage instance or '
+                        'a filename, not ' + repr(image))
+    width, height = image.size
+    sizes = level_sizes(width, height, tile_size, layout)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if layout == 'xyz':
+        padded_size = tile_size, tile_size
+        background = background or Color('transparent')
+    else:
+        padded_size = None
+    # Zoomify numbers tiles through all levels from the smallest one.
+    first_tile_indices = []
+    tiles = 0
+    for level_width, level_height in reversed(sizes):
+        first_tile_indices.insert(0, tiles)
+        tiles += (-(-level_width // tile_size) *
+                  -(-level_height // tile_size))
+    if layout == 'dzi':
+        base = output + '_files'
+    else:
+        base = output
+    make_directory(base)
+    pool = multiprocessing.pool.ThreadPool(workers)
+    # Only the current frame, whose pixel cache is shared until
+    # it's halved.
+    level_image = BaseImage(library.MagickGetImage(image.wand))
+    try:
+        for index, (level_width, level_height) in enumerate(sizes):
+            level = len(sizes) - index - 1
+            if index:
+                level_image.resize(level_width, level_height, filter=filter)
+            if layout == 'dzi':
+                make_directory(os.path.join(base, str(level)))
+            elif layout == 'xyz':
+                for column in xrange(-(-level_width // tile_size)):
+                    make_directory(os.path.join(base, str(level),
+                                                str(column)))
+            boxes = tile_boxes(level_width, level_height, tile_size, overlap)
+            columns = boxes[-1][0] + 1
+            batch_size = workers * 4
+            for start in xrange(0, len(boxes), batch_size):
+                tasks = []
+                try:
+                    for column, row, left, top, right, bottom in \
+                            boxes[start:start + batch_size]:
+                        if layout == 'dzi':
+                            path = os.path.join(
+                                base, str(level),
+                                '{0}_{1}.{2}'.format(column, row, extension)
+                            )
+                        elif layout == 'zoomify':
+                            group = ((first_tile_indices[index] +
+                                      row * columns + column) //
+                                     ZOOMIFY_TILE_GROUP_SIZE)
+                            directory = os.path.join(
+                                base, 'TileGroup{0}'.format(group)
+                            )
+                            make_directory(directory)
+                            path = os.path.join(directory,
+                                                '{0}-{1}-{2}.{3}'.format(
+                                                    level, column, row,
+                                                    extension
+                                                ))
+                        else:
+                            path = os.path.join(
+                                base, str(level), str(column),
+                                '{0}.{1}'.format(row, extension)
+                            )
+                        tile = level_image[left:right, top:bottom]
+                        tasks.append((tile, path, format, quality,
+                                      padded_size, background))
+                except Exception:
+                    for task in tasks:
+                        task[0].close()
+                    raise
+                pool.map(write_tile, tasks, chunksize=1)
+    finally:
+        level_image.destroy()
+        pool.close()
+        pool.join()
+    # Descriptors are written last, so that viewers never see
+    # incomplete pyramids.
+    if layout == 'dzi':
+        with open(output + '.dzi', 'w') as descriptor:
+            descriptor.write(DZI_TEMPLATE.format(
+                extension=extension, overlap=overlap, tile_size=tile_size,
+                width=width, height=height
+            ))
+    elif layout == 'zoomify':
+        with open(os.path.join(output, 'ImageProperties.xml'), 'w') as f:
+            f.write(ZOOMIFY_TEMPLATE.format(
+                width=width, height=height, tiles=tiles, tile_size=tile_size
+            ))
+    return {'width': width, 'height': height, 'levels': len(sizes),
+            'tiles': tiles}
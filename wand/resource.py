@@ -5,9 +5,15 @@ There is the global resource to manage in MagickWand API. This module
 implements automatic global resource management through reference counting.
 
 """
+import collections
 import contextlib
 import ctypes
+import os
+import sys
+import threading
+import traceback
 import warnings
+import weakref
 
 from .api import library
 from .compat import string_type
@@ -15,7 +21,12 @@ from .exceptions import TYPE_MAP, WandException
 
 
 __all__ = ('genesis', 'terminus', 'increment_refcount', 'decrement_refcount',
-           'Resource', 'DestroyedResourceError')
+           'acquire_wand', 'release_wand', 'enable_wand_pool',
+           'disable_wand_pool', 'enable_fork_safety',
+           'reinitialize_after_fork', 'arena', 'enable_tracking',
+           'disable_tracking', 'take_snapshot', 'Arena', 'Resource',
+           'ResourceSnapshot', 'ResourceTracker', 'TrackedResource',
+           'WandPool', 'DestroyedResourceError')
 
 
 def genesis():
@@ -27,7 +38,9 @@ def genesis():
        :func:`decrement_refcount()` functions instead.
 
     """
+    global generation
     library.MagickWandGenesis()
+    generation += 1
 
 
 def terminus():
@@ -39,6 +52,8 @@ def terminus():
        :func:`decrement_refcount()` functions instead.
 
     """
+    if wand_pool is not None:
+        wand_pool.clear()
     library.MagickWandTerminus()
 
 
@@ -52,6 +67,14 @@ def terminus():
 #:
 reference_count = 0
 
+#: (:class:`numbers.Integral`) The number of times the MagickWand API has
+#: been instantiated by :func:`genesis()`.  Objects cached across images
+#: (e.g. :c:type:`PixelWand`\ s) are valid only in the generation they
+#: were made.
+#:
+#: .. versionadded:: 0.4.5
+generation = 0
+
 
 def increment_refcount():
     """Increments the :data:`reference_count` and instantiates the MagickWand
@@ -79,6 +102,702 @@ def decrement_refcount():
         terminus()
 
 
+class WandPool(object):
+    """The pool of recycled :c:type:`MagickWand` objects.  Released wands
+    are cleared by :c:func:`ClearMagickWand` and kept in the free list of
+    the releasing thread instead of being destroyed, and then reused by
+    the next :class:`~wand.image.Image` made in the same thread.  It saves
+    allocation costs for workloads of many tiny images e.g. icons.
+    Free wands of threads which have exited are destroyed when another
+    thread starts to use the pool.
+
+    Don't instantiate it directly; use :func:`enable_wand_pool()` instead.
+
+    :param max_size: the maximum number of free wands kept per thread
+    :type max_size: :class:`numbers.Integral`
+
+    .. versionadded:: 0.4.5
+
+    """
+
+    def __init__(self, max_size=32):
+        #: (:class:`numbers.Integral`) The maximum number of free wands
+        #: kept per thread.
+        self.max_size = max_size
+        self.local = threading.local()
+        #: (:class:`list`) The pairs of the weak reference to each thread
+        #: and its free list.
+        self.free_lists = []
+        self.lock = threading.Lock()
+
+    @property
+    def free_list(self):
+        """(:class:`list`) The free list of the current thread."""
+        try:
+            return self.local.wands
+        except AttributeError:
+            pass
+        wands = self.local.wands = []
+        thread = weakref.ref(threading.current_thread())
+        with self.lock:
+            # Free lists are registered once per thread, so pruning here
+            # keeps them bounded by the number of live threads even
+            # under thread-per-request servers.
+            self.prune()
+            self.free_lists.append((thread, wands))
+        return wands
+
+    def prune(self):
+        """Destroys free wands of threads which have exited, and forgets
+        their free lists.  The :attr:`lock` has to be held.
+
+        .. note::
+
+           It's only for internal use.
+
+        """
+        alive = []
+        for thread_ref, wands in self.free_lists:
+            thread = thread_ref()
+            if thread is not None and thread.is_alive():
+                alive.append((thread_ref, wands))
+                continue
+            while wands:
+                library.DestroyMagickWand(wands.pop())
+        self.free_lists = alive
+
+    def acquire(self):
+        """Takes a free wand of the current thread, or makes a new one
+        if there's no free wand.
+
+        :returns: a pointer to an empty :c:type:`MagickWand`
+        :rtype: :class:`ctypes.c_void_p`
+
+        """
+        wands = self.free_list
+        if wands:
+            return wands.pop()
+        return library.NewMagickWand()
+
+    def release(self, wand):
+        """Clears the ``wand`` and keeps it in the free list of the current
+        thread.  If the free list is full it's destroyed instead.
+
+        :param wand: a pointer to :c:type:`MagickWand` to release
+        :type wand: :class:`ctypes.c_void_p`
+
+        """
+        wands = self.free_list
+        if len(wands) < self.max_size:
+            library.ClearMagickWand(wand)
+            wands.append(wand)
+        else:
+            library.DestroyMagickWand(wand)
+
+    def clear(self):
+        """Destroys all free wands of every thread."""
+        with self.lock:
+            for _, wands in self.free_lists:
+                while wands:
+                    library.DestroyMagickWand(wands.pop())
+
+    def forget(self):
+        """Drops all free wands without destroying them.  Used in a forked
+        child process, where wands copied from the parent must not be
+        touched.
+
+        """
+        self.local = threading.local()
+        self.free_lists = []
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(wands) for _, wands in list(self.free_lists))
+
+
+#: (:class:`WandPool`) The wand pool in use.  It's ``None`` unless
+#: :func:`enable_wand_pool()` is called.
+#:
+#: .. warning::
+#:
+#:    Don't touch this global variable.  Use :func:`enable_wand_pool()` and
+#:    :func:`disable_wand_pool()` functions instead.
+#:
+#: .. versionadded:: 0.4.5
+wand_pool = None
+
+
+def enable_wand_pool(max_size=32):
+    """Makes :class:`~wand.image.Image` objects recycle their
+    :c:type:`MagickWand` through :class:`WandPool` instead of making
+    and destroying one for each image.  It's opt-in.
+
+    :param max_size: the maximum number of free wands kept per thread
+    :type max_size: :class:`numbers.Integral`
+    :returns: the wand pool
+    :rtype: :class:`WandPool`
+
+    .. versionadded:: 0.4.5
+
+    """
+    global wand_pool
+    if wand_pool is None:
+        wand_pool = WandPool(max_size)
+    else:
+        wand_pool.max_size = max_size
+    return wand_pool
+
+
+def disable_wand_pool():
+    """Stops recycling :c:type:`MagickWand` and destroys all free wands
+    kept in the pool.
+
+    .. versionadded:: 0.4.5
+
+    """
+    global wand_pool
+    pool = wand_pool
+    wand_pool = None
+    if pool is not None:
+        pool.clear()
+
+
+def acquire_wand():
+    """Makes an empty :c:type:`MagickWand`, or takes one from
+    the :data:`wand_pool` if it's enabled.
+
+    :returns: a pointer to an empty :c:type:`MagickWand`
+    :rtype: :class:`ctypes.c_void_p`
+
+    .. versionadded:: 0.4.5
+
+    """
+    pool = wand_pool
+    if pool is None:
+        return library.NewMagickWand()
+    return pool.acquire()
+
+
+def release_wand(wand):
+    """Destroys the ``wand``, or returns it to the :data:`wand_pool`
+    if it's enabled.
+
+    :param wand: a pointer to :c:type:`MagickWand` to release
+    :type wand: :class:`ctypes.c_void_p`
+
+    .. versionadded:: 0.4.5
+
+    """
+    pool = wand_pool
+    if pool is None:
+        library.DestroyMagickWand(wand)
+    else:
+        pool.release(wand)
+
+
+def reinitialize_after_fork():
+    """Tears down the MagickWand API state inherited from the parent
+    process and instantiates it again.  Call it in a child process right
+    after :func:`os.fork()` if the parent has used Wand, e.g. in the
+    ``post_fork`` hook of a pre-fork server::
+
+        # gunicorn.conf.py
+        def post_fork(server, worker):
+            from wand.resource import reinitialize_after_fork
+            reinitialize_after_fork()
+
+    Resources inherited from the parent (e.g. images opened before
+    the fork) become unusable in the child, so don't use them there.
+    Pooled wands are dropped without being destroyed.
+
+    It's done automatically if :func:`enable_fork_safety()` is called.
+
+    .. note::
+
+       ImageMagick builds with OpenMP can still hang in the child if the
+       parent has run parallelized operations, since OpenMP runtimes
+       themselves aren't fork-safe.  Set :envvar:`MAGICK_THREAD_LIMIT`
+       to 1 in the parent, or use a build without OpenMP.
+
+    .. versionadded:: 0.4.5
+
+    """
+    if wand_pool is not None:
+        wand_pool.forget()
+    tracker = resource_tracker
+    if tracker is not None:
+        # The lock might have been held by another thread of the parent.
+        tracker.lock = threading.Lock()
+    tracking_state.__dict__.clear()
+    if reference_count:
+        terminus()
+        genesis()
+
+
+#: (:class:`bool`) Whether :func:`reinitialize_after_fork()` is called
+#: automatically in child processes.
+#:
+#: .. warning::
+#:
+#:    Don't touch this global variable.  Use :func:`enable_fork_safety()`
+#:    function instead.
+reinitialize_on_fork = False
+
+#: (:class:`bool`) Whether the fork handler has been registered through
+#: :func:`os.register_at_fork()`.  It can't be unregistered.
+fork_handler_registered = False
+
+
+def handle_fork():
+    """The ``after_in_child`` handler registered by
+    :func:`enable_fork_safety()`.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    if reinitialize_on_fork:
+        reinitialize_after_fork()
+
+
+def enable_fork_safety(enabled=True):
+    """Makes child processes call :func:`reinitialize_after_fork()`
+    automatically right after :func:`os.fork()`, so that Wand can be
+    preloaded in the master process of a pre-fork server (e.g. gunicorn,
+    uWSGI) to share memory through copy-on-write.
+
+    It requires :func:`os.register_at_fork()` (Python 3.7 or higher).
+    On older Pythons call :func:`reinitialize_after_fork()` from the
+    post-fork hook of the server instead.
+
+    :param enabled: ``False`` to disable it again
+    :type enabled: :class:`bool`
+    :returns: whether child processes are reinitialized automatically
+    :rtype: :class:`bool`
+
+    .. versionadded:: 0.4.5
+
+    """
+    global reinitialize_on_fork, fork_handler_registered
+    if not hasattr(os, 'register_at_fork'):
+        reinitialize_on_fork = False
+        return False
+    if enabled and not fork_handler_registered:
+        os.register_at_fork(after_in_child=handle_fork)
+        fork_handler_registered = True
+    reinitialize_on_fork = bool(enabled)
+    return reinitialize_on_fork
+
+
+#: (:class:`threading.local`) The thread-local state of resource tracking
+#: e.g. the stack of active :class:`Arena`\ s.
+tracking_state = threading.local()
+
+
+def track_allocation(resource):
+    """Notifies the allocation of the ``resource`` to the innermost
+    :class:`Arena` of the current thread, and to the :data:`resource_tracker`
+    if tracking is enabled.
+
+    .. note::
+
+       It's only for internal use.  :class:`Resource` calls it
+       automatically.
+
+    """
+    arenas = getattr(tracking_state, 'arenas', None)
+    if arenas:
+        arenas[-1].track(resource)
+    tracker = resource_tracker
+    if tracker is not None:
+        tracker.track(resource)
+
+
+def track_deallocation(resource):
+    """Notifies the deallocation of the ``resource`` to the
+    :data:`resource_tracker` if tracking is enabled.
+
+    .. note::
+
+       It's only for internal use.  :class:`Resource` calls it
+       automatically.
+
+    """
+    tracker = resource_tracker
+    if tracker is not None:
+        tracker.untrack(resource)
+
+
+class Arena(object):
+    """Tracks every :class:`Resource` allocated while it's active,
+    and destroys all of them at once.  Don't instantiate it directly;
+    use :func:`arena()` instead.
+
+    .. versionadded:: 0.4.5
+
+    """
+
+    def __init__(self):
+        self.resources = collections.OrderedDict()
+        #: (:class:`list`) The :func:`repr()` strings of resources which
+        #: were still alive when the arena was released, i.e. resources
+        #: that weren't destroyed explicitly.
+        self.escaped = []
+
+    def track(self, resource):
+        """Starts tracking the ``resource``.
+
+        :param resource: the resource to track
+        :type resource: :class:`Resource`
+
+        """
+        key = id(resource)
+        self.resources.pop(key, None)
+        self.resources[key] = weakref.ref(resource)
+
+    def keep(self, resource):
+        """Stops tracking the ``resource`` so that it survives the arena.
+
+        :param resource: the resource to keep
+        :type resource: :class:`Resource`
+        :returns: the ``resource`` itself
+        :rtype: :class:`Resource`
+
+        """
+        ref = self.resources.get(id(resource))
+        if ref is not None and ref() is resource:
+            del self.resources[id(resource)]
+        return resource
+
+    def release(self):
+        """Destroys all tracked resources which are still alive, in reverse
+        order of allocation.
+
+        :returns: the :func:`repr()` strings of destroyed resources
+        :rtype: :class:`list`
+
+        """
+        escaped = []
+        refs = list(self.resources.values())
+        self.resources.clear()
+        for ref in reversed(refs):
+            resource = ref()
+            if (resource is None or
+                    getattr(resource, 'c_resource', None) is None):
+                continue
+            escaped.append(repr(resource))
+            try:
+                resource.destroy()
+            except DestroyedResourceError:
+                pass
+        self.escaped.extend(escaped)
+        return escaped
+
+    def __len__(self):
+        return sum(1 for ref in list(self.resources.values())
+                   if ref() is not None)
+
+
+@contextlib.contextmanager
+def arena(warn=False):
+    """Tracks every :class:`Resource` allocated inside the :keyword:`with`
+    block in the current thread, and destroys all of them deterministically
+    on exit instead of waiting for the garbage collector::
+
+        with arena() as a:
+            with Image(filename='pikachu.png') as img:
+                cropped = img[10:20, 10:20]  # never closed
+                red = Color('red')
+        print(a.escaped)  # ['<wand.image.Image: ...>']
+
+    Resources that need to survive the block can be excluded by
+    :meth:`Arena.keep()`.  Arenas can be nested; resources are tracked
+    by the innermost one.
+
+    :param warn: whether to warn about resources which weren't destroyed
+                 explicitly inside the block
+    :type warn: :class:`bool`
+    :returns: the context manager which yields :class:`Arena`
+
+    .. versionadded:: 0.4.5
+
+    """
+    current = Arena()
+    arenas = getattr(tracking_state, 'arenas', None)
+    if arenas is None:
+        arenas = tracking_state.arenas = []
+    arenas.append(current)
+    try:
+        yield current
+    finally:
+        arenas.remove(current)
+        escaped = current.release()
+        if warn and escaped:
+            warnings.warn('{0} resource(s) were not destroyed explicitly: '
+                          '{1}'.format(len(escaped), ', '.join(escaped)),
+                          RuntimeWarning, stacklevel=3)
+
+
+#: (:class:`collections.namedtuple`) A record of a live resource in
+#: :class:`ResourceSnapshot`.  It consists of ``id`` (the :func:`id()` of
+#: the resource), ``type`` (the qualified class name), ``repr``,
+#: ``stack`` (the list of formatted frames where it was allocated, the
+#: innermost last), and ``bytes`` (the approximate size of its pixels,
+#: or 0 for resources other than :c:type:`MagickWand`).
+TrackedResource = collections.namedtuple(
+    'TrackedResource', ['id', 'type', 'repr', 'stack', 'bytes']
+)
+
+
+def approximate_pixel_bytes(resource):
+    """Estimates the size of pixels held by the ``resource``.  Only
+    :c:type:`MagickWand` resources (i.e. images) hold pixels.
+
+    .. note::
+
+       It's only for internal use.
+
+    """
+    if type(resource).c_is_resource is not library.IsMagickWand:
+        return 0
+    wand = getattr(resource, 'c_resource', None)
+    if not wand:
+        return 0
+    # MagickGetImageWidth() et al. set an exception on empty wands,
+    # so they have to be checked first.
+    frames = library.MagickGetNumberImages(wand)
+    if not frames:
+        return 0
+    from .version import QUANTUM_DEPTH
+    width = library.MagickGetImageWidth(wand)
+    height = library.MagickGetImageHeight(wand)
+    return frames * width * height * 4 * QUANTUM_DEPTH // 8
+
+
+class ResourceTracker(object):
+    """Records every live :class:`Resource` with the stack where it was
+    allocated.  Don't instantiate it directly; use
+    :func:`enable_tracking()` instead.
+
+    :param stack_depth: the number of frames to record for each resource
+    :type stack_depth: :class:`numbers.Integral`
+
+    .. versionadded:: 0.4.5
+
+    """
+
+    def __init__(self, stack_depth=8):
+        #: (:class:`numbers.Integral`) The number of frames to record
+        #: for each resource.
+        self.stack_depth = stack_depth
+        self.resources = {}
+        self.lock = threading.Lock()
+
+    def track(self, resource):
+        """Starts tracking the ``resource``.
+
+        :param resource: the resource to track
+        :type resource: :class:`Resource`
+
+        """
+        stack = []
+        if self.stack_depth:
+            # Skips frames of Resource.resource setter and this module.
+            frames = traceback.extract_stack(sys._getframe(3),
+                                             limit=self.stack_depth)
+            stack = traceback.format_list(frames)
+        with self.lock:
+            self.resources[id(resource)] = weakref.ref(resource), stack
+
+    def untrack(self, resource):
+        """Stops tracking the ``resource``.
+
+        :param resource: the resource to stop tracking
+        :type resource: :class:`Resource`
+
+        """
+        with self.lock:
+            self.resources.pop(id(resource), None)
+
+    def snapshot(self):
+        """Takes the snapshot of live resources.
+
+        :returns: the snapshot
+        :rtype: :class:`ResourceSnapshot`
+
+        """
+        with self.lock:
+            items = list(self.resources.items())
+        records = []
+        for key, (ref, stack) in items:
+            resource = ref()
+            if resource is None or id(resource) != key:
+                continue
+            cls = type(resource)
+            records.append(TrackedResource(
+                id=key,
+                type=cls.__module__ + '.' + cls.__name__,
+                repr=repr(resource),
+                stack=stack,
+                bytes=approximate_pixel_bytes(resource)
+            ))
+        return ResourceSnapshot(records)
+
+    def __len__(self):
+        return len(self.resources)
+
+
+class ResourceSnapshot(object):
+    """The list of live resources at a moment, taken by
+    :func:`take_snapshot()`.
+
+    :param records: the records of live resources
+    :type records: :class:`collections.Iterable`
+
+    .. versionadded:: 0.4.5
+
+    """
+
+    def __init__(self, records):
+        #: (:class:`list`) The list of :class:`TrackedResource` records.
+        self.records = list(records)
+
+    @property
+    def bytes(self):
+        """(:class:`numbers.Integral`) The approximate size of pixels
+        held by all resources in the snapshot.
+
+        """
+        return sum(record.bytes for record in self.records)
+
+    def diff(self, older):
+        """Finds resources allocated since the ``older`` snapshot that
+        are still alive, i.e. leak candidates::
+
+            before = take_snapshot()
+            handle(request)
+            take_snapshot().diff(before).dump()
+
+        :param older: the snapshot taken earlier
+        :type older: :class:`ResourceSnapshot`
+        :returns: the snapshot of resources that are only in this snapshot
+        :rtype: :class:`ResourceSnapshot`
+
+        """
+        old_keys = frozenset((record.id, record.type)
+                             for record in older.records)
+        return type(self)(record for record in self.records
+                          if (record.id, record.type) not in old_keys)
+
+    def statistics(self):
+        """Summarizes the snapshot by types of resources.
+
+        :returns: the list of ``(type, count, bytes)`` tuples,
+                  the most bytes and the most count first
+        :rtype: :class:`list`
+
+        """
+        counts = collections.defaultdict(lambda: [0, 0])
+        for record in self.records:
+            counts[record.type][0] += 1
+            counts[record.type][1] += record.bytes
+        stats = [(type_, count, bytes_)
+                 for type_, (count, bytes_) in counts.items()]
+        stats.sort(key=lambda stat: (-stat[2], -stat[1], stat[0]))
+        return stats
+
+    def dump(self, file=None):
+        """Writes the human-readable report of the snapshot.
+
+        :param file: the file to write.  :data:`sys.stderr` by default
+        :type file: file object
+
+        """
+        if file is None:
+            file = sys.stderr
+        file.write('{0} live resource(s), approximately {1} byte(s) '
+                   'of pixels\n'.format(len(self.records), self.bytes))
+        for type_, count, bytes_ in self.statistics():
+            file.write('  {0}: {1} ({2} bytes)\n'.format(type_, count, bytes_))
+        for record in self.records:
+            file.write('\n{0} ({1} bytes) allocated at:\n'.format(
+                record.repr, record.bytes
+            ))
+            file.write(''.join(record.stack) or '  (no stack recorded)\n')
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+
+#: (:class:`ResourceTracker`) The tracker of live resources.
+#: ``None`` unless tracking is enabled.
+#:
+#: .. warning::
+#:
+#:    Don't touch this global variable.  Use :func:`enable_tracking()` and
+#:    :func:`disable_tracking()` functions instead.
+resource_tracker = None
+
+
+def enable_tracking(stack_depth=8):
+    """Starts recording every live :class:`Resource` (e.g.
+    :class:`~wand.image.Image`, :class:`~wand.color.Color`,
+    :class:`~wand.drawing.Drawing`) with the stack where it was allocated,
+    for debugging leaks.  Resources allocated before it aren't recorded.
+
+    It slows down every allocation, so don't enable it in production
+    unless you're hunting a leak.
+
+    :param stack_depth: the number of frames to record for each resource.
+                        0 not to record stacks at all
+    :type stack_depth: :class:`numbers.Integral`
+    :returns: the enabled tracker.  if it's already enabled, the existing
+              tracker is returned
+    :rtype: :class:`ResourceTracker`
+
+    .. versionadded:: 0.4.5
+
+    """
+    global resource_tracker
+    if resource_tracker is None:
+        resource_tracker = ResourceTracker(stack_depth=stack_depth)
+    else:
+        resource_tracker.stack_depth = stack_depth
+    return resource_tracker
+
+
+def disable_tracking():
+    """Stops recording live resources, and forgets recorded ones.
+
+    .. versionadded:: 0.4.5
+
+    """
+    global resource_tracker
+    resource_tracker = None
+
+
+def take_snapshot():
+    """Takes the snapshot of live resources recorded since
+    :func:`enable_tracking()`.
+
+    :returns: the snapshot
+    :rtype: :class:`ResourceSnapshot`
+    :raises RuntimeError: when tracking isn't enabled
+
+    .. versionadded:: 0.4.5
+
+    """
+    tracker = resource_tracker
+    if tracker is None:
+        raise RuntimeError('resource tracking is not enabled; '
+                           'call wand.resource.enable_tracking() first')
+    return tracker.snapshot()
+
+
 class Resource(object):
     """Abstract base class for MagickWand object that requires resource
     management. Its all subclasses manage the resource semiautomatically
@@ -162,11 +881,13 @@ class Resource(object):
         else:
             raise TypeError(repr(resource) + ' is an invalid resource')
         increment_refcount()
+        track_allocation(self)
 
     @resource.deleter
     def resource(self):
         self.c_destroy_resource(self.resource)
         self.c_resource = None
+        track_deallocation(self)
 
     @contextlib.contextmanager
     def allocate(self):
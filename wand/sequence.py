@@ -148,6 +148,7 @@ class Sequence(ImageProperty, collections.MutableSequence):
             with self.index_context(index) as index:
                 library.MagickRemoveImage(self.image.wand)
                 library.MagickAddImage(self.image.wand, image.wand)
+            self.image.dirty = True
 
     def __delitem__(self, index):
         if isinstance(index, slice):
@@ -159,6 +160,7 @@ class Sequence(ImageProperty, collections.MutableSequence):
                 library.MagickRemoveImage(self.image.wand)
                 if index < len(self.instances):
                     del self.instances[index]
+            self.image.dirty = True
 
     def insert(self, index, image):
         try:
@@ -195,6 +197,7 @@ class Sequence(ImageProperty, collections.MutableSequence):
             with self.index_context(index - 1):
                 library.MagickAddImage(self.image.wand, image.sequence[0].wand)
         self.instances.insert(index, None)
+        self.image.dirty = True
 
     def append(self, image):
         if not isinstance(image, BaseImage):
@@ -208,6 +211,7 @@ class Sequence(ImageProperty, collections.MutableSequence):
         finally:
             self.current_index = tmp_idx
         self.instances.append(None)
+        self.image.dirty = True
 
     def extend(self, images, offset=None):
         tmp_idx = self.current_index
@@ -248,6 +252,7 @@ class Sequence(ImageProperty, collections.MutableSequence):
             self.instances[offset:] = null_list
         else:
             self.instances[offset:offset] = null_list
+        self.image.dirty = True
 
     def _repr_png_(self):
         library.MagickResetIterator(self.image.wand)